@@ -0,0 +1,146 @@
+"""
+Measures the per-record CPU cost of turning a campaigns-report response body into fact
+rows on synthetic ad-level payloads, against the dict-based transform the decoder
+replaced: parsing with the json module and with orjson (when installed), then either
+the old record.get()/dict-to-tuple transform or the fused decode-and-transform of
+DataProcessor. Both resolve ids through the same in-memory caches and build one metrics
+row per lifeday entry. No database is needed.
+
+Usage: python -m benchmarks.bench_decode --records 5000 50000
+       python -m benchmarks.bench_decode --records 100000 --payload_bytes 0 200
+"""
+
+import argparse
+import gc
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.bench_transform import generate_records, in_memory_processor
+from etl.decoding import orjson
+from etl.process_data import DataProcessor
+
+
+def best_seconds(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def dict_transform(
+    processor: DataProcessor, data: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
+    """The transform as it was before decoding, with every metrics entry exploded."""
+
+    performance_data, metrics_data = [], []
+    campaign_ids = processor.get_campaign_ids(data=data)
+    ad_ids = processor.get_ad_ids(data=data)
+    for record in data:
+        campaign_id = (
+            campaign_ids[record["campaign"]]
+            if record["campaign"] in campaign_ids
+            else None
+        )
+        ad_id = ad_ids[record["ad"]] if record["ad"] in ad_ids else None
+        execution_date = record.get("date")
+        performance_record = {
+            "campaign_id": campaign_id,
+            "ad_id": ad_id,
+            "execution_date": execution_date,
+            "spend": record.get("cost"),
+            "impressions": record.get("impressions"),
+            "clicks": record.get("clicks"),
+            "registrations": record.get("registrations"),
+            "ctr": record.get("ctr"),
+            "cr": record.get("cr"),
+            "cpc": record.get("cpc"),
+        }
+        performance_data.append(tuple(v for v in performance_record.values()))
+        for metrics in record.get("metrics") or []:
+            metrics_record = {
+                "campaign_id": campaign_id,
+                "ad_id": ad_id,
+                "execution_date": execution_date,
+                "lifeday": metrics.get("lifeday"),
+                "players": metrics.get("players"),
+                "payers": metrics.get("payers"),
+                "payments": metrics.get("payments"),
+                "revenue": metrics.get("revenue"),
+            }
+            metrics_data.append(tuple(v for v in metrics_record.values()))
+    return performance_data, metrics_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response decoding")
+    parser.add_argument("--records", type=int, nargs="+", default=[5000, 100000])
+    parser.add_argument(
+        "--payload_bytes",
+        type=int,
+        nargs="+",
+        default=[0],
+        help="Size of an unused string field added to every record, like --payload_bytes "
+        "of the fake API",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    args = parser.parse_args()
+
+    parsers = [("json", json.loads)]
+    if orjson is not None:
+        parsers.append(("orjson", orjson.loads))
+
+    print(
+        f"{'records':>8} {'payload B':>10} {'step':>36} {'us/record':>10} "
+        f"{'speedup':>8}"
+    )
+    for n_records in args.records:
+        for payload_bytes in args.payload_bytes:
+            records = generate_records(n_records)
+            for record in records:
+                record["padding"] = "x" * payload_bytes
+            body = json.dumps(records).encode()
+            parsed = json.loads(body)
+            rows = in_memory_processor().process_campaign_ad_data(parsed)
+            assert rows == dict_transform(in_memory_processor(), parsed)
+
+            # each dict step is the baseline of the fused steps that follow it
+            steps = [
+                (
+                    "dict transform",
+                    lambda: dict_transform(in_memory_processor(), parsed),
+                ),
+                (
+                    "decode + transform",
+                    lambda: in_memory_processor().process_campaign_ad_data(parsed),
+                ),
+                (
+                    "parse (json) + dict transform",
+                    lambda: dict_transform(in_memory_processor(), json.loads(body)),
+                ),
+            ]
+            steps += [
+                (
+                    f"parse ({name}) + decode + transform",
+                    lambda f=f: in_memory_processor().process_campaign_ad_data(f(body)),
+                )
+                for name, f in parsers
+            ]
+            baseline = None
+            for name, fn in steps:
+                seconds = best_seconds(fn, args.repeat)
+                if "dict" in name:
+                    baseline, speedup = seconds, ""
+                else:
+                    speedup = f"{baseline / seconds:.2f}x"
+                print(
+                    f"{n_records:>8} {payload_bytes:>10} {name:>36} "
+                    f"{seconds / n_records * 1e6:>10.2f} {speedup:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
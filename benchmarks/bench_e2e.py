@@ -0,0 +1,239 @@
+"""
+Runs extract_process_load.py end to end against the local fake campaigns-report API and
+the Postgres database configured in .env, and reports the throughput of each stage from
+the run's telemetry. Arguments that are not recognized here are passed on to the ETL.
+
+A run can be saved as a baseline and later runs compared with it:
+
+Usage: python -m benchmarks.bench_e2e --campaigns 20 --ads 10 --days 28 --save_baseline base.json
+       python -m benchmarks.bench_e2e --campaigns 20 --ads 10 --days 28 --baseline base.json --workers 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from benchmarks.fake_api import FakeCampaignsReportAPI, SyntheticDataset
+from configs.api import APIConfigs, SchemaConfigs
+from etl.load_data import DataLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DATE = "2024-06-30"
+
+
+def truncate_facts() -> None:
+    """
+    Empties the fact tables, the load state and the learned window sizes, so that every
+    run is a cold load.
+    """
+
+    load_dotenv()
+    loader = DataLoader(
+        user=os.getenv("user"),
+        password=os.getenv("password"),
+        host=os.getenv("host"),
+        port=os.getenv("port"),
+        dbname=os.getenv("dbname"),
+    )
+    tables = [t for tables in SchemaConfigs.lod_tables.values() for t in tables]
+    try:
+        with loader.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"TRUNCATE {', '.join(tables)}, etl_load_state, etl_window_sizes"
+                )
+    finally:
+        loader.close()
+
+
+def run_etl(api: FakeCampaignsReportAPI, etl_args: List[str]) -> Dict[str, Any]:
+    """Runs the ETL in a subprocess and returns the run_summary event it logged."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics_log = os.path.join(tmp, "metrics.jsonl")
+        env = {
+            **os.environ,
+            APIConfigs.base_url_env: api.url,
+            "x_api_key": api.api_key,
+        }
+        process = subprocess.run(
+            [
+                sys.executable,
+                "extract_process_load.py",
+                "--metrics_log",
+                metrics_log,
+                *etl_args,
+            ],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            print(process.stdout[-5000:], process.stderr[-5000:], sep="\n")
+            raise RuntimeError(f"ETL run failed with exit code {process.returncode}")
+        with open(metrics_log, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+    return next(event for event in events if event["event"] == "run_summary")
+
+
+def total(series: List[Dict[str, Any]], name: str, field: str, **labels: str) -> float:
+    return sum(
+        item[field]
+        for item in series
+        if item["name"] == name
+        and all(item["labels"].get(key) == value for key, value in labels.items())
+    )
+
+
+def stage_report(summary: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Seconds spent, rows handled and rows/s of each stage of the run."""
+
+    counters, histograms = summary["counters"], summary["histograms"]
+    stages = {
+        "extract": (
+            total(histograms, "http_request_seconds", "sum"),
+            total(counters, "http_records_total", "value"),
+        ),
+        "transform": (
+            total(histograms, "stage_seconds", "sum", stage="transform"),
+            total(counters, "rows_transformed_total", "value"),
+        ),
+        "load": (
+            total(histograms, "db_write_seconds", "sum"),
+            total(counters, "db_rows_written_total", "value"),
+        ),
+        "end-to-end": (
+            summary["run_seconds"],
+            total(counters, "db_rows_written_total", "value"),
+        ),
+    }
+    return {
+        stage: {
+            "seconds": round(seconds, 4),
+            "rows": rows,
+            "rows_per_second": round(rows / seconds) if seconds else 0,
+        }
+        for stage, (seconds, rows) in stages.items()
+    }
+
+
+def print_report(
+    report: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Any]] = None
+) -> None:
+    print(
+        f"{'stage':>12} {'seconds':>10} {'rows':>10} {'rows/s':>10} "
+        f"{'baseline':>10} {'change':>8}"
+    )
+    for stage, values in report.items():
+        line = (
+            f"{stage:>12} {values['seconds']:>10.2f} {values['rows']:>10.0f} "
+            f"{values['rows_per_second']:>10.0f}"
+        )
+        base = (baseline or {}).get("stages", {}).get(stage)
+        if base and base["rows_per_second"]:
+            change = values["rows_per_second"] / base["rows_per_second"] - 1
+            line += f" {base['rows_per_second']:>10.0f} {change:>+7.1%}"
+        print(line)
+    print(
+        "Stage seconds are summed over concurrent calls; end-to-end is the wall time "
+        "of the run."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ETL benchmark")
+    parser.add_argument("--campaigns", type=int, default=10)
+    parser.add_argument("--ads", type=int, default=5, help="Ads per campaign")
+    parser.add_argument("--days", type=int, default=28, help="Days extracted")
+    parser.add_argument(
+        "--chunk_days",
+        type=int,
+        default=None,
+        help="Fixed window size passed to the ETL (default: adaptive windows)",
+    )
+    parser.add_argument("--payload_bytes", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per call")
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument(
+        "--record_latency", type=float, default=0.0, help="Seconds per returned record"
+    )
+    parser.add_argument(
+        "--rate_limit", type=float, default=0.0, help="Requests/s the fake API admits"
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Empty the fact tables and load state first (destructive; local DBs only)",
+    )
+    parser.add_argument("--baseline", type=str, default=None)
+    parser.add_argument("--save_baseline", type=str, default=None)
+    args, etl_args = parser.parse_known_args()
+
+    dataset = SyntheticDataset(args.campaigns, args.ads, args.payload_bytes)
+    params = {
+        "campaigns": args.campaigns,
+        "ads": args.ads,
+        "days": args.days,
+        "chunk_days": args.chunk_days,
+        "payload_bytes": args.payload_bytes,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "record_latency": args.record_latency,
+        "rate_limit": args.rate_limit,
+        "etl_args": etl_args,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != params:
+            print(f"Warning: baseline was measured with {baseline['params']}")
+
+    if args.truncate:
+        truncate_facts()
+    if args.chunk_days:
+        etl_args = ["--chunk_days", str(args.chunk_days), *etl_args]
+    with FakeCampaignsReportAPI(
+        dataset,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        record_latency=args.record_latency,
+        rate_limit=args.rate_limit,
+    ) as api:
+        started = time.perf_counter()
+        summary = run_etl(
+            api,
+            [
+                "--source_date",
+                SOURCE_DATE,
+                "--window",
+                str(args.days),
+                "--full_refresh",
+                *etl_args,
+            ],
+        )
+        elapsed = time.perf_counter() - started
+
+    report = stage_report(summary)
+    print(
+        f"{args.campaigns} campaigns x {args.ads} ads x {args.days} days: "
+        f"{api.requests} API requests ({api.errors} failed on purpose, "
+        f"{api.throttled} throttled), "
+        f"{api.bytes_sent / 1024**2:.1f} MiB sent, {elapsed:.1f}s including startup"
+    )
+    print_report(report, baseline)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "stages": report}, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+
+if __name__ == "__main__":
+    main()
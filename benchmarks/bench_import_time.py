@@ -0,0 +1,96 @@
+"""
+Measures the import time of extract_process_load with `python -X importtime` and fails
+(exit code 1) when it exceeds a budget or when a heavy dependency is imported at startup,
+so that startup regressions of short incremental jobs are caught. Modules already
+imported by a bare interpreter (site and its .pth hooks) are not counted. No database is
+needed.
+
+Usage: python -m benchmarks.bench_import_time --budget_ms 60
+       python -m benchmarks.bench_import_time --module etl.extract_data --allow requests
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "requests", "psycopg2", "boto3", "pyarrow"]
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Returns (name, depth, cumulative microseconds) of every import of `module`."""
+
+    code = f"import {module}" if module else "pass"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode:
+        sys.exit(f"{code} failed:\n{completed.stderr[-2000:]}")
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(cumulative)))
+    return imports
+
+
+def measure(module: str) -> Tuple[int, Dict[str, int], Set[str]]:
+    """
+    Returns the microseconds spent importing `module` beyond interpreter startup, the
+    cumulative time of each module it imports directly and the names of all it imports.
+    """
+
+    startup = {name for name, _, _ in import_times("")}
+    imports = [entry for entry in import_times(module) if entry[0] not in startup]
+    top_level = [(name, us) for name, depth, us in imports if depth == 0]
+    children = {name: us for name, depth, us in imports if depth == 1}
+    return sum(us for _, us in top_level), children, {name for name, _, _ in imports}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time")
+    parser.add_argument("--module", type=str, default="extract_process_load")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget_ms", type=float, default=60.0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--allow",
+        nargs="*",
+        default=[],
+        help="Heavy modules that may be imported at startup",
+    )
+    args = parser.parse_args()
+
+    # the first run compiles stale .pyc files and is not counted
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(total for total, _, _ in runs) / 1000
+    _, children, imported = min(runs, key=lambda run: run[0])
+
+    print(f"import {args.module}: {total_ms:.1f} ms (median of {args.runs} runs)")
+    print(f"{'module':>30} {'ms':>8}")
+    for name, us in sorted(children.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{name:>30} {us / 1000:>8.1f}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"{total_ms:.1f} ms exceeds the budget of {args.budget_ms} ms")
+    for heavy in sorted(set(HEAVY_MODULES) - set(args.allow)):
+        if heavy in imported:
+            failures.append(f"{heavy} is imported at startup")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
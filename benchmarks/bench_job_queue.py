@@ -0,0 +1,210 @@
+"""
+Measures how a backfill through the etl_jobs queue scales with the number of worker
+processes. For each worker count it empties the facts and the queue, seeds the jobs of a
+--days backfill and starts that many `extract_process_load.py worker` processes against
+the local fake campaigns-report API, then reports the wall time until the queue is
+drained. With --kill_one, one worker is killed (SIGKILL) once it holds a lease, to check
+that its jobs are claimed again when the lease expires. Arguments that are not
+recognized here are passed on to every worker.
+
+Usage: python -m benchmarks.bench_job_queue --days 168 --latency 0.2 --worker_counts 1 2 4
+       python -m benchmarks.bench_job_queue --days 56 --worker_counts 2 --kill_one
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.bench_e2e import ROOT, SOURCE_DATE, truncate_facts
+from benchmarks.fake_api import FakeCampaignsReportAPI, SyntheticDataset
+from configs.api import APIConfigs
+from etl.load_data import DataLoader
+
+
+def query(loader: DataLoader, sql: str) -> List[tuple]:
+    with loader.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchall() if cur.description else []
+
+
+def etl(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    """Starts the ETL with args in a subprocess writing its output to log_path."""
+
+    with open(log_path, "w", encoding="utf-8") as log:
+        return subprocess.Popen(
+            [sys.executable, "extract_process_load.py", *args],
+            cwd=ROOT,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+def tail(log_path: str) -> str:
+    with open(log_path, encoding="utf-8") as f:
+        return f.read()[-5000:]
+
+
+def run_backfill(
+    loader: DataLoader,
+    env: Dict[str, str],
+    days: int,
+    chunk_days: int,
+    workers: int,
+    lease_seconds: int,
+    kill_one: bool,
+    worker_args: List[str],
+) -> Dict[str, float]:
+    """Seeds the queue, runs workers processes until it is drained and returns stats."""
+
+    truncate_facts()
+    query(loader, "TRUNCATE etl_jobs, etl_dead_letters")
+    logs = tempfile.mkdtemp(prefix="bench_job_queue_")
+    seed_log = os.path.join(logs, "seed.log")
+    seed = etl(
+        [
+            "seed",
+            "--source_date",
+            SOURCE_DATE,
+            "--window",
+            str(days),
+            "--chunk_days",
+            str(chunk_days),
+        ],
+        env,
+        seed_log,
+    )
+    if seed.wait():
+        raise RuntimeError(f"Seeding failed:\n{tail(seed_log)}")
+
+    started = time.perf_counter()
+    processes = [
+        etl(
+            [
+                "worker",
+                "--worker_id",
+                f"bench-{index}",
+                "--lease_seconds",
+                str(lease_seconds),
+                "--poll_seconds",
+                "1",
+                "--full_refresh",
+                *worker_args,
+            ],
+            env,
+            os.path.join(logs, f"worker-{index}.log"),
+        )
+        for index in range(workers)
+    ]
+    killed = None
+    if kill_one:
+        while killed is None and processes[0].poll() is None:
+            if query(
+                loader,
+                "SELECT 1 FROM etl_jobs "
+                "WHERE lease_owner = 'bench-0' AND status = 'running'",
+            ):
+                processes[0].send_signal(signal.SIGKILL)
+                killed = processes[0]
+            time.sleep(0.05)
+    for index, process in enumerate(processes):
+        if process.wait() and process is not killed:
+            print(tail(os.path.join(logs, f"worker-{index}.log")))
+            raise RuntimeError(f"Worker failed with exit code {process.returncode}")
+    elapsed = time.perf_counter() - started
+
+    counts = dict(
+        query(loader, "SELECT status, count(*) FROM etl_jobs GROUP BY status")
+    )
+    retried = query(loader, "SELECT count(*) FROM etl_jobs WHERE attempts > 1")[0][0]
+    return {
+        "seconds": elapsed,
+        "jobs": sum(counts.values()),
+        "done": counts.get("done", 0),
+        "retried": retried,
+        "killed": killed is not None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job queue scaling benchmark")
+    parser.add_argument("--campaigns", type=int, default=10)
+    parser.add_argument("--ads", type=int, default=5, help="Ads per campaign")
+    parser.add_argument("--days", type=int, default=112, help="Days backfilled")
+    parser.add_argument("--chunk_days", type=int, default=7, help="Days per job")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per call")
+    parser.add_argument(
+        "--rate_limit", type=float, default=0.0, help="Requests/s the fake API admits"
+    )
+    parser.add_argument("--worker_counts", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--lease_seconds", type=int, default=5)
+    parser.add_argument(
+        "--kill_one",
+        action="store_true",
+        help="Kill the first worker once it holds a lease",
+    )
+    args, worker_args = parser.parse_known_args()
+
+    loader = DataLoader(
+        user=os.getenv("user"),
+        password=os.getenv("password"),
+        host=os.getenv("host"),
+        port=os.getenv("port"),
+        dbname=os.getenv("dbname"),
+    )
+    dataset = SyntheticDataset(args.campaigns, args.ads)
+    print(
+        f"{args.campaigns} campaigns x {args.ads} ads, {args.days} days in "
+        f"{args.chunk_days}-day jobs, {args.latency}s latency"
+    )
+    print(
+        f"{'workers':>8} {'seconds':>9} {'jobs':>6} {'jobs/s':>8} {'speedup':>8} "
+        f"{'retried':>8} {'requests':>9}"
+    )
+    base = None
+    failed = False
+    try:
+        for workers in args.worker_counts:
+            with FakeCampaignsReportAPI(
+                dataset, latency=args.latency, rate_limit=args.rate_limit
+            ) as api:
+                env = {
+                    **os.environ,
+                    APIConfigs.base_url_env: api.url,
+                    "x_api_key": api.api_key,
+                }
+                stats = run_backfill(
+                    loader,
+                    env,
+                    args.days,
+                    args.chunk_days,
+                    workers,
+                    args.lease_seconds,
+                    args.kill_one,
+                    worker_args,
+                )
+            base = base or stats["seconds"] * args.worker_counts[0]
+            print(
+                f"{workers:>8} {stats['seconds']:>9.1f} {stats['jobs']:>6} "
+                f"{stats['jobs'] / stats['seconds']:>8.2f} "
+                f"{base / stats['seconds']:>7.2f}x {stats['retried']:>8} "
+                f"{api.requests:>9}"
+                + (" (one worker killed)" if stats["killed"] else "")
+            )
+            if stats["done"] != stats["jobs"]:
+                print(f"FAIL: only {stats['done']}/{stats['jobs']} jobs are done")
+                failed = True
+    finally:
+        loader.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
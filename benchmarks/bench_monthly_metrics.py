@@ -0,0 +1,73 @@
+"""
+Compares the read latency of the rollup-backed monthly_campaign_metrics view with
+monthly_campaign_metrics_live, which aggregates the fact tables on every read, and
+checks that both return the same report.
+
+Usage: python -m benchmarks.bench_monthly_metrics --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import time
+from typing import Any, List, Tuple
+from dotenv import load_dotenv
+
+from etl.load_data import DataLoader
+
+VIEWS = ("monthly_campaign_metrics_live", "monthly_campaign_metrics")
+
+
+def timed_query(loader: DataLoader, view: str) -> Tuple[float, List[Tuple[Any, ...]]]:
+    with loader.connection() as conn:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            cur.execute(f"SELECT * FROM {view}")
+            rows = cur.fetchall()
+            return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the monthly report views")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    loader = DataLoader(
+        user=os.getenv("user"),
+        password=os.getenv("password"),
+        host=os.getenv("host"),
+        port=os.getenv("port"),
+        dbname=os.getenv("dbname"),
+    )
+    try:
+        start = time.perf_counter()
+        loader.refresh_monthly_rollup()
+        refresh_s = time.perf_counter() - start
+
+        timings, results = {}, {}
+        for view in VIEWS:
+            timed_query(loader, view)  # warm the buffer cache
+            timings[view] = []
+            for _ in range(args.repeat):
+                elapsed, rows = timed_query(loader, view)
+                timings[view].append(elapsed)
+            results[view] = rows
+    finally:
+        loader.close()
+
+    print(f"full rollup refresh: {refresh_s * 1000:.1f} ms")
+    print(f"{'view':>30} {'rows':>8} {'p50 ms':>10} {'p95 ms':>10}")
+    for view in VIEWS:
+        samples = sorted(timings[view])
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        print(
+            f"{view:>30} {len(results[view]):>8} "
+            f"{statistics.median(samples) * 1000:>10.2f} {p95 * 1000:>10.2f}"
+        )
+    same = results[VIEWS[0]] == results[VIEWS[1]]
+    print(f"results identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
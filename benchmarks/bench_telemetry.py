@@ -0,0 +1,57 @@
+"""
+Measures the per-call cost of the telemetry hooks (counter, histogram observation and
+timer) while disabled and enabled, against an empty loop. No database is needed.
+
+Usage: python -m benchmarks.bench_telemetry --calls 1000000
+"""
+
+import argparse
+import time
+from typing import Callable
+
+from etl.telemetry import Telemetry
+
+
+def per_call_ns(fn: Callable[[], None], calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark telemetry overhead")
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    telemetry = Telemetry()
+
+    def baseline():
+        pass
+
+    def counter():
+        telemetry.inc("rows_total", 10, table="fact")
+
+    def histogram():
+        telemetry.observe("write_seconds", 0.01, table="fact")
+
+    def timer():
+        with telemetry.timer("write_seconds", table="fact"):
+            pass
+
+    hooks = [("counter", counter), ("histogram", histogram), ("timer", timer)]
+    empty_ns = per_call_ns(baseline, args.calls)
+    results = []
+    for enabled in (False, True):
+        telemetry.enabled = enabled
+        for name, fn in hooks:
+            results.append((name, enabled, per_call_ns(fn, args.calls) - empty_ns))
+
+    print(f"empty call: {empty_ns:.0f} ns")
+    print(f"{'hook':>10} {'enabled':>8} {'ns/call':>10}")
+    for name, enabled, ns in results:
+        print(f"{name:>10} {str(enabled):>8} {ns:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compares the record-by-record and the columnar (--columnar) ad-level transforms of
+DataProcessor on synthetic payloads, every tenth of which carries two lifeday entries.
+Checks that both produce the same rows and that every entry got its own metrics row.
+No database is needed.
+
+Usage: python -m benchmarks.bench_transform --records 10000 100000 1000000
+"""
+
+import argparse
+import gc
+import itertools
+import random
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from etl.dimension_cache import DimensionCache
+from etl.process_data import DataProcessor
+
+
+def generate_records(n_records: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    start = date(2024, 1, 1)
+    records = []
+    for i in range(n_records):
+        clicks = rnd.randint(1, 500)
+        records.append(
+            {
+                "campaign": f"Campaign_{i % 20}",
+                "ad": f"Ad_{i % 400}",
+                "date": (start + timedelta(days=i // 400 % 365)).isoformat(),
+                "cost": round(rnd.uniform(0, 1000), 2),
+                "impressions": rnd.randint(clicks, 50000),
+                "clicks": clicks,
+                "registrations": rnd.randint(0, clicks),
+                "ctr": rnd.random(),
+                "cr": rnd.random(),
+                "cpc": rnd.random(),
+                "metrics": [
+                    {
+                        "lifeday": [1, 3, 7, 14][i % 4],
+                        "players": rnd.randint(0, 1000),
+                        "payers": rnd.randint(0, 100),
+                        "payments": rnd.randint(0, 200),
+                        "revenue": round(rnd.uniform(0, 500), 2),
+                    }
+                ],
+            }
+        )
+        if i % 10 == 0:
+            # a later lifeday of the same record, exploded into a row of its own
+            records[-1]["metrics"].append(
+                {
+                    "lifeday": 30,
+                    "players": rnd.randint(0, 1000),
+                    "payers": rnd.randint(0, 100),
+                    "payments": rnd.randint(0, 200),
+                    "revenue": round(rnd.uniform(0, 500), 2),
+                }
+            )
+    return records
+
+
+def in_memory_processor(columnar: bool = False) -> DataProcessor:
+    """A processor whose id caches hand out sequential ids instead of querying Postgres."""
+
+    counter = itertools.count(1)
+
+    def resolver(names):
+        return {name: next(counter) for name in sorted(names)}
+
+    return DataProcessor(
+        loader=None,
+        campaign_cache=DimensionCache(resolver),
+        ad_cache=DimensionCache(resolver),
+        columnar=columnar,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataProcessor transforms")
+    parser.add_argument(
+        "--records", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    args = parser.parse_args()
+
+    print(
+        f"{'records':>10} {'records s':>10} {'columnar s':>11} {'speedup':>8} "
+        f"{'metrics rows':>13} {'equal':>6}"
+    )
+    for n_records in args.records:
+        data = generate_records(n_records)
+        timings, outputs = [], []
+        for columnar in (False, True):
+            best = float("inf")
+            for _ in range(args.repeat):
+                processor = in_memory_processor(columnar)
+                output = None
+                gc.collect()
+                start = time.perf_counter()
+                output = processor.process_campaign_ad_data(data)
+                best = min(best, time.perf_counter() - start)
+            outputs.append(output)
+            timings.append(best)
+        entries = sum(len(record["metrics"]) for record in data)
+        assert len(outputs[0][1]) == entries, (len(outputs[0][1]), entries)
+        print(
+            f"{n_records:>10} {timings[0]:>10.2f} {timings[1]:>11.2f} "
+            f"{timings[0] / timings[1]:>7.2f}x {entries:>13} "
+            f"{str(outputs[0] == outputs[1]):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
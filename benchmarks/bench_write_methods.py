@@ -0,0 +1,156 @@
+"""
+Compares the executemany-based upsert, the COPY-based copy_upsert and the scoped replace of
+DataLoader.write_data on a scratch copy of fact_campaign_ad_metrics: rows are inserted, then
+the same period is reloaded. replace is measured on a plain table (scoped DELETE and COPY)
+and on a monthly partitioned one (shadow partitions swapped in). The size of the table after
+the reload shows the dead row versions each method leaves behind.
+
+Usage: python -m benchmarks.bench_write_methods --rows 10000 50000
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+from typing import Any, List, Tuple
+from dotenv import load_dotenv
+
+from etl.load_data import DataLoader, ReplaceScope
+from configs.api import SchemaConfigs
+
+TABLE = "bench_fact_campaign_ad_metrics"
+COLUMNS = SchemaConfigs.column_data["fact_campaign_ad_metrics"]
+UPSERT_ON = ["campaign_id", "ad_id", "execution_date", "lifeday"]
+
+
+def generate_rows(n_rows: int, seed: int = 0) -> List[Tuple[Any, ...]]:
+    rnd = random.Random(seed)
+    rows, start = [], date(2024, 1, 1)
+    lifedays = [1, 3, 7, 14]
+    for i in range(n_rows):
+        # unique (campaign, ad, date, lifeday) keys
+        lifeday = lifedays[i % 4]
+        ad_id = (i // 4) % 250 + 1
+        day = start + timedelta(days=i // 1000)
+        rows.append(
+            (
+                ad_id % 10 + 1,
+                ad_id,
+                day.isoformat(),
+                lifeday,
+                rnd.randint(0, 5000),
+                rnd.randint(0, 500),
+                rnd.randint(0, 1000),
+                round(rnd.uniform(0, 1000), 2),
+            )
+        )
+    return rows
+
+
+def timed_write(loader: DataLoader, rows: List[Tuple[Any, ...]], method: str) -> float:
+    dates = [row[2] for row in rows]
+    scope = ReplaceScope(
+        min(dates), (date.fromisoformat(max(dates)) + timedelta(days=1)).isoformat()
+    )
+    start = time.perf_counter()
+    loader.write_data(
+        TABLE,
+        rows,
+        COLUMNS,
+        write_method=method,
+        upsert_on=UPSERT_ON,
+        replace_scope=scope if method == "replace" else None,
+    )
+    return time.perf_counter() - start
+
+
+def create_table(loader: DataLoader, partitioned: bool, rows: List[Tuple[Any, ...]]):
+    with loader.connection() as conn:
+        with conn.cursor() as cur:
+            if partitioned:
+                dates = [row[2] for row in rows]
+                cur.execute(
+                    f"""
+                    CREATE TABLE {TABLE} (
+                        LIKE fact_campaign_ad_metrics
+                            INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+                        UNIQUE ({', '.join(UPSERT_ON)})
+                    ) PARTITION BY RANGE (execution_date);
+                    CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT;
+                    SELECT create_monthly_partitions(%s, %s, %s);
+                    """,
+                    (TABLE, min(dates), max(dates)),
+                )
+            else:
+                cur.execute(
+                    f"CREATE TABLE {TABLE} "
+                    f"(LIKE fact_campaign_ad_metrics INCLUDING ALL)"
+                )
+
+
+def table_bytes(loader: DataLoader) -> int:
+    """Size of the table, its partitions and their indexes."""
+
+    with loader.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT coalesce(
+                    (SELECT sum(pg_total_relation_size(relid))
+                     FROM pg_partition_tree(%s)),
+                    pg_total_relation_size(%s)
+                )
+                """,
+                (TABLE, TABLE),
+            )
+            return int(cur.fetchone()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataLoader write methods")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+
+    load_dotenv()
+    loader = DataLoader(
+        user=os.getenv("user"),
+        password=os.getenv("password"),
+        host=os.getenv("host"),
+        port=os.getenv("port"),
+        dbname=os.getenv("dbname"),
+    )
+    results = []
+    try:
+        for n_rows in args.rows:
+            rows = generate_rows(n_rows)
+            for method, partitioned in (
+                ("upsert", False),
+                ("copy_upsert", False),
+                ("replace", False),
+                ("replace", True),
+            ):
+                loader.drop_table(TABLE)
+                create_table(loader, partitioned, rows)
+                insert_s = timed_write(loader, rows, method)
+                update_s = timed_write(loader, generate_rows(n_rows, seed=1), method)
+                label = f"{method} (partitioned)" if partitioned else method
+                results.append((n_rows, label, insert_s, update_s, table_bytes(loader)))
+    finally:
+        loader.drop_table(TABLE)
+        loader.close()
+
+    print(
+        f"{'rows':>10} {'method':>23} {'insert s':>10} {'reload s':>10} "
+        f"{'rows/s':>12} {'MiB after':>10}"
+    )
+    for n_rows, method, insert_s, update_s, size in results:
+        rate = 2 * n_rows / (insert_s + update_s)
+        print(
+            f"{n_rows:>10} {method:>23} {insert_s:>10.2f} {update_s:>10.2f} "
+            f"{rate:>12.0f} {size / 1024**2:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Local stand-in for the campaigns-report API, serving deterministic synthetic data.
+
+Ad-level (lod="a") responses hold one record per campaign, ad and day of the requested
+period. Campaign-level (lod="c") responses are exact rollups of them. Latency, error rate
+and payload size can be configured. The server checks the x-api-key header and, like the
+real API, answers with gzip when the client accepts it.
+
+Usage: python -m benchmarks.fake_api --port 8080 --campaigns 20 --ads 10 --latency 0.05
+"""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from configs.api import APIConfigs
+
+
+class SyntheticDataset:
+    """
+    Deterministic campaigns-report payloads. Every (campaign, ad, day) gets the same
+    values in every response, so repeated and overlapping requests agree with each other.
+    """
+
+    def __init__(
+        self,
+        campaigns: int = 10,
+        ads_per_campaign: int = 5,
+        payload_bytes: int = 0,
+        seed: int = 0,
+    ) -> None:
+        self.campaigns = campaigns
+        self.ads_per_campaign = ads_per_campaign
+        # padding added to every record to emulate wider payloads
+        self.padding = "x" * payload_bytes
+        self.seed = seed
+
+    @staticmethod
+    def _days(period_from: str, period_to: str) -> List[str]:
+        # period_to is excluded, as by the real API
+        day, end = date.fromisoformat(period_from), date.fromisoformat(period_to)
+        days = []
+        while day < end:
+            days.append(day.isoformat())
+            day += timedelta(days=1)
+        return days
+
+    def _ad_record(
+        self, day: str, campaign: int, ad: int, lifeday: int
+    ) -> Dict[str, Any]:
+        rnd = random.Random(f"{self.seed}:{day}:{campaign}:{ad}")
+        impressions = rnd.randint(1000, 50000)
+        clicks = rnd.randint(10, impressions // 20)
+        registrations = rnd.randint(1, clicks)
+        cost = round(clicks * rnd.uniform(0.05, 2.0), 2)
+        players = rnd.randint(0, registrations)
+        # lifeday metrics grow with the lifeday, as cohorts mature
+        growth = {1: 1.0, 3: 1.4, 7: 1.8, 14: 2.2}.get(lifeday, 1.0)
+        payers = int(players * rnd.uniform(0, 0.2))
+        record = {
+            "campaign": f"Campaign {campaign}",
+            "ad": f"Campaign {campaign} / Ad {ad}",
+            "date": day,
+            "cost": cost,
+            "impressions": impressions,
+            "clicks": clicks,
+            "registrations": registrations,
+            "ctr": clicks / impressions,
+            "cr": registrations / clicks,
+            "cpc": cost / clicks,
+            "metrics": [
+                {
+                    "lifeday": lifeday,
+                    "players": players,
+                    "payers": int(payers * growth),
+                    "payments": int(payers * growth * rnd.uniform(1, 3)),
+                    "revenue": round(payers * growth * rnd.uniform(1, 30), 2),
+                }
+            ],
+        }
+        if self.padding:
+            record["padding"] = self.padding
+        return record
+
+    def ad_records(
+        self, period_from: str, period_to: str, lifeday: int
+    ) -> List[Dict[str, Any]]:
+        return [
+            self._ad_record(day, campaign, ad, lifeday)
+            for day in self._days(period_from, period_to)
+            for campaign in range(1, self.campaigns + 1)
+            for ad in range(1, self.ads_per_campaign + 1)
+        ]
+
+    def campaign_records(
+        self, period_from: str, period_to: str, lifeday: int
+    ) -> List[Dict[str, Any]]:
+        rollups = {}
+        for record in self.ad_records(period_from, period_to, lifeday):
+            key = (record["campaign"], record["date"])
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = {
+                    "campaign": record["campaign"],
+                    "date": record["date"],
+                    **{
+                        f: 0 for f in ("cost", "impressions", "clicks", "registrations")
+                    },
+                    "metrics": [
+                        {
+                            "lifeday": lifeday,
+                            **{f: 0 for f in ("players", "payers", "payments")},
+                            "revenue": 0,
+                        }
+                    ],
+                }
+            for field in ("cost", "impressions", "clicks", "registrations"):
+                rollup[field] += record[field]
+            for field in ("players", "payers", "payments", "revenue"):
+                rollup["metrics"][0][field] += record["metrics"][0][field]
+
+        records = list(rollups.values())
+        for rollup in records:
+            rollup["cost"] = round(rollup["cost"], 2)
+            rollup["metrics"][0]["revenue"] = round(rollup["metrics"][0]["revenue"], 2)
+            rollup["ctr"] = rollup["clicks"] / rollup["impressions"]
+            rollup["cr"] = rollup["registrations"] / rollup["clicks"]
+            rollup["cpc"] = rollup["cost"] / rollup["clicks"]
+            if self.padding:
+                rollup["padding"] = self.padding
+        return records
+
+    def records(
+        self, lod: str, period_from: str, period_to: str, lifeday: int
+    ) -> List[Dict[str, Any]]:
+        if lod == "a":
+            return self.ad_records(period_from, period_to, lifeday)
+        return self.campaign_records(period_from, period_to, lifeday)
+
+
+class FakeCampaignsReportAPI:
+    """
+    Threaded HTTP server answering GET /campaigns-report from a SyntheticDataset. Each
+    request is delayed by latency seconds plus record_latency seconds per returned record,
+    and fails with a 503 with probability error_rate. With rate_limit, requests beyond that
+    many per second are throttled with a 429 carrying a Retry-After.
+    """
+
+    def __init__(
+        self,
+        dataset: SyntheticDataset,
+        api_key: str = "local-api-key",
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        record_latency: float = 0.0,
+        rate_limit: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ) -> None:
+        self.dataset = dataset
+        self.api_key = api_key
+        self.latency = latency
+        self.error_rate = error_rate
+        self.record_latency = record_latency
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        # token bucket of the server-side rate limit, holding up to one second of requests
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def _admit(self) -> bool:
+        """Takes a token of the rate limit; call with the lock held."""
+
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit
+        )
+        self._refilled = now
+        if self._tokens < 1:
+            self.throttled += 1
+            return False
+        self._tokens -= 1
+        return True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def _send(
+                self,
+                status: int,
+                payload: Any,
+                headers: Optional[Dict[str, str]] = None,
+            ) -> None:
+                body = json.dumps(payload).encode()
+                gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+                if gzipped:
+                    body = gzip.compress(body, compresslevel=5)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if gzipped:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up waiting, e.g. on a read timeout
+                    return
+                with api._lock:
+                    api.bytes_sent += len(body)
+
+            def do_GET(self) -> None:
+                with api._lock:
+                    api.requests += 1
+                    failed = api._random.random() < api.error_rate
+                    admitted = api._admit()
+                if api.latency:
+                    time.sleep(api.latency)
+
+                url = urlparse(self.path)
+                if url.path.strip("/") != APIConfigs.campaigns_endpoint:
+                    return self._send(404, {"message": "Not Found"})
+                if self.headers.get("x-api-key") != api.api_key:
+                    return self._send(403, {"message": "Forbidden"})
+                if not admitted:
+                    return self._send(
+                        429, {"message": "Too Many Requests"}, {"Retry-After": "1"}
+                    )
+                if failed:
+                    with api._lock:
+                        api.errors += 1
+                    return self._send(503, {"message": "Service Unavailable"})
+
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                try:
+                    lod = params["lod"]
+                    lifeday = int(params["lifedays"])
+                    period_from = params["period_from"]
+                    period_to = params["period_to"]
+                    date.fromisoformat(period_from), date.fromisoformat(period_to)
+                    if lod not in ("a", "c"):
+                        raise ValueError(f"unknown lod {lod}")
+                except (KeyError, ValueError) as e:
+                    return self._send(400, {"message": f"Bad Request: {e}"})
+                records = api.dataset.records(lod, period_from, period_to, lifeday)
+                if api.record_latency:
+                    # emulates an API whose response time grows with the window
+                    time.sleep(api.record_latency * len(records))
+                self._send(200, records)
+
+        return Handler
+
+    def start(self) -> "FakeCampaignsReportAPI":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-api", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeCampaignsReportAPI":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake campaigns-report API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--campaigns", type=int, default=10)
+    parser.add_argument("--ads", type=int, default=5, help="Ads per campaign")
+    parser.add_argument("--payload_bytes", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--record_latency", type=float, default=0.0)
+    parser.add_argument("--rate_limit", type=float, default=0.0, help="Requests/s")
+    parser.add_argument("--api_key", type=str, default="local-api-key")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(args.campaigns, args.ads, args.payload_bytes)
+    api = FakeCampaignsReportAPI(
+        dataset,
+        api_key=args.api_key,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        record_latency=args.record_latency,
+        rate_limit=args.rate_limit,
+        port=args.port,
+    )
+    print(
+        f"Serving {api.url}/{APIConfigs.campaigns_endpoint}; run the ETL with "
+        f"api_base_url={api.url} x_api_key={args.api_key}"
+    )
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
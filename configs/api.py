@@ -3,9 +3,131 @@ import json
 
 class APIConfigs:
     base_url = "https://api.sdetest.volka.team"
+    # env variable overriding base_url, e.g. to point the ETL at a local stand-in API
+    base_url_env = "api_base_url"
     lifeday_periods = [1,3,7,14]
     campaigns_endpoint = "campaigns-report"
     window = 7
+    # upper bound on in-flight requests for the concurrent extraction mode
+    max_concurrency = 4
+    # extra days a lifeday metric is given to settle before its window is final
+    maturation_buffer_days = 1
+    # pooled keep-alive connections held by the shared HTTP session
+    pool_size = 10
+    # seconds a request may wait for the API to connect or send data
+    request_timeout = 10
+
+class RateLimitConfigs:
+    # requests/s the token bucket starts from and the bounds it adapts within
+    initial_rate = 4.0
+    min_rate = 0.2
+    max_rate = 50.0
+    # requests that may be sent back to back after an idle period
+    burst = 4
+    # additive increase (requests/s gained per second of successes) and multiplicative
+    # decrease applied on a 429 or 5xx, at most once per cooldown
+    increase = 1.0
+    decrease_factor = 0.5
+    decrease_cooldown_seconds = 1.0
+    # random extra delay added to Retry-After pauses and retry backoffs
+    jitter_seconds = 1.0
+    # attempts per request for failures, and extra attempts allowed for throttling
+    max_retries = 5
+    max_throttled_retries = 20
+    # exponential backoff between failed attempts (full jitter), and the longest
+    # Retry-After that is honoured
+    backoff_base_seconds = 1.0
+    backoff_cap_seconds = 30.0
+    max_retry_after_seconds = 120.0
+    # consecutive failed attempts that open the circuit breaker, and how often it then
+    # lets a probe request through
+    breaker_failures = 10
+    breaker_reset_seconds = 30.0
+
+class SecretConfigs:
+    # how long a fetched API key is trusted before it is looked up again
+    ttl_seconds = 3600
+    # env variables enabling the encrypted on-disk cache shared across processes
+    cache_path_env = "secret_cache_path"
+    cache_key_env = "secret_cache_key"
+
+class DatabaseConfigs:
+    # bounds of the thread-safe psycopg2 connection pool held by DataLoader
+    min_connections = 1
+    max_connections = 10
+    # campaign/ad name -> id entries kept in memory for the whole run
+    dimension_cache_size = 50000
+    # write method used for the fact tables; copy_upsert stages rows with COPY, replace
+    # swaps in the months of each window rebuilt in shadow partitions
+    # (see benchmarks/bench_write_methods.py)
+    write_method = "copy_upsert"
+    # skip upserts of rows whose content hash did not change
+    detect_changes = True
+    # bytes read from the server per chunk of a COPY TO STDOUT export
+    copy_buffer_bytes = 1024**2
+
+class SchedulerConfigs:
+    # worker threads running (window, lod) units of a backfill
+    workers = 1
+    # units allowed to talk to the API / to Postgres at the same time
+    api_concurrency = 2
+    db_concurrency = 4
+
+class StreamConfigs:
+    # rows buffered per table before they are flushed to Postgres
+    batch_size = 5000
+    # API responses allowed to wait for the transform before extraction blocks
+    queue_size = 2
+
+class LandingCacheConfigs:
+    # local directory holding raw API responses as gzip-compressed JSONL
+    root = ".landing_cache"
+    # eviction thresholds applied at the end of a run
+    max_bytes = 2 * 1024**3
+    max_age_days = 90
+
+class DeadLetterConfigs:
+    # where failed windows and records are kept: "postgres" (etl_dead_letters), "sqlite",
+    # "jsonl" or "off"
+    store = "postgres"
+    sqlite_path = ".dead_letters.sqlite"
+    jsonl_path = ".dead_letters.jsonl"
+
+class JobConfigs:
+    # a claimed job is given back to the queue when its worker misses heartbeats for
+    # lease_seconds, e.g. because the process or its host died; the worker extends its
+    # leases every lease_seconds / heartbeats_per_lease
+    lease_seconds = 120
+    heartbeats_per_lease = 4
+    # claims of a job (including those whose lease expired) before it is marked failed
+    max_attempts = 3
+    # days covered by each seeded job of a lod without a learned window size
+    chunk_days = 7
+    # seconds an idle worker waits before looking for new or expired jobs again
+    poll_seconds = 10
+
+class ExportConfigs:
+    # rows fetched from the server-side cursor, and written as one Parquet row group, at a time
+    chunk_rows = 50000
+
+class WindowConfigs:
+    # bounds of the adaptive extraction windows, in days
+    min_days = 1
+    max_days = 92
+    # windows grow while responses are faster than half of target_seconds and hold fewer
+    # than half of max_records, and are halved when either is exceeded
+    target_seconds = 3.0
+    max_records = 50000
+    # responses announcing a larger (compressed) body are abandoned and their window split
+    max_response_bytes = 32 * 1024**2
+    # upper bound on how much a window grows after one response
+    growth_factor = 2
+
+class TelemetryConfigs:
+    # upper bounds (seconds) of the latency histogram buckets
+    latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+    # prefix of every exported metric name
+    namespace = "etl"
 
 class SchemaConfigs:
     # columns that are being filled from the API
@@ -55,4 +177,18 @@ class SchemaConfigs:
         "payments",
         "revenue",
     ]
-}
\ No newline at end of file
+}
+
+    # conflict keys used when upserting into each fact table
+    upsert_keys = {
+        "fact_campaign_ad_performance": ["campaign_id", "ad_id", "execution_date"],
+        "fact_campaign_ad_metrics": ["campaign_id", "ad_id", "execution_date", "lifeday"],
+        "fact_campaign_performance": ["campaign_id", "execution_date"],
+        "fact_campaign_metrics": ["campaign_id", "execution_date", "lifeday"],
+    }
+
+    # fact tables written for each level of detail
+    lod_tables = {
+        "a": ["fact_campaign_ad_performance", "fact_campaign_ad_metrics"],
+        "c": ["fact_campaign_performance", "fact_campaign_metrics"],
+    }
@@ -0,0 +1,305 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from contextlib import closing
+from datetime import date, datetime, timezone
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from etl.load_data import DataLoader
+from configs.api import DeadLetterConfigs as Config
+
+
+class DeadLetter(NamedTuple):
+    """
+    A failed unit of the ETL: a "window" whose (lod, period_from, period_to) unit failed,
+    or a "record" of the payload that could not be transformed. Letters are keyed by what
+    failed, so a recurring failure bumps the attempts of its pending letter.
+    """
+
+    key: str
+    kind: str
+    lod: str
+    period_from: Optional[str]
+    period_to: Optional[str]
+    payload: Optional[Dict[str, Any]]
+    reason: str
+    attempts: int = 1
+
+
+def window_letter(
+    lod: str,
+    period_from: str,
+    period_to: str,
+    reason: str,
+    payload: Optional[Dict[str, Any]] = None,
+) -> DeadLetter:
+    key = f"window:{lod}:{period_from}:{period_to}"
+    return DeadLetter(key, "window", lod, period_from, period_to, payload, reason)
+
+
+def record_letter(lod: str, record: Dict[str, Any], reason: str) -> DeadLetter:
+    digest = hashlib.sha256(
+        json.dumps(record, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    execution_date = record.get("date") if isinstance(record, dict) else None
+    try:
+        # a malformed date may be why the record failed; it is then only kept in the payload
+        execution_date = date.fromisoformat(execution_date).isoformat()
+    except (TypeError, ValueError):
+        execution_date = None
+    return DeadLetter(
+        f"record:{lod}:{digest}", "record", lod, execution_date, None, record, reason
+    )
+
+
+class DeadLetterStore:
+    """Base class for stores of dead letters."""
+
+    def add(self, letters: List[DeadLetter]) -> None:
+        """Records letters, bumping the attempts of those already pending."""
+
+        raise NotImplementedError
+
+    def pending(self, kind: Optional[str] = None) -> List[DeadLetter]:
+        """Returns the letters (of one kind) that have not been replayed yet."""
+
+        raise NotImplementedError
+
+    def resolve(self, keys: Iterable[str]) -> None:
+        """Marks the letters of keys as replayed."""
+
+        raise NotImplementedError
+
+
+class JsonlDeadLetterStore(DeadLetterStore):
+    """
+    Append-only JSON lines log of "add" and "resolve" entries. The pending letters are
+    rebuilt by reading the log, so a crash can at worst lose the line being written.
+    """
+
+    def __init__(self, path: str = Config.jsonl_path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        lines = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def add(self, letters: List[DeadLetter]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        self._append(
+            [{"op": "add", "at": now, **letter._asdict()} for letter in letters]
+        )
+
+    def pending(self, kind: Optional[str] = None) -> List[DeadLetter]:
+        letters = {}
+        if os.path.exists(self.path):
+            with self._lock, open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["op"] == "resolve":
+                        letters.pop(entry["key"], None)
+                        continue
+                    previous = letters.get(entry["key"])
+                    attempts = previous.attempts + 1 if previous else 1
+                    letters[entry["key"]] = DeadLetter(
+                        **{
+                            field: entry[field]
+                            for field in DeadLetter._fields
+                            if field != "attempts"
+                        },
+                        attempts=attempts,
+                    )
+        return [
+            letter for letter in letters.values() if kind is None or letter.kind == kind
+        ]
+
+    def resolve(self, keys: Iterable[str]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        self._append([{"op": "resolve", "at": now, "key": key} for key in keys])
+
+
+class SqliteDeadLetterStore(DeadLetterStore):
+    """Dead letters in a local SQLite database, for runs without a shared database."""
+
+    def __init__(self, path: str = Config.sqlite_path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    lod TEXT NOT NULL,
+                    period_from TEXT,
+                    period_to TEXT,
+                    payload TEXT,
+                    reason TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    failed_at TEXT NOT NULL,
+                    replayed_at TEXT
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # a connection per call keeps the store usable from every worker thread
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, letters: List[DeadLetter]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (
+                letter.key,
+                letter.kind,
+                letter.lod,
+                letter.period_from,
+                letter.period_to,
+                json.dumps(letter.payload, default=str),
+                letter.reason,
+                now,
+            )
+            for letter in letters
+        ]
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                """
+                INSERT INTO dead_letters
+                    (key, kind, lod, period_from, period_to, payload, reason, failed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    reason = excluded.reason,
+                    failed_at = excluded.failed_at,
+                    attempts = CASE WHEN replayed_at IS NULL THEN attempts + 1 ELSE 1 END,
+                    replayed_at = NULL
+                """,
+                rows,
+            )
+
+    def pending(self, kind: Optional[str] = None) -> List[DeadLetter]:
+        with self._lock, closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT key, kind, lod, period_from, period_to, payload, reason, attempts
+                FROM dead_letters
+                WHERE replayed_at IS NULL AND (? IS NULL OR kind = ?)
+                ORDER BY kind, lod, period_from, key
+                """,
+                (kind, kind),
+            ).fetchall()
+        return [DeadLetter(*row[:5], json.loads(row[5]), *row[6:]) for row in rows]
+
+    def resolve(self, keys: Iterable[str]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE dead_letters SET replayed_at = ? WHERE key = ?",
+                [(now, key) for key in keys],
+            )
+
+
+class PostgresDeadLetterStore(DeadLetterStore):
+    """Dead letters in the etl_dead_letters table, next to the facts they belong to."""
+
+    def __init__(self, loader: DataLoader) -> None:
+        self.loader = loader
+
+    def add(self, letters: List[DeadLetter]) -> None:
+        rows = [
+            (
+                letter.key,
+                letter.kind,
+                letter.lod,
+                letter.period_from,
+                letter.period_to,
+                json.dumps(letter.payload, default=str),
+                letter.reason,
+            )
+            for letter in letters
+        ]
+        try:
+            # isolated, so that the letters survive the rollback of the failed unit
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO etl_dead_letters
+                            (key, kind, lod, period_from, period_to, payload, reason)
+                        VALUES (%s, %s, %s, %s, %s, %s::JSONB, %s)
+                        ON CONFLICT (key) DO UPDATE SET
+                            reason = EXCLUDED.reason,
+                            failed_at = now(),
+                            attempts = CASE
+                                WHEN etl_dead_letters.replayed_at IS NULL
+                                THEN etl_dead_letters.attempts + 1 ELSE 1 END,
+                            replayed_at = NULL
+                        """,
+                        rows,
+                    )
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.add.__name__}: an error occurred while recording dead letters: {e}"
+            )
+            raise
+
+    def pending(self, kind: Optional[str] = None) -> List[DeadLetter]:
+        try:
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT key, kind, lod, period_from::TEXT, period_to::TEXT,
+                            payload, reason, attempts
+                        FROM etl_dead_letters
+                        WHERE replayed_at IS NULL AND (%s IS NULL OR kind = %s)
+                        ORDER BY kind, lod, period_from, key
+                        """,
+                        (kind, kind),
+                    )
+                    return [DeadLetter(*row) for row in cur.fetchall()]
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.pending.__name__}: an error occurred while reading dead letters: {e}"
+            )
+            raise
+
+    def resolve(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        UPDATE etl_dead_letters SET replayed_at = now()
+                        WHERE key = ANY(%s) AND replayed_at IS NULL
+                        """,
+                        (keys,),
+                    )
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.resolve.__name__}: an error occurred while resolving dead letters: {e}"
+            )
+            raise
+
+
+def open_dead_letter_store(
+    kind: str, loader: DataLoader, path: Optional[str] = None
+) -> Optional[DeadLetterStore]:
+    """Returns the store of kind ("postgres", "sqlite", "jsonl"), or None for "off"."""
+
+    if kind == "postgres":
+        return PostgresDeadLetterStore(loader)
+    if kind == "sqlite":
+        return SqliteDeadLetterStore(path or Config.sqlite_path)
+    if kind == "jsonl":
+        return JsonlDeadLetterStore(path or Config.jsonl_path)
+    if kind == "off":
+        return None
+    raise ValueError(f"Unknown dead letter store: {kind}")
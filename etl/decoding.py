@@ -0,0 +1,331 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from datetime import date
+from functools import lru_cache
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: about three times faster than the stdlib parser
+    orjson = None
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# the rows of each lod start with its key columns, followed by the value columns of its
+# performance or metrics table, in the column order of SchemaConfigs.column_data
+KEY_COLUMNS = {
+    "a": ("campaign_id", "ad_id", "execution_date"),
+    "c": ("campaign_id", "execution_date"),
+}
+PERFORMANCE_COLUMNS = (
+    "spend",
+    "impressions",
+    "clicks",
+    "registrations",
+    "ctr",
+    "cr",
+    "cpc",
+)
+METRICS_COLUMNS = ("lifeday", "players", "payers", "payments", "revenue")
+
+# fact column -> payload field it is read from, where the two differ; the id columns
+# hold the ids of the names
+COLUMN_FIELDS = {
+    "campaign_id": "campaign",
+    "ad_id": "ad",
+    "execution_date": "date",
+    "spend": "cost",
+}
+# payload field -> the types a present value may have, as checked by the columnar decoder
+FIELD_TYPES = {
+    "campaign": (str,),
+    "ad": (str,),
+    "date": (str,),
+    "cost": (int, float),
+    "impressions": (int,),
+    "clicks": (int,),
+    "registrations": (int,),
+    "ctr": (int, float),
+    "cr": (int, float),
+    "cpc": (int, float),
+    "lifeday": (int,),
+    "players": (int,),
+    "payers": (int,),
+    "payments": (int,),
+    "revenue": (int, float),
+}
+
+
+class DecodeError(ValueError):
+    """A payload that does not match the schema, with the path of the offending value."""
+
+    def __init__(self, path: str, message: str) -> None:
+        super().__init__(f"{path}: {message}")
+        self.path = path
+        self.message = message
+
+    def within(self, prefix: str) -> "DecodeError":
+        """The same error, with its path relative to the value at prefix."""
+
+        return DecodeError(prefix + self.path, self.message)
+
+
+def _describe(value: Any) -> str:
+    text = repr(value)
+    return f"{type(value).__name__} {text if len(text) <= 40 else text[:37] + '...'}"
+
+
+def _invalid(path: str, expected: str, value: Any) -> DecodeError:
+    if value is None:
+        return DecodeError(path, "missing or null")
+    return DecodeError(path, f"expected {expected}, got {_describe(value)}")
+
+
+def _as_int(path: str, value: Any) -> int:
+    """An integral float such as 10.0, as serialized by some clients, as the int it is."""
+
+    if type(value) is float and value.is_integer():
+        return int(value)
+    raise _invalid(path, "an integer", value)
+
+
+# a response repeats the same few dates, so each is parsed once
+@lru_cache(maxsize=4096)
+def _is_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return len(value) == 10
+
+
+def _str(value: Any, path: str) -> Optional[str]:
+    if value is None or type(value) is str:
+        return value
+    raise _invalid(path, "a string", value)
+
+
+def _int(value: Any, path: str) -> Optional[int]:
+    if value is None or type(value) is int:
+        return value
+    return _as_int(path, value)
+
+
+def _number(value: Any, path: str) -> Optional[float]:
+    if value is None or type(value) is float or type(value) is int:
+        return value
+    raise _invalid(path, "a number", value)
+
+
+def _date(value: Any, path: str) -> Optional[str]:
+    if value is None or (type(value) is str and _is_date(value)):
+        return value
+    raise _invalid(path, "a YYYY-MM-DD date", value)
+
+
+def _decode_metrics(entry: Any) -> Tuple[Any, ...]:
+    """The values of a metrics entry, in the order of METRICS_COLUMNS."""
+
+    if type(entry) is not dict:
+        raise _invalid("", "an object", entry)
+    get = entry.get
+    lifeday = get("lifeday")
+    # lifeday is part of the key of the metrics tables, where a null never conflicts
+    if lifeday is None:
+        raise _invalid(".lifeday", "an integer", lifeday)
+    return (
+        _int(lifeday, ".lifeday"),
+        _int(get("players"), ".players"),
+        _int(get("payers"), ".payers"),
+        _int(get("payments"), ".payments"),
+        _number(get("revenue"), ".revenue"),
+    )
+
+
+def _decode_record(
+    record: Any,
+    campaign_ids: Dict[str, int],
+    ad_ids: Optional[Dict[str, int]],
+) -> Tuple[Tuple[Any, ...], List[Tuple[Any, ...]]]:
+    """
+    The performance row of a record and one metrics row per entry of its metrics list.
+    The ad id is left out of the rows when ad_ids is None.
+    """
+
+    if type(record) is not dict:
+        raise _invalid("", "an object", record)
+    get = record.get
+    campaign_id = campaign_ids.get(_str(get("campaign"), ".campaign"))
+    execution_date = _date(get("date"), ".date")
+    if ad_ids is None:
+        keys = (campaign_id, execution_date)
+    else:
+        keys = (campaign_id, ad_ids.get(_str(get("ad"), ".ad")), execution_date)
+    performance_row = keys + (
+        _number(get("cost"), ".cost"),
+        _int(get("impressions"), ".impressions"),
+        _int(get("clicks"), ".clicks"),
+        _int(get("registrations"), ".registrations"),
+        _number(get("ctr"), ".ctr"),
+        _number(get("cr"), ".cr"),
+        _number(get("cpc"), ".cpc"),
+    )
+    entries = get("metrics")
+    if entries is None:
+        return performance_row, []
+    if type(entries) is not list:
+        raise _invalid(".metrics", "a list", entries)
+    metrics_rows = []
+    for position, entry in enumerate(entries):
+        try:
+            metrics_rows.append(keys + _decode_metrics(entry))
+        except DecodeError as e:
+            raise e.within(f".metrics[{position}]") from None
+    return performance_row, metrics_rows
+
+
+def parse_json(body: bytes) -> Any:
+    """Parses a response body with orjson when it is installed, else with the json module."""
+
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def check_response(payload: Any) -> List[Any]:
+    """Returns payload if it is a list of records; raises DecodeError otherwise."""
+
+    if type(payload) is not list:
+        raise _invalid("$", "a list of records", payload)
+    return payload
+
+
+def decode_facts(
+    lod: str,
+    payload: Any,
+    campaign_ids: Dict[str, int],
+    ad_ids: Optional[Dict[str, int]] = None,
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]], List[Tuple[Any, DecodeError]]]:
+    """
+    Validates a parsed campaigns-report response of lod in a single pass and returns the
+    rows of its performance and metrics tables together with the (raw record, error) of
+    every record that does not match the schema. Campaign and ad names are mapped to ids
+    through campaign_ids and ad_ids; unknown or missing names map to None. A record
+    without metrics entries has no metrics rows. Raises DecodeError if the response is not
+    a list of records at all.
+    """
+
+    check_response(payload)
+    if "ad_id" not in KEY_COLUMNS[lod]:
+        ad_ids = None
+    elif ad_ids is None:
+        ad_ids = {}
+    performance, metrics, rejected = [], [], []
+    for index, record in enumerate(payload):
+        try:
+            performance_row, metrics_rows = _decode_record(record, campaign_ids, ad_ids)
+        except DecodeError as e:
+            rejected.append((record, e.within(f"$[{index}]")))
+            continue
+        performance.append(performance_row)
+        metrics.extend(metrics_rows)
+    return performance, metrics, rejected
+
+
+def _lookup_ids(names: List[Optional[str]], ids: Dict[str, int]) -> "np.ndarray":
+    """
+    Maps names to ids through a vectorized lookup, resolving each distinct name once;
+    missing names map to None.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(np.array(names, dtype=object))
+    # code -1 (missing name) indexes the trailing None
+    lookup = np.array([ids.get(name) for name in uniques] + [None], dtype=object)
+    return lookup[codes]
+
+
+def _checked(values: List[Any], field: str, nullable: bool = True) -> bool:
+    """Whether every value of field has one of its types; dates are parsed once each."""
+
+    import pandas as pd
+
+    types = set(FIELD_TYPES[field]) | ({type(None)} if nullable else set())
+    if not set(map(type, values)) <= types:
+        return False
+    if field == "date":
+        return all(
+            value is None or _is_date(value)
+            for value in pd.unique(pd.Series(values, dtype=object))
+        )
+    return True
+
+
+def decode_facts_columnar(
+    lod: str,
+    payload: Any,
+    campaign_ids: Dict[str, int],
+    ad_ids: Optional[Dict[str, int]] = None,
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]], List[Tuple[Any, DecodeError]]]:
+    """
+    Columnar counterpart of decode_facts: the response is split into one column per payload
+    field up front, the columns are type-checked and mapped to ids as a whole with pandas
+    and NumPy, and the key columns are repeated once per metrics entry. A response with a
+    value those checks do not accept (a malformed record, or an integral float) is decoded
+    by decode_facts instead, so the rows and rejected records of both are the same.
+    """
+
+    # numpy and pandas are slow to import and only needed by the columnar decoder
+    import numpy as np
+
+    check_response(payload)
+    if not all(type(record) is dict for record in payload):
+        return decode_facts(lod, payload, campaign_ids, ad_ids)
+    key_columns = KEY_COLUMNS[lod]
+    fields = [
+        COLUMN_FIELDS.get(name, name) for name in key_columns + PERFORMANCE_COLUMNS
+    ]
+    columns = {field: [record.get(field) for record in payload] for field in fields}
+    entries = [record.get("metrics") for record in payload]
+    if not all(_checked(columns[field], field) for field in fields) or not set(
+        map(type, entries)
+    ) <= {list, type(None)}:
+        return decode_facts(lod, payload, campaign_ids, ad_ids)
+
+    repeats = np.fromiter(
+        (len(value) if value else 0 for value in entries),
+        dtype=np.int64,
+        count=len(entries),
+    )
+    entries = [entry for value in entries if value for entry in value]
+    if not set(map(type, entries)) <= {dict}:
+        return decode_facts(lod, payload, campaign_ids, ad_ids)
+    metrics_columns = [
+        [entry.get(field) for entry in entries] for field in METRICS_COLUMNS
+    ]
+    # lifeday is part of the key of the metrics tables, where a null never conflicts
+    if not all(
+        _checked(column, field, nullable=field != "lifeday")
+        for field, column in zip(METRICS_COLUMNS, metrics_columns)
+    ):
+        return decode_facts(lod, payload, campaign_ids, ad_ids)
+
+    keys = {"date": np.array(columns["date"], dtype=object)}
+    keys["campaign"] = _lookup_ids(columns["campaign"], campaign_ids)
+    if "ad" in columns:
+        keys["ad"] = _lookup_ids(columns["ad"], ad_ids or {})
+    columns.update((field, ids.tolist()) for field, ids in keys.items())
+    performance = list(zip(*(columns[field] for field in fields)))
+    metrics = list(
+        zip(
+            *(
+                np.repeat(keys[COLUMN_FIELDS[name]], repeats).tolist()
+                for name in key_columns
+            ),
+            *metrics_columns,
+        )
+    )
+    return performance, metrics, []
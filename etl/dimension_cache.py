@@ -0,0 +1,81 @@
+from typing import Callable, Dict, Iterable, List
+from collections import OrderedDict
+import threading
+from configs.api import DatabaseConfigs as Config
+from etl.telemetry import telemetry
+
+
+class DimensionCache:
+    """
+    Bounded LRU cache of dimension name -> id. Names that are not cached are resolved in a
+    single call to the bulk resolver (e.g. DataLoader.upsert_campaigns).
+    """
+
+    def __init__(
+        self,
+        resolver: Callable[[List[str]], Dict[str, int]],
+        max_size: int = Config.dimension_cache_size,
+    ) -> None:
+        self.resolver = resolver
+        self.name = getattr(resolver, "__name__", "resolver")
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _put(self, name: str, _id: int) -> None:
+        self._ids[name] = _id
+        self._ids.move_to_end(name)
+        if len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def warm(self, ids: Dict[str, int]) -> None:
+        """Preloads name -> id pairs, e.g. read from the dimension table at startup."""
+
+        with self._lock:
+            for name, _id in ids.items():
+                self._put(name, _id)
+
+    def resolve(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Returns the ids of all names, resolving the missing ones in bulk. Raises ValueError
+        when the resolver leaves a name without id, rather than writing NULL references.
+        """
+
+        ids, missing = {}, []
+        with self._lock:
+            for name in set(names):
+                if name in self._ids:
+                    self._ids.move_to_end(name)
+                    ids[name] = self._ids[name]
+                else:
+                    missing.append(name)
+            self.hits += len(ids)
+            self.misses += len(missing)
+        telemetry.inc(
+            "dimension_lookups_total", len(ids), cache=self.name, result="hit"
+        )
+        telemetry.inc(
+            "dimension_lookups_total", len(missing), cache=self.name, result="miss"
+        )
+
+        if missing:
+            # resolved outside the lock; concurrent misses on the same name are
+            # harmless since the resolver is idempotent
+            with telemetry.timer("dimension_resolve_seconds", cache=self.name):
+                resolved = self.resolver(missing)
+            unresolved = set(missing) - resolved.keys()
+            if unresolved:
+                raise ValueError(
+                    f"{self.name} did not resolve {len(unresolved)} names, e.g. "
+                    f"{sorted(unresolved)[:5]}"
+                )
+            with self._lock:
+                for name, _id in resolved.items():
+                    self._put(name, _id)
+            ids.update(resolved)
+        return ids
@@ -0,0 +1,226 @@
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import sys
+from etl.load_data import DataLoader
+from etl.telemetry import telemetry
+from configs.api import ExportConfigs as Config
+
+
+def _dates(column: str) -> str:
+    """Filter on the [date_from, date_to) range; a missing bound is folded away by the planner."""
+
+    return (
+        f"(%(date_from)s::DATE IS NULL OR {column} >= %(date_from)s::DATE) "
+        f"AND (%(date_to)s::DATE IS NULL OR {column} < %(date_to)s::DATE)"
+    )
+
+
+def _campaigns(column: str) -> str:
+    return f"(%(campaigns)s::TEXT[] IS NULL OR {column} = ANY(%(campaigns)s::TEXT[]))"
+
+
+# exports by name; the filters are part of each query so that Postgres prunes the monthly
+# partitions and only the matching rows leave the server
+EXPORTS = {
+    "campaign_performance": f"""
+        SELECT p.execution_date, c.campaign_name, p.spend, p.impressions, p.clicks,
+            p.registrations, p.ctr, p.cr, p.cpc
+        FROM fact_campaign_performance p
+        LEFT JOIN campaigns c ON c.campaign_id = p.campaign_id
+        WHERE {_dates("p.execution_date")} AND {_campaigns("c.campaign_name")}
+        ORDER BY p.execution_date, c.campaign_name
+    """,
+    "campaign_ad_performance": f"""
+        SELECT p.execution_date, c.campaign_name, a.ad_name, p.spend, p.impressions,
+            p.clicks, p.registrations, p.ctr, p.cr, p.cpc
+        FROM fact_campaign_ad_performance p
+        LEFT JOIN campaigns c ON c.campaign_id = p.campaign_id
+        LEFT JOIN ads a ON a.ad_id = p.ad_id
+        WHERE {_dates("p.execution_date")} AND {_campaigns("c.campaign_name")}
+        ORDER BY p.execution_date, c.campaign_name, a.ad_name
+    """,
+    "campaign_metrics": f"""
+        SELECT m.execution_date, c.campaign_name, m.lifeday, m.players, m.payers,
+            m.payments, m.revenue
+        FROM fact_campaign_metrics m
+        LEFT JOIN campaigns c ON c.campaign_id = m.campaign_id
+        WHERE {_dates("m.execution_date")} AND {_campaigns("c.campaign_name")}
+        ORDER BY m.execution_date, c.campaign_name, m.lifeday
+    """,
+    "campaign_ad_metrics": f"""
+        SELECT m.execution_date, c.campaign_name, a.ad_name, m.lifeday, m.players,
+            m.payers, m.payments, m.revenue
+        FROM fact_campaign_ad_metrics m
+        LEFT JOIN campaigns c ON c.campaign_id = m.campaign_id
+        LEFT JOIN ads a ON a.ad_id = m.ad_id
+        WHERE {_dates("m.execution_date")} AND {_campaigns("c.campaign_name")}
+        ORDER BY m.execution_date, c.campaign_name, a.ad_name, m.lifeday
+    """,
+    # per-campaign totals of the range, as in october_2024_results.csv
+    "campaign_totals": f"""
+        WITH performance AS (
+            SELECT campaign_id, SUM(spend) AS spend,
+                SUM(impressions)::BIGINT AS impressions, SUM(clicks)::BIGINT AS clicks,
+                SUM(registrations)::BIGINT AS registrations
+            FROM fact_campaign_performance
+            WHERE {_dates("execution_date")}
+            GROUP BY campaign_id
+        ),
+        lifeday_14 AS (
+            SELECT campaign_id, SUM(payers)::BIGINT AS payers_d14,
+                SUM(revenue) AS revenue_d14
+            FROM fact_campaign_metrics
+            WHERE lifeday = 14 AND {_dates("execution_date")}
+            GROUP BY campaign_id
+        )
+        SELECT c.campaign_name, p.spend, p.impressions, p.clicks, p.registrations,
+            l.payers_d14, l.revenue_d14
+        FROM performance p
+        LEFT JOIN lifeday_14 l ON l.campaign_id = p.campaign_id
+        LEFT JOIN campaigns c ON c.campaign_id = p.campaign_id
+        WHERE {_campaigns("c.campaign_name")}
+        ORDER BY p.spend DESC NULLS LAST, c.campaign_name
+    """,
+    "monthly_campaign_metrics": f"""
+        SELECT *
+        FROM monthly_campaign_metrics
+        WHERE (%(date_from)s::DATE IS NULL
+               OR month >= DATE_TRUNC('month', %(date_from)s::DATE)::DATE)
+            AND (%(date_to)s::DATE IS NULL OR month < %(date_to)s::DATE)
+            AND {_campaigns("campaign_name")}
+        ORDER BY campaign_name, month
+    """,
+}
+
+# Postgres type oids mapped to the pyarrow type of their Parquet column; other types are
+# written as strings
+ARROW_TYPES = {
+    16: "bool_",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1700: "float64",
+    1082: "date32",
+}
+NUMERIC_OID = 1700
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+
+
+def export_query(
+    name: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    campaigns: Optional[List[str]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Returns the query of the export name and its parameters."""
+
+    if name not in EXPORTS:
+        raise ValueError(f"Unknown export: {name}")
+    return EXPORTS[name], {
+        "date_from": date_from,
+        "date_to": date_to,
+        "campaigns": list(campaigns) if campaigns else None,
+    }
+
+
+def _arrow_type(pa: Any, oid: int) -> Any:
+    if oid == TIMESTAMP_OID:
+        return pa.timestamp("us")
+    if oid == TIMESTAMPTZ_OID:
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, ARROW_TYPES.get(oid, "string"))()
+
+
+def _column_values(values: Tuple[Any, ...], oid: int) -> List[Any]:
+    if oid == NUMERIC_OID:
+        return [None if value is None else float(value) for value in values]
+    if oid not in ARROW_TYPES and oid not in (TIMESTAMP_OID, TIMESTAMPTZ_OID):
+        return [None if value is None else str(value) for value in values]
+    return list(values)
+
+
+def write_csv(loader: DataLoader, query: str, params: Dict[str, Any], path: str) -> int:
+    """Writes the query result to path ("-" for stdout) as CSV and returns its rows."""
+
+    if path == "-":
+        return loader.copy_query(query, params, sys.stdout)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            rows = loader.copy_query(query, params, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def write_parquet(
+    loader: DataLoader,
+    query: str,
+    params: Dict[str, Any],
+    path: str,
+    chunk_rows: int = Config.chunk_rows,
+) -> int:
+    """Writes the query result to path as Parquet, one row group per chunk, and returns its rows."""
+
+    # pyarrow is an optional dependency, only needed for Parquet exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    writer = None
+    try:
+        for columns, chunk in loader.stream_query(query, params, chunk_rows):
+            if writer is None:
+                schema = pa.schema(
+                    [(name, _arrow_type(pa, oid)) for name, oid in columns]
+                )
+                writer = pq.ParquetWriter(tmp_path, schema)
+            if chunk:
+                arrays = [
+                    pa.array(_column_values(values, oid), type=field.type)
+                    for (_, oid), field, values in zip(columns, schema, zip(*chunk))
+                ]
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+                rows += len(chunk)
+        writer.close()
+        writer = None
+        os.replace(tmp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def export_data(
+    loader: DataLoader,
+    name: str,
+    path: str,
+    fmt: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    campaigns: Optional[List[str]] = None,
+    chunk_rows: int = Config.chunk_rows,
+) -> int:
+    """
+    Streams the export name, filtered to [date_from, date_to) and to the campaigns, into
+    path and returns the number of rows written. The format is CSV unless fmt or the
+    extension of path says Parquet. Memory use does not depend on the size of the result.
+    """
+
+    query, params = export_query(name, date_from, date_to, campaigns)
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    with telemetry.timer("stage_seconds", stage="export"):
+        if fmt == "parquet":
+            rows = write_parquet(loader, query, params, path, chunk_rows)
+        else:
+            rows = write_csv(loader, query, params, path)
+    telemetry.inc("export_rows_total", rows, export=name)
+    return rows
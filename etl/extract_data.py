@@ -1,54 +1,158 @@
-from typing import Optional, Dict, Union, List, Any
-import json
+from typing import Optional, Dict, Union, List, Any, Iterator
+import asyncio
 import requests
-from configs.api import APIConfigs as Config
-import time
-import boto3
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from configs.api import APIConfigs as Config, RateLimitConfigs, WindowConfigs
+from etl.secret_provider import SecretProvider, default_secret_provider
+from etl.landing_cache import LandingCache
+from etl.decoding import DecodeError, check_response, parse_json
+from etl.incremental import settled_since
+from etl.rate_limit import CircuitBreaker, RateLimiter
+from etl.telemetry import telemetry
+from etl.windowing import WindowSizer, split_window, window_days
 import os
+import random
+import time
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
 
-def get_env_variable(var_name: str) -> str:
-    value = os.getenv(var_name)
+def _read_timed_out(e: requests.exceptions.RequestException) -> bool:
+    # a timeout while reading the body surfaces as a ConnectionError wrapping urllib3's
+    # ReadTimeoutError; connect timeouts say nothing about the size of the window
+    return isinstance(e, requests.exceptions.ReadTimeout) or (
+        isinstance(e, requests.exceptions.ConnectionError)
+        and bool(e.args)
+        and isinstance(e.args[0], ReadTimeoutError)
+    )
+
+
+def _retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date)."""
+
+    value = response.headers.get("Retry-After") if response is not None else None
     if not value:
-        raise ValueError(f"Environment variable '{var_name}' is not set or empty.")
-    return value
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (
+                parsedate_to_datetime(value) - datetime.now(timezone.utc)
+            ).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RateLimitConfigs.max_retry_after_seconds)
+
+
+def _backoff(attempt: int) -> float:
+    # "full jitter": a uniform draw below the exponential bound spreads out the retries
+    # of callers that failed together
+    bound = RateLimitConfigs.backoff_base_seconds * 2 ** (attempt - 1)
+    return random.uniform(0, min(RateLimitConfigs.backoff_cap_seconds, bound))
+
+
+def create_session(pool_size: int = Config.pool_size) -> requests.Session:
+    """
+    Creates a long-lived HTTP session that keeps up to pool_size connections alive
+    to the API host and negotiates compressed responses.
+    """
+
+    session = requests.Session()
+    # all requests target a single host, so one pool of pool_size connections suffices;
+    # pool_block makes extra concurrent callers wait for a free connection instead of
+    # opening (and discarding) throwaway ones
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(
+        {"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"}
+    )
+    return session
+
+
+class ExtractionError(Exception):
+    """A request to the API failed for good, so its window cannot be treated as empty."""
+
+    def __init__(
+        self, params: Dict[str, Any], message: str, status: Optional[int] = None
+    ) -> None:
+        super().__init__(
+            f"lod '{params['lod']}' {params['period_from']} - {params['period_to']} "
+            f"lifeday {params['lifedays']}: {message}"
+        )
+        self.params = params
+        self.status = status
+
+
+class WindowTooLarge(Exception):
+    """A window timed out or announced a response too large to download in one piece."""
+
+    def __init__(self, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+
+
+class MalformedBody(Exception):
+    """A response body that is not valid JSON, e.g. because it was cut off in transit."""
 
 
 class Extractor:
-    def __init__(self) -> None:
-        self.base_url = Config.base_url
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        session: Optional[requests.Session] = None,
+        secret_provider: Optional[SecretProvider] = None,
+        cache: Optional[LandingCache] = None,
+        cache_mode: str = "read",
+        window_sizers: Optional[Dict[str, WindowSizer]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.base_url = os.getenv(Config.base_url_env) or Config.base_url
         self.endpoint = Config.campaigns_endpoint
         self._api_key = None
         self.lifedays = Config.lifeday_periods
-
-    def get_api_key(self) -> None:
-        secret_name = get_env_variable("secret_name")
-        aws_access_key_id = get_env_variable("aws_access_key_id")
-        aws_secret_access_key = get_env_variable("aws_secret_access_key")
-        region_name = get_env_variable("region_name")
-
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=region_name,
+        self.max_concurrency = max_concurrency or Config.max_concurrency
+        self.session = session or create_session(
+            max(Config.pool_size, self.max_concurrency)
         )
+        self.secret_provider = secret_provider
+        # "read" serves landed responses and fetches only misses,
+        # "refresh" always fetches and re-lands every response
+        if cache_mode not in ("read", "refresh"):
+            raise ValueError(f"Unknown cache mode: {cache_mode}")
+        self.cache = cache
+        self.cache_mode = cache_mode
+        # per-lod sizers of adaptive windows; windows of a lod with a sizer are split
+        # in half when they time out or are too large, and feed their latency back
+        self.window_sizers = window_sizers or {}
+        # shared by every request of the run, whichever thread sends it
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
 
-        client = session.client("secretsmanager")
+    def close(self) -> None:
+        """Releases the pooled connections of the underlying session."""
 
-        try:
-            response = client.get_secret_value(SecretId=secret_name)
-            secret_string = json.loads(response["SecretString"])
-            self._api_key = secret_string["x-api-key"]
+        self.session.close()
 
-        except Exception as e:
-            print(
-                f"Failed to retrieve the API key from AWS Secrets Manager. Error: {e}"
-            )
-            raise
+    def get_api_key(self) -> None:
+        if self.secret_provider is None:
+            self.secret_provider = default_secret_provider()
+        self._api_key = self.secret_provider.get_api_key()
+
+    def refresh_api_key(self) -> None:
+        """Invalidates the cached API key and looks it up again."""
+
+        if self.secret_provider is not None:
+            self.secret_provider.invalidate()
+        self._api_key = None
+        self.get_api_key()
 
     def get_headers(self) -> Dict[str, str]:
         if self._api_key is None:
@@ -80,41 +184,313 @@ class Extractor:
             "lifedays": lifedays,
         }
 
-    def _request(self, params) -> List[Dict[str, Any]]:
-        """Makes a GET request with retries and exponential backoff."""
+    def _request(self, params, split: bool = False) -> List[Any]:
+        """
+        Makes a GET request paced by the rate limiter, retrying throttled (429), failed
+        (5xx), unanswered and unparseable attempts with jittered exponential backoff or
+        as long as Retry-After asks. Raises ExtractionError once the request cannot succeed. With
+        split, a read timeout or an oversized response raises WindowTooLarge instead.
+        Returns the parsed, not yet validated, response.
+        """
 
         url = self.get_url()
         headers = self.get_headers()
-        max_retries = 5
-        backoff_factor = 1
 
-        for attempt in range(max_retries):
+        attempt = 0
+        throttled = 0
+        refreshed_key = False
+
+        while True:
+            if not self.breaker.allow():
+                telemetry.inc("http_failures_total")
+                raise ExtractionError(
+                    params,
+                    f"circuit breaker open after {self.breaker.failures} "
+                    f"consecutive failed requests",
+                )
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
             try:
-                response = requests.get(
-                    url=url, headers=headers, params=params, timeout=10
+                # the body is streamed so that its announced size can be checked first
+                response = self.session.get(
+                    url=url,
+                    headers=headers,
+                    params=params,
+                    timeout=Config.request_timeout,
+                    stream=True,
+                )
+                announced = int(response.headers.get("Content-Length") or 0)
+                if split and announced > WindowConfigs.max_response_bytes:
+                    response.close()
+                    raise WindowTooLarge("bytes", f"response of {announced} bytes")
+                size = len(response.content)
+                elapsed = time.perf_counter() - started
+                telemetry.observe("http_request_seconds", elapsed, lod=params["lod"])
+                telemetry.inc("http_requests_total", status=response.status_code)
+                telemetry.inc("http_response_bytes_total", size)
+                telemetry.event(
+                    "http_request",
+                    **params,
+                    status=response.status_code,
+                    seconds=round(elapsed, 6),
+                    bytes=size,
+                    attempt=attempt + throttled + 1,
                 )
                 response.raise_for_status()
-                return response.json()
+                try:
+                    records = parse_json(response.content)
+                except ValueError as e:
+                    raise MalformedBody(
+                        f"invalid JSON body of {size} bytes: {e}"
+                    ) from e
+                self.rate_limiter.on_success()
+                self.breaker.record_success()
+                telemetry.inc("http_records_total", len(records), lod=params["lod"])
+                sizer = self.window_sizers.get(params["lod"])
+                if sizer is not None:
+                    sizer.observe(
+                        window_days(params["period_from"], params["period_to"]),
+                        elapsed,
+                        len(records),
+                    )
+                return records
             except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    wait_time = backoff_factor * (2**attempt)
-                    print(f"Request failed (attempt {attempt + 1}/{max_retries}): {e}.")
-                    print(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Request failed after {max_retries} attempts: {e}")
-                    return []
+                status_code = getattr(e.response, "status_code", None)
+                if e.response is None:
+                    # no response at all, e.g. a timeout or a refused connection
+                    telemetry.inc("http_requests_total", status="error")
+                if split and _read_timed_out(e):
+                    raise WindowTooLarge("timeout", str(e)) from e
+                if status_code in (401, 403) and not refreshed_key:
+                    # the key may have been rotated since it was cached
+                    print(
+                        f"Request rejected with {status_code}, refreshing the API key..."
+                    )
+                    refreshed_key = True
+                    self.refresh_api_key()
+                    headers = self.get_headers()
+                    continue
+                if status_code is not None and status_code != 429 and status_code < 500:
+                    # a client error, e.g. a rejected key or bad parameters, cannot
+                    # succeed on a retry
+                    telemetry.inc("http_failures_total")
+                    telemetry.event("http_failure", **params, error=str(e))
+                    raise ExtractionError(params, str(e), status_code) from e
+
+                retry_after = _retry_after(e.response)
+                if status_code is not None:
+                    # 429 and 5xx: the API is overloaded, so every caller slows down
+                    self.rate_limiter.on_throttle(retry_after)
+                if (
+                    status_code == 429
+                    and throttled < RateLimitConfigs.max_throttled_retries
+                ):
+                    # throttling says the API is up, so it neither counts as a failed
+                    # attempt nor toward the circuit breaker
+                    throttled += 1
+                    telemetry.inc("http_throttled_total")
+                    if retry_after is None:
+                        time.sleep(_backoff(throttled))
+                    # otherwise the rate limiter holds every caller for Retry-After
+                    continue
+
+                self.breaker.record_failure()
+                attempt += 1
+                self._retry_or_raise(params, e, attempt, retry_after, status_code)
+            except MalformedBody as e:
+                # the request reached the API, but its body got damaged on the way back
+                self.breaker.record_failure()
+                attempt += 1
+                self._retry_or_raise(params, e, attempt)
+
+    def _retry_or_raise(
+        self,
+        params: Dict[str, Any],
+        error: Exception,
+        attempt: int,
+        retry_after: Optional[float] = None,
+        status_code: Optional[int] = None,
+    ) -> None:
+        """
+        Waits before the next attempt of a failed request, or raises ExtractionError once
+        attempt was the last one.
+        """
+
+        max_retries = RateLimitConfigs.max_retries
+        if attempt < max_retries:
+            wait_time = _backoff(attempt) if retry_after is None else retry_after
+            print(f"Request failed (attempt {attempt}/{max_retries}): {error}.")
+            print(f"Retrying in {wait_time:.1f} seconds...")
+            telemetry.inc("http_retries_total")
+            time.sleep(wait_time)
+        else:
+            print(f"Request failed after {max_retries} attempts: {error}")
+            telemetry.inc("http_failures_total")
+            telemetry.event("http_failure", **params, error=str(error))
+            raise ExtractionError(
+                params, f"failed after {max_retries} attempts: {error}", status_code
+            ) from error
+
+    def _check(self, params: Dict[str, Any], response: Any) -> List[Dict[str, Any]]:
+        """
+        Returns the records of a parsed response. A response that is not a list of records
+        fails the unit; the records themselves are validated when they are transformed.
+        """
+
+        try:
+            return check_response(response)
+        except DecodeError as e:
+            raise ExtractionError(params, f"malformed response: {e}") from e
+
+    def _cached(self, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the landed response for params, if the cache may be read. A response
+        landed while lifedays that are final by now were still maturing is not served,
+        since its load would be recorded as final with the immature metrics.
+        """
+
+        if self.cache is None or self.cache_mode != "read":
+            return None
+        landed_since = None
+        if params["lifedays"] is not None:
+            landed_since = settled_since(
+                params["period_from"],
+                params["period_to"],
+                params["lifedays"],
+                date.today(),
+            )
+        cached = self.cache.get(
+            params["lod"],
+            params["period_from"],
+            params["period_to"],
+            params["lifedays"],
+            landed_since=landed_since,
+        )
+        telemetry.inc(
+            "landing_cache_lookups_total", result="miss" if cached is None else "hit"
+        )
+        return None if cached is None else self._check(params, cached)
+
+    def _fetch(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Requests params from the API and lands the response in the cache."""
+
+        response = self._fetch_window(params)
+        # failed requests raise, so an empty response is an empty window and is landed too
+        if self.cache is not None:
+            self.cache.put(
+                params["lod"],
+                params["period_from"],
+                params["period_to"],
+                params["lifedays"],
+                response,
+            )
+        return self._check(params, response)
+
+    def _fetch_window(self, params: Dict[str, Any]) -> List[Any]:
+        """
+        Requests params, splitting an adaptive window in half (recursively) when it
+        times out or is too large, and returns the records of all of its parts.
+        """
+
+        sizer = self.window_sizers.get(params["lod"])
+        days = window_days(params["period_from"], params["period_to"])
+        if sizer is None or days < 2:
+            return self._request(params)
+        try:
+            return self._request(params, split=True)
+        except WindowTooLarge as e:
+            period_from, midpoint, period_to = split_window(
+                params["period_from"], params["period_to"]
+            )
+            print(
+                f"Splitting lod '{params['lod']}' lifeday {params['lifedays']} window "
+                f"{period_from} - {period_to} at {midpoint}: {e}"
+            )
+            telemetry.inc("window_splits_total", lod=params["lod"], reason=e.reason)
+            sizer.shrink(days, e.reason)
+            return self._fetch_window(
+                {**params, "period_to": midpoint}
+            ) + self._fetch_window({**params, "period_from": midpoint})
 
     def get_data(
-        self, period_from: str, period_to: str, lod: str = "a"
+        self,
+        period_from: str,
+        period_to: str,
+        lod: str = "a",
+        concurrent: bool = False,
+        lifedays: Optional[List[int]] = None,
     ) -> List[Dict[str, Any]]:
-        """Fetches and aggregates data for the specified period and level of detail (lod) across all lifedays."""
+        """
+        Fetches and aggregates data for the specified period and level of detail (lod) across
+        all lifedays, or only the given subset of lifedays.
+        """
+
+        if concurrent:
+            return asyncio.run(
+                self.get_data_async(period_from, period_to, lod, lifedays)
+            )
 
         data = []
-        # TODO switch to asynchronous for each lifeday
-        for lifeday in self.lifedays:
-            time.sleep(0.5)  # avoid possible throttling
+        for response in self.iter_data(period_from, period_to, lod, lifedays):
+            data.extend(response)
+        return data
+
+    def iter_data(
+        self,
+        period_from: str,
+        period_to: str,
+        lod: str = "a",
+        lifedays: Optional[List[int]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Lazily fetches the period one lifeday at a time, yielding each response as it arrives."""
+
+        for lifeday in self.lifedays if lifedays is None else lifedays:
+            params = self.set_params(period_from, period_to, lifeday, lod)
+            cached = self._cached(params)
+            if cached is not None:
+                yield cached
+                continue
+            yield self._fetch(params)
+
+    async def _fetch_lifedays(
+        self,
+        period_from: str,
+        period_to: str,
+        lod: str,
+        semaphore: asyncio.Semaphore,
+        lifedays: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Fetches all lifedays of a single window concurrently, bounded by the semaphore."""
+
+        async def fetch(lifeday: int) -> List[Dict[str, Any]]:
             params = self.set_params(period_from, period_to, lifeday, lod)
-            response = self._request(params)
+            cached = self._cached(params)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                return await asyncio.to_thread(self._fetch, params)
+
+        # gather preserves the order of the lifedays, keeping the output
+        # identical to the sequential path
+        lifedays = self.lifedays if lifedays is None else lifedays
+        responses = await asyncio.gather(*(fetch(lifeday) for lifeday in lifedays))
+        data = []
+        for response in responses:
             data.extend(response)
         return data
+
+    async def get_data_async(
+        self,
+        period_from: str,
+        period_to: str,
+        lod: str = "a",
+        lifedays: Optional[List[int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Asynchronous counterpart of get_data that requests all lifedays in parallel."""
+
+        # resolve the API key once, before fanning out to worker threads
+        self.get_headers()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await self._fetch_lifedays(
+            period_from, period_to, lod, semaphore, lifedays
+        )
@@ -0,0 +1,156 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import date, timedelta
+from configs.api import APIConfigs as Config
+
+
+def _to_date(value: Any) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _window_dates(period_from: Any, period_to: Any) -> List[date]:
+    # period_to is excluded: it is the period_from of the next window, so the union of
+    # consecutive windows still covers every date without relying on how the API
+    # treats the upper bound
+    start, end = _to_date(period_from), _to_date(period_to)
+    return [start + timedelta(days=i) for i in range((end - start).days)] or [start]
+
+
+def is_final(period_to: Any, lifeday: int, as_of: date) -> bool:
+    """A lifeday metric stops changing once every date of the window is older than lifeday days."""
+
+    horizon = timedelta(days=lifeday + Config.maturation_buffer_days)
+    return _to_date(period_to) + horizon < as_of
+
+
+def final_until(period_from: Any, period_to: Any, lifeday: int, as_of: date) -> date:
+    """
+    Returns the date that splits a window into the part whose lifeday metric is final,
+    [period_from, final_until), and the part that is still maturing.
+    """
+
+    cutoff = as_of - timedelta(days=lifeday + Config.maturation_buffer_days + 1)
+    return max(_to_date(period_from), min(_to_date(period_to), cutoff))
+
+
+def final_dates(
+    final_windows: Iterable[Tuple[str, Any, Any, int]],
+) -> Dict[Tuple[str, int], Set[date]]:
+    """Expands final (lod, period_from, period_to, lifeday) windows into covered dates."""
+
+    covered = {}
+    for lod, period_from, period_to, lifeday in final_windows:
+        covered.setdefault((lod, lifeday), set()).update(
+            _window_dates(period_from, period_to)
+        )
+    return covered
+
+
+def pending_lifedays(
+    lod: str,
+    period_from: str,
+    period_to: str,
+    lifedays: List[int],
+    covered: Dict[Tuple[str, int], Set[date]],
+) -> List[int]:
+    """
+    Returns the lifedays of a window that still need to be fetched, i.e. those for which
+    some date of the window is not covered by an earlier final load. Window boundaries may
+    shift between runs, so coverage is checked per date rather than per window.
+    """
+
+    dates = _window_dates(period_from, period_to)
+    return [
+        lifeday
+        for lifeday in lifedays
+        if not covered.get((lod, lifeday), set()).issuperset(dates)
+    ]
+
+
+def settled_since(
+    period_from: Any, period_to: Any, lifeday: int, as_of: date
+) -> Optional[date]:
+    """
+    Returns the earliest date on which a response for the window was already as final
+    as one fetched on as_of, or None when no part of the window is final yet. A response
+    fetched before it holds lifeday metrics that were still maturing.
+    """
+
+    cutoff = final_until(period_from, period_to, lifeday, as_of)
+    if cutoff <= _to_date(period_from):
+        return None
+    return cutoff + timedelta(days=lifeday + Config.maturation_buffer_days + 1)
+
+
+def first_pending_date(
+    lod: str,
+    period_from: str,
+    period_to: str,
+    lifedays: List[int],
+    covered: Dict[Tuple[str, int], Set[date]],
+) -> str:
+    """
+    Returns the first date of a window that is not covered for some of lifedays. The
+    dates before it are final for all of them, so a fetch can start there.
+    """
+
+    dates = _window_dates(period_from, period_to)
+    for day in dates:
+        if any(day not in covered.get((lod, lifeday), ()) for lifeday in lifedays):
+            return day.isoformat()
+    return dates[-1].isoformat()
+
+
+def observed_lifedays(data: List[Dict[str, Any]]) -> Set[int]:
+    """Lifedays present in a response; only those can be recorded as loaded."""
+
+    return {
+        entry.get("lifeday")
+        for record in data
+        if isinstance(record, dict) and isinstance(record.get("metrics"), list)
+        for entry in record["metrics"]
+        if isinstance(entry, dict) and isinstance(entry.get("lifeday"), int)
+    }
+
+
+def loaded_lifedays(
+    observed: Iterable[int],
+    requested: Iterable[int],
+    period_from: Any,
+    period_to: Any,
+    as_of: date,
+) -> Set[int]:
+    """
+    Lifedays of a window to record as loaded: those present in its responses, plus the
+    requested ones that came back empty but are final for part of the window, since a
+    matured lifeday that has no rows keeps having none and would otherwise be fetched
+    again on every run.
+    """
+
+    return set(observed) | {
+        lifeday
+        for lifeday in requested
+        if final_until(period_from, period_to, lifeday, as_of) > _to_date(period_from)
+    }
+
+
+def load_state_rows(
+    lod: str,
+    period_from: str,
+    period_to: str,
+    lifedays: Iterable[int],
+    as_of: date,
+) -> List[Tuple[str, str, str, int, bool]]:
+    """
+    Returns the load state rows of a window. Each lifeday is split at final_until, so the
+    matured dates of a window that ends close to as_of are covered on the next run.
+    """
+
+    rows = []
+    start, end = _to_date(period_from), _to_date(period_to)
+    for lifeday in sorted(lifedays):
+        cutoff = final_until(start, end, lifeday, as_of)
+        if cutoff > start:
+            rows.append((lod, period_from, cutoff.isoformat(), lifeday, True))
+        if cutoff < end:
+            rows.append((lod, cutoff.isoformat(), period_to, lifeday, False))
+    return rows
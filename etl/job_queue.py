@@ -0,0 +1,277 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import os
+import socket
+import threading
+from etl.load_data import DataLoader
+from etl.scheduler import WindowResult
+from etl.telemetry import telemetry
+from configs.api import JobConfigs as Config
+
+
+class Job(NamedTuple):
+    """A claimed (lod, window) unit of the etl_jobs queue."""
+
+    job_id: int
+    lod: str
+    period_from: str
+    period_to: str
+    derive_campaigns: bool
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    The etl_jobs table as a work queue shared by any number of worker processes. A job is
+    claimed with FOR UPDATE SKIP LOCKED, so concurrent claims never block on or return the
+    same job, and is leased to its worker until leased_until. While the worker runs it, a
+    heartbeat thread extends the lease; the job of a worker that died is claimed again by
+    another worker once its lease expired, up to max_attempts claims.
+    """
+
+    def __init__(
+        self,
+        loader: DataLoader,
+        worker_id: Optional[str] = None,
+        lease_seconds: int = Config.lease_seconds,
+        max_attempts: int = Config.max_attempts,
+    ) -> None:
+        self.loader = loader
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = lease_seconds / Config.heartbeats_per_lease
+        self.max_attempts = max_attempts
+        # ids of the jobs this worker holds a lease on
+        self._leased = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat = None
+
+    def seed(
+        self, windows: Dict[str, List[Tuple[str, str]]], derive_campaigns: bool = False
+    ) -> Tuple[int, int]:
+        """
+        Queues a job for every window of windows (keyed by lod). Jobs already queued are
+        kept, except failed ones, which are queued again with their attempts reset.
+        Returns the number of (new, requeued) jobs.
+        """
+
+        rows = [
+            (lod, period_from, period_to, derive_campaigns)
+            for lod, lod_windows in sorted(windows.items())
+            for period_from, period_to in lod_windows
+        ]
+        try:
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        WITH seeded AS (
+                            INSERT INTO etl_jobs
+                                (lod, period_from, period_to, derive_campaigns)
+                            SELECT * FROM unnest(
+                                %s::CHAR(1)[], %s::DATE[], %s::DATE[], %s::BOOLEAN[]
+                            )
+                            ON CONFLICT (lod, period_from, period_to) DO UPDATE SET
+                                status = 'pending',
+                                attempts = 0,
+                                derive_campaigns = EXCLUDED.derive_campaigns,
+                                error = NULL,
+                                finished_at = NULL
+                            WHERE etl_jobs.status = 'failed'
+                            RETURNING xmax = 0 AS inserted
+                        )
+                        SELECT count(*) FILTER (WHERE inserted),
+                            count(*) FILTER (WHERE NOT inserted)
+                        FROM seeded
+                        """,
+                        [list(column) for column in zip(*rows)] or [[], [], [], []],
+                    )
+                    return cur.fetchone()
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.seed.__name__}: an error occurred while seeding jobs: {e}"
+            )
+            raise
+
+    def claim(self, derive_campaigns: Optional[bool] = None) -> Optional[Job]:
+        """
+        Leases the earliest pending job (or running job whose lease expired) to this
+        worker, optionally only one of the given derive_campaigns mode. Returns None when
+        there is no such job. Expired jobs that used up their attempts are failed first.
+        """
+
+        try:
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        UPDATE etl_jobs
+                        SET status = 'failed', finished_at = now(),
+                            error = 'lease expired after ' || attempts || ' attempts; last '
+                                || coalesce(error, 'held by ' || lease_owner)
+                        WHERE status = 'running' AND leased_until < now()
+                            AND attempts >= %s
+                        """,
+                        (self.max_attempts,),
+                    )
+                    cur.execute(
+                        """
+                        UPDATE etl_jobs
+                        SET status = 'running',
+                            attempts = attempts + 1,
+                            lease_owner = %(worker)s,
+                            leased_until = now() + make_interval(secs => %(lease)s),
+                            heartbeat_at = now()
+                        WHERE job_id = (
+                            SELECT job_id FROM etl_jobs
+                            WHERE (status = 'pending'
+                                   OR (status = 'running' AND leased_until < now()))
+                                AND (%(derive)s::BOOLEAN IS NULL
+                                     OR derive_campaigns = %(derive)s::BOOLEAN)
+                            ORDER BY period_from, lod
+                            LIMIT 1
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING job_id, lod, period_from::TEXT, period_to::TEXT,
+                            derive_campaigns, attempts
+                        """,
+                        {
+                            "worker": self.worker_id,
+                            "lease": self.lease_seconds,
+                            "derive": derive_campaigns,
+                        },
+                    )
+                    row = cur.fetchone()
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.claim.__name__}: an error occurred while claiming a job: {e}"
+            )
+            raise
+        if row is None:
+            return None
+        job = Job(*row)
+        with self._lock:
+            self._leased.add(job.job_id)
+        telemetry.inc("jobs_claimed_total", lod=job.lod, retry=str(job.attempts > 1))
+        return job
+
+    def finish(self, job: Job, result: WindowResult) -> str:
+        """
+        Marks a claimed job done, or failed once it used up its attempts; a job that failed
+        before that is queued again, for any worker to retry. Returns the new status, or
+        "lost" when the lease had expired and the job was claimed by another worker.
+        """
+
+        with self._lock:
+            self._leased.discard(job.job_id)
+        if result.succeeded:
+            status = "done"
+        elif job.attempts < self.max_attempts:
+            status = "pending"
+        else:
+            status = "failed"
+        try:
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        UPDATE etl_jobs
+                        SET status = %s,
+                            error = %s,
+                            lease_owner = NULL,
+                            leased_until = NULL,
+                            finished_at = CASE WHEN %s THEN now() END
+                        WHERE job_id = %s AND lease_owner = %s AND status = 'running'
+                        """,
+                        (
+                            status,
+                            result.error,
+                            status != "pending",
+                            job.job_id,
+                            self.worker_id,
+                        ),
+                    )
+                    if cur.rowcount == 0:
+                        status = "lost"
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.finish.__name__}: an error occurred while finishing job {job.job_id}: {e}"
+            )
+            raise
+        telemetry.inc("jobs_finished_total", lod=job.lod, status=status)
+        return status
+
+    def _extend_leases(self) -> None:
+        with self._lock:
+            leased = sorted(self._leased)
+        if not leased:
+            return
+        with self.loader.connection(isolated=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE etl_jobs
+                    SET leased_until = now() + make_interval(secs => %s),
+                        heartbeat_at = now()
+                    WHERE job_id = ANY(%s) AND lease_owner = %s AND status = 'running'
+                    RETURNING job_id
+                    """,
+                    (self.lease_seconds, leased, self.worker_id),
+                )
+                kept = {row[0] for row in cur.fetchall()}
+        lost = set(leased) - kept
+        if lost:
+            # the job may still finish here; its writes are idempotent upserts
+            print(f"Lost the lease of jobs {sorted(lost)} to another worker")
+            with self._lock:
+                self._leased -= lost
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(self.heartbeat_seconds):
+            try:
+                self._extend_leases()
+            except Exception as e:
+                # the next beat retries; the lease only lapses after lease_seconds
+                print(
+                    f"{self.__class__.__name__} - {self._beat.__name__}: an error occurred while extending leases: {e}"
+                )
+
+    def start(self) -> "JobQueue":
+        """Starts the heartbeat thread extending the leases of the claimed jobs."""
+
+        self._stopped.clear()
+        self._heartbeat = threading.Thread(
+            target=self._beat, name="etl-job-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of jobs of each status."""
+
+        try:
+            with self.loader.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT status, count(*) FROM etl_jobs GROUP BY status")
+                    return dict(cur.fetchall())
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.counts.__name__}: an error occurred while counting jobs: {e}"
+            )
+            raise
+
+    def __enter__(self) -> "JobQueue":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
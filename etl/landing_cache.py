@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import date
+from configs.api import LandingCacheConfigs as Config
+
+
+class LandingCache:
+    """
+    Content-addressed store of raw campaigns-report responses on local disk. Each response is
+    kept as gzip-compressed JSONL under the hash of its (lod, period_from, period_to, lifeday)
+    request, so replays and reprocessing runs can skip the API entirely.
+    """
+
+    def __init__(
+        self,
+        root: str = Config.root,
+        max_bytes: int = Config.max_bytes,
+        max_age_days: int = Config.max_age_days,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(lod: str, period_from: str, period_to: str, lifeday: Optional[int]) -> str:
+        payload = json.dumps([lod, period_from, period_to, lifeday])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.jsonl.gz")
+
+    def _expired(self, path: str) -> bool:
+        return time.time() - os.path.getmtime(path) > self.max_age_days * 86400
+
+    def _landed_before(self, path: str, landed_since: Optional[date]) -> bool:
+        if landed_since is None:
+            return False
+        return date.fromtimestamp(os.path.getmtime(path)) < landed_since
+
+    def get(
+        self,
+        lod: str,
+        period_from: str,
+        period_to: str,
+        lifeday: Optional[int],
+        landed_since: Optional[date] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the landed response, or None when it is missing, expired or was landed
+        before landed_since.
+        """
+
+        path = self._path(self.key(lod, period_from, period_to, lifeday))
+        if (
+            not os.path.exists(path)
+            or self._expired(path)
+            or self._landed_before(path, landed_since)
+        ):
+            self.misses += 1
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.hits += 1
+        return records
+
+    def put(
+        self,
+        lod: str,
+        period_from: str,
+        period_to: str,
+        lifeday: Optional[int],
+        records: List[Dict[str, Any]],
+    ) -> None:
+        """Lands a response, replacing any previous copy atomically."""
+
+        path = self._path(self.key(lod, period_from, period_to, lifeday))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")))
+                f.write("\n")
+        os.replace(tmp_path, path)
+
+    def evict(self) -> int:
+        """
+        Removes entries older than max_age_days, then the least recently written ones until
+        the cache fits in max_bytes. Returns the number of removed entries.
+        """
+
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        total_bytes = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_days * 86400
+        for mtime, size, path in sorted(entries):
+            if mtime >= cutoff and total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+            removed += 1
+        return removed
@@ -1,24 +1,216 @@
-import psycopg2
-import pandas as pd
-from typing import Tuple, List, Optional, Any
-import pandas as pd
+import hashlib
+import io
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Tuple,
+    List,
+    Optional,
+    Any,
+    Iterator,
+    Dict,
+    Iterable,
+    NamedTuple,
+)
+from configs.api import DatabaseConfigs as Config
+from etl.telemetry import telemetry
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from psycopg2.pool import ThreadedConnectionPool
+
+
+def _copy_value(value: Any) -> str:
+    """Renders a value as a field of COPY's text format."""
+
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_buffer(data_rows: List[Tuple[Any, ...]]) -> io.StringIO:
+    """Serializes rows into an in-memory buffer that can be streamed with COPY FROM STDIN."""
+
+    buffer = io.StringIO()
+    for row in data_rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def _row_hash(values: Tuple[Any, ...]) -> str:
+    """Content hash of a row's value columns, used to skip no-op upserts."""
+
+    payload = "\x1f".join(repr(value) for value in values)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _with_row_hash(
+    data_rows: List[Tuple[Any, ...]], column_names: List[str], upsert_on: List[str]
+) -> List[Tuple[Any, ...]]:
+    """Appends the hash of every non-key column to each row."""
+
+    value_idx = [i for i, col in enumerate(column_names) if col not in upsert_on]
+    return [row + (_row_hash(tuple(row[i] for i in value_idx)),) for row in data_rows]
+
+
+def _as_date(value: Any) -> date:
+    if not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return value
+
+
+def _last_per_key(
+    data_rows: List[Tuple[Any, ...]], column_names: List[str], upsert_on: List[str]
+) -> List[Tuple[Any, ...]]:
+    """
+    Keeps the last row of each key, like an upsert of all rows would; rows with a NULL
+    key never conflict and are all kept.
+    """
+
+    key_idx = [column_names.index(col) for col in upsert_on]
+    rows_by_key, null_keys = {}, []
+    for row in data_rows:
+        key = tuple(row[i] for i in key_idx)
+        if None in key:
+            null_keys.append(row)
+        else:
+            rows_by_key[key] = row
+    if len(rows_by_key) + len(null_keys) == len(data_rows):
+        return data_rows
+    return [*rows_by_key.values(), *null_keys]
+
+
+def _month_start(value: Any) -> date:
+    """First day of the month of a date or ISO date string."""
+
+    value = _as_date(value)
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _month_starts(start_date: Any, end_date: Any) -> List[date]:
+    """First days of every month overlapping [start_date, end_date]."""
+
+    month, last = _month_start(start_date), _month_start(end_date)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def _partition_name(table_name: str, month: date) -> str:
+    """Name of the monthly partition, as created by create_monthly_partitions."""
+
+    return f"{table_name}_p{month:%Y%m}"
+
+
+class ReplaceScope(NamedTuple):
+    """
+    The rows a scoped replace overwrites: those of execution dates in [start_date,
+    end_date) and, in tables with a lifeday column, of the given lifedays (all if None).
+    """
+
+    start_date: Any
+    end_date: Any
+    lifedays: Optional[List[int]] = None
+
+    def condition(self, column_names: List[str]) -> Tuple[str, Dict[str, Any]]:
+        """The SQL condition matching the rows of the scope, and its parameters."""
+
+        condition = "execution_date >= %(scope_from)s AND execution_date < %(scope_to)s"
+        if self.lifedays is not None and "lifeday" in column_names:
+            condition += " AND lifeday = ANY(%(scope_lifedays)s)"
+        return condition, {
+            "scope_from": _as_date(self.start_date),
+            "scope_to": _as_date(self.end_date),
+            "scope_lifedays": list(self.lifedays or []),
+        }
+
+    def check(self, data_rows: List[Tuple[Any, ...]], column_names: List[str]) -> None:
+        """
+        Raises ValueError if a dated row falls outside the scope, where a replace could
+        not remove it again. Rows without an execution_date are written like upserts
+        write them, since they never conflict with other rows.
+        """
+
+        start, end = _as_date(self.start_date), _as_date(self.end_date)
+        date_idx = column_names.index("execution_date")
+        outside = {
+            row[date_idx]
+            for row in data_rows
+            if row[date_idx] is not None and not start <= _as_date(row[date_idx]) < end
+        }
+        lifedays = set(self.lifedays or [])
+        if self.lifedays is not None and "lifeday" in column_names:
+            lifeday_idx = column_names.index("lifeday")
+            outside.update(
+                f"lifeday {row[lifeday_idx]}"
+                for row in data_rows
+                if row[lifeday_idx] not in lifedays
+            )
+        if outside:
+            raise ValueError(
+                f"rows outside of the replaced scope {start} - {end}: "
+                f"{sorted(map(str, outside))[:5]}"
+            )
 
 
 class DataLoader:
     def __init__(
-        self, user: str, password: str, host: str, port: str, dbname: str
+        self,
+        user: str,
+        password: str,
+        host: str,
+        port: str,
+        dbname: str,
+        min_connections: Optional[int] = None,
+        max_connections: Optional[int] = None,
     ) -> None:
         self.user = user
         self.password = password
         self.host = host
         self.port = port
         self.dbname = dbname
+        self.min_connections = min_connections or Config.min_connections
+        self.max_connections = max_connections or Config.max_connections
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # connection bound to the current thread by unit_of_work
+        self._local = threading.local()
+        # per-table inserted/updated/unchanged counts of copy_upsert writes
+        self.write_stats = {}
+        self._stats_lock = threading.Lock()
+        # (table, month) partitions known to exist
+        self._partitions = set()
 
-    def _connect(self) -> None:
-        """Establishes connection to Postgres"""
+    def _connect(self) -> "ThreadedConnectionPool":
+        """Establishes a thread-safe connection pool to Postgres"""
+
+        # psycopg2 is imported with the first connection, not with the module
+        from psycopg2.pool import ThreadedConnectionPool
 
         try:
-            return psycopg2.connect(
+            return ThreadedConnectionPool(
+                self.min_connections,
+                self.max_connections,
                 host=self.host,
                 port=self.port,
                 dbname=self.dbname,
@@ -33,6 +225,65 @@ class DataLoader:
             print(e)
             raise
 
+    def _get_pool(self) -> "ThreadedConnectionPool":
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = self._connect()
+        return self._pool
+
+    @contextmanager
+    def connection(self, isolated: bool = False) -> Iterator[Any]:
+        """
+        Borrows a connection from the pool, committing on success and rolling back on error.
+        Inside a unit_of_work the shared connection is yielded and the commit is left to it,
+        unless isolated is set, in which case a separate connection commits on its own.
+        """
+
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not isolated:
+            yield conn
+            return
+
+        pool = self._get_pool()
+        with telemetry.timer("db_pool_wait_seconds"):
+            conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[Any]:
+        """
+        Runs every DataLoader call made by the current thread inside the block on a single
+        connection and commits them atomically when the block exits. Nested scopes join the
+        outermost one.
+        """
+
+        if getattr(self._local, "conn", None) is not None:
+            yield self._local.conn
+            return
+
+        with self.connection() as conn:
+            self._local.conn = conn
+            try:
+                yield conn
+            finally:
+                self._local.conn = None
+
+    def close(self) -> None:
+        """Closes all pooled connections."""
+
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
     def __repr__(self) -> str:
         return (
             f"Postgres(user='{self.user}', password='***', "
@@ -46,25 +297,69 @@ class DataLoader:
         column_names: List[str],
         write_method: str,
         upsert_on: Optional[List[str]] = None,
-    ) -> None:
-        """Writes data to a database table using the specified method (replace, append, upsert)."""
+        detect_changes: bool = False,
+        replace_scope: Optional[ReplaceScope] = None,
+    ) -> Optional[Dict[str, int]]:
+        """
+        Writes data to a database table using the specified method (replace, append, upsert,
+        copy_upsert). replace overwrites the rows of replace_scope, or the whole table
+        without one. On a partitioned table, each month it covers is rebuilt in a shadow
+        table that is swapped in for the month's partition, in a transaction of its own
+        that commits right away rather than with the unit of work (see _swap_partitions).
+        Otherwise the scope is deleted and the rows are copied in within the current
+        transaction. append inserts the rows with executemany, checking that they fall in
+        replace_scope when it is given. copy_upsert has the same semantics as upsert but
+        streams the rows with COPY into a temporary staging table and merges them with one
+        set-based statement; it returns the number of inserted, updated and unchanged rows.
+        With detect_changes, rows are written with a row_hash of the value columns, and
+        upserts leave rows whose hash did not change untouched (no new row version, no
+        processing_timestamp bump).
+        """
 
+        stats = None
+        requested_method = write_method
+        started = time.perf_counter()
         try:
-            with self._connect() as conn:
+            if replace_scope is not None and write_method in ("replace", "append"):
+                replace_scope.check(data_rows, column_names)
+            if detect_changes:
+                if upsert_on is None:
+                    raise ValueError("upsert_on must be provided to detect changes.")
+                data_rows = _with_row_hash(data_rows, column_names, upsert_on)
+                column_names = [*column_names, "row_hash"]
+
+            with self.connection() as conn:
                 cursor = conn.cursor()
 
                 if write_method == "replace":
-                    cursor.execute(f"DELETE FROM {table_name};")
-                    conn.commit()
-                    write_method = "append"  # append after replace
+                    if upsert_on is not None:
+                        # e.g. every lifeday response repeats the performance rows
+                        data_rows = _last_per_key(data_rows, column_names, upsert_on)
+                    if self._is_partitioned(cursor, table_name):
+                        write_method = "swap"  # swap whole partitions
+                    else:
+                        if replace_scope is None:
+                            # leaves no dead rows behind, unlike DELETE
+                            cursor.execute(f"TRUNCATE {table_name}")
+                        else:
+                            condition, params = replace_scope.condition(column_names)
+                            cursor.execute(
+                                f"DELETE FROM {table_name} WHERE {condition}", params
+                            )
+                        write_method = "copy"  # bulk load after replace
 
-                if write_method == "append":
+                if write_method == "copy":
+                    cursor.copy_expert(
+                        f"COPY {table_name} ({', '.join(column_names)}) FROM STDIN",
+                        _copy_buffer(data_rows),
+                    )
+
+                elif write_method == "append":
                     insert_query = f"""
                         INSERT INTO {table_name} ({', '.join(column_names)})
                         VALUES ({', '.join(['%s'] * len(column_names))});
                     """
                     cursor.executemany(insert_query, data_rows)
-                    conn.commit()
 
                 elif write_method == "upsert":
                     if upsert_on is None:
@@ -87,15 +382,59 @@ class DataLoader:
                         INSERT INTO {table_name} ({', '.join(column_names)})
                         VALUES ({', '.join(['%s'] * len(column_names))})
                         ON CONFLICT ({conflict_cols})
-                        DO UPDATE SET {update_clause};
+                        DO UPDATE SET {update_clause}
+                        {self._changed_condition(table_name, detect_changes)};
                     """
                     cursor.executemany(upsert_query, data_rows)
-                    conn.commit()
+
+                elif write_method == "copy_upsert":
+                    if upsert_on is None:
+                        raise ValueError(
+                            "upsert_on must be provided for upsert operations."
+                        )
+                    stats = self._copy_upsert(
+                        cursor,
+                        table_name,
+                        data_rows,
+                        column_names,
+                        upsert_on,
+                        detect_changes,
+                    )
+                    self._add_write_stats(table_name, stats)
+
+                elif write_method == "swap":
+                    # DETACH holds an ACCESS EXCLUSIVE lock on the table until commit,
+                    # which must not wait for the rest of the unit of work
+                    with self.connection(isolated=True) as swap_conn:
+                        self._swap_partitions(
+                            swap_conn.cursor(),
+                            table_name,
+                            data_rows,
+                            column_names,
+                            replace_scope,
+                        )
 
                 else:
                     raise NotImplementedError(f"{write_method} is not implemented!")
 
-                print(f"Row data successfully {write_method} on table {table_name}!")
+                print(
+                    f"Row data successfully {write_method} on table {table_name}!"
+                    + (f" {stats}" if stats else "")
+                )
+            elapsed = time.perf_counter() - started
+            telemetry.observe(
+                "db_write_seconds", elapsed, table=table_name, method=requested_method
+            )
+            telemetry.inc("db_rows_written_total", len(data_rows), table=table_name)
+            telemetry.event(
+                "db_write",
+                table=table_name,
+                method=requested_method,
+                rows=len(data_rows),
+                seconds=round(elapsed, 6),
+                **(stats or {}),
+            )
+            return stats
 
         except Exception as e:
             print(
@@ -104,6 +443,316 @@ class DataLoader:
             )
             raise
 
+    def _copy_upsert(
+        self,
+        cursor: Any,
+        table_name: str,
+        data_rows: List[Tuple[Any, ...]],
+        column_names: List[str],
+        upsert_on: List[str],
+        detect_changes: bool = False,
+    ) -> Dict[str, int]:
+        """Loads rows into a staging table with COPY and merges them into table_name."""
+
+        stage_name = f"_stage_{table_name}"
+        columns = ", ".join(column_names)
+        conflict_cols = ", ".join(upsert_on)
+        update_clause = ", ".join(
+            [
+                f"{col} = EXCLUDED.{col}"
+                for col in column_names
+                if col not in upsert_on and col != "processing_timestamp"
+            ]
+            + ["processing_timestamp = now()"]
+        )
+        # like executemany, the last occurrence of a conflict key wins; rows with a
+        # NULL key never conflict and are all kept. Merging in key order makes
+        # concurrent loads of overlapping windows lock rows in the same order, so
+        # they cannot deadlock.
+        null_keys = " OR ".join(f"{col} IS NULL" for col in upsert_on)
+
+        # a temporary table is private to the session and skips the WAL
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE {stage_name} AS
+            SELECT {columns} FROM {table_name} WITH NO DATA;
+            ALTER TABLE {stage_name} ADD COLUMN _row_number BIGSERIAL;
+            """
+        )
+        cursor.copy_expert(
+            f"COPY {stage_name} ({columns}) FROM STDIN", _copy_buffer(data_rows)
+        )
+        # the statement's snapshot predates the merge, so merged keys found in the table
+        # belong to updated rows and the rest were inserted (xmax cannot be returned from
+        # partitioned tables). Rows skipped by the change condition are not returned.
+        key_match = " AND ".join(f"t.{col} = m.{col}" for col in upsert_on)
+        cursor.execute(
+            f"""
+            WITH staged AS (
+                SELECT {columns} FROM (
+                    SELECT *, row_number() OVER (
+                        PARTITION BY {conflict_cols} ORDER BY _row_number DESC
+                    ) AS _rank
+                    FROM {stage_name}
+                ) ranked
+                WHERE _rank = 1 OR {null_keys}
+            ),
+            merged AS (
+                INSERT INTO {table_name} ({columns})
+                SELECT {columns} FROM staged
+                ORDER BY {conflict_cols}
+                ON CONFLICT ({conflict_cols})
+                DO UPDATE SET {update_clause}
+                {self._changed_condition(table_name, detect_changes)}
+                RETURNING {conflict_cols}
+            )
+            SELECT
+                (SELECT count(*) FROM staged),
+                (SELECT count(*) FROM merged),
+                (SELECT count(*) FROM merged m JOIN {table_name} t ON {key_match})
+            """
+        )
+        staged, merged, updated = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {stage_name}")
+        return {
+            "inserted": merged - updated,
+            "updated": updated,
+            "unchanged": staged - merged,
+        }
+
+    def delete_scope(
+        self,
+        table_name: str,
+        column_names: List[str],
+        replace_scope: Optional[ReplaceScope] = None,
+    ) -> None:
+        """
+        Deletes the rows of replace_scope (all rows without one) in the current
+        transaction, so that inside a unit_of_work readers keep seeing them until it
+        commits.
+        """
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                if replace_scope is None:
+                    cursor.execute(f"DELETE FROM {table_name}")
+                else:
+                    condition, params = replace_scope.condition(column_names)
+                    cursor.execute(
+                        f"DELETE FROM {table_name} WHERE {condition}", params
+                    )
+                print(f"Deleted {cursor.rowcount} rows of the scope from {table_name}")
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.delete_scope.__name__}: an error occurred while deleting the scope from the table '{table_name}': {e}"
+            )
+            raise
+
+    @staticmethod
+    def _is_partitioned(cursor: Any, table_name: str) -> bool:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass(%s))",
+            (table_name,),
+        )
+        return cursor.fetchone()[0]
+
+    def _swap_partitions(
+        self,
+        cursor: Any,
+        table_name: str,
+        data_rows: List[Tuple[Any, ...]],
+        column_names: List[str],
+        scope: Optional[ReplaceScope] = None,
+    ) -> None:
+        """
+        Replaces the contents of a partitioned table partition by partition: the rows of
+        each month are copied into a shadow table, which then takes the place of the
+        month's partition. With a scope, the months it overlaps are swapped, and their
+        shadows also get the rows of the partition outside of the scope; the other
+        partitions are left alone. Without one, the partitions of the months without rows
+        are truncated. Rows without an execution_date go to the default partition.
+
+        Each shadow gets the indexes, foreign keys and constraints of the table, and a
+        CHECK matching its range, before any partition is detached. ATTACH then adopts
+        them instead of building indexes, validating foreign keys or scanning the shadow,
+        so the ACCESS EXCLUSIVE lock of DETACH lasts only for the catalog changes; the
+        caller commits right after.
+        """
+
+        columns = ", ".join(column_names)
+        date_idx = column_names.index("execution_date")
+        rows_by_month = {}
+        for row in data_rows:
+            month = None if row[date_idx] is None else _month_start(row[date_idx])
+            rows_by_month.setdefault(month, []).append(row)
+        if scope is None:
+            months = sorted(month for month in rows_by_month if month is not None)
+        else:
+            last_day = _as_date(scope.end_date) - timedelta(days=1)
+            months = _month_starts(scope.start_date, last_day)
+            condition, params = scope.condition(column_names)
+
+        # blocks the other writers of the table, but not its readers, until the
+        # transaction ends: concurrent swaps cannot deadlock upgrading their locks,
+        # and no row can be written to a partition after its shadow copied the
+        # rows it keeps
+        cursor.execute(f"LOCK TABLE {table_name} IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            (table_name,),
+        )
+        existing = {name for (name,) in cursor.fetchall()}
+        cursor.execute(
+            """
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+            FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+            """,
+            (table_name,),
+        )
+        all_columns = cursor.fetchone()[0]
+        # LIKE does not copy foreign keys
+        cursor.execute(
+            """
+            SELECT quote_ident(conname), pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+            """,
+            (table_name,),
+        )
+        foreign_keys = cursor.fetchall()
+
+        # the shadow tables are filled and indexed before the partitions are swapped,
+        # while readers still see the old partitions
+        for month in months:
+            partition = _partition_name(table_name, month)
+            shadow = f"{partition}_swap"
+            cursor.execute(
+                f"""
+                CREATE TABLE {shadow} (LIKE {table_name} INCLUDING ALL);
+                ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_range CHECK (
+                    execution_date IS NOT NULL
+                    AND execution_date >= %s AND execution_date < %s
+                );
+                """,
+                (month, _next_month(month)),
+            )
+            if scope is not None and partition in existing:
+                # the rows the scope does not cover are kept, with their ids
+                cursor.execute(
+                    f"""
+                    INSERT INTO {shadow} ({all_columns})
+                    SELECT {all_columns} FROM {partition}
+                    WHERE ({condition}) IS NOT TRUE
+                    """,
+                    params,
+                )
+            cursor.copy_expert(
+                f"COPY {shadow} ({columns}) FROM STDIN",
+                _copy_buffer(rows_by_month.get(month, [])),
+            )
+            for name, definition in foreign_keys:
+                # validated separately, which does not block writes to the referenced
+                # dimension tables
+                cursor.execute(
+                    f"""
+                    ALTER TABLE {shadow} ADD CONSTRAINT {name} {definition} NOT VALID;
+                    ALTER TABLE {shadow} VALIDATE CONSTRAINT {name};
+                    """
+                )
+
+        replaced = {_partition_name(table_name, month) for month in months}
+        stale = sorted(existing - replaced)
+        if stale and scope is None:
+            # also empties the default partition, so that attaching cannot collide with it
+            cursor.execute(f"TRUNCATE {', '.join(stale)}")
+        if None in rows_by_month:
+            cursor.copy_expert(
+                f"COPY {table_name} ({columns}) FROM STDIN",
+                _copy_buffer(rows_by_month[None]),
+            )
+
+        for month in months:
+            partition = _partition_name(table_name, month)
+            if partition in existing:
+                cursor.execute(
+                    f"""
+                    ALTER TABLE {table_name} DETACH PARTITION {partition};
+                    DROP TABLE {partition};
+                    """
+                )
+            cursor.execute(
+                f"""
+                ALTER TABLE {partition}_swap RENAME TO {partition};
+                ALTER TABLE {table_name} ATTACH PARTITION {partition}
+                    FOR VALUES FROM (%s) TO (%s);
+                ALTER TABLE {partition} DROP CONSTRAINT {partition}_swap_range;
+                """,
+                (month, _next_month(month)),
+            )
+            self._partitions.add((table_name, month))
+
+    def ensure_partitions(
+        self, table_names: List[str], start_date: Any, end_date: Any
+    ) -> int:
+        """
+        Creates the monthly partitions of table_names covering [start_date, end_date] that
+        do not exist yet, and returns how many were created. Creating a partition waits
+        for open transactions on its table, so this runs on its own connection before
+        the window is written rather than inside its unit of work.
+        """
+
+        months = _month_starts(start_date, end_date)
+        missing = [
+            table_name
+            for table_name in table_names
+            if any((table_name, month) not in self._partitions for month in months)
+        ]
+        if not missing:
+            return 0
+
+        created = 0
+        try:
+            with telemetry.timer(
+                "db_call_seconds", call="ensure_partitions"
+            ), self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    for table_name in missing:
+                        cur.execute(
+                            "SELECT create_monthly_partitions(%s, %s, %s)",
+                            (table_name, months[0], months[-1]),
+                        )
+                        created += cur.fetchone()[0]
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.ensure_partitions.__name__}: an error occurred while creating partitions of {missing}: {e}"
+            )
+            raise
+
+        self._partitions.update(
+            (table_name, month) for table_name in missing for month in months
+        )
+        if created:
+            print(f"Created {created} partitions for {start_date} - {end_date}")
+        return created
+
+    @staticmethod
+    def _changed_condition(table_name: str, detect_changes: bool) -> str:
+        if not detect_changes:
+            return ""
+        return f"WHERE {table_name}.row_hash IS DISTINCT FROM EXCLUDED.row_hash"
+
+    def _add_write_stats(self, table_name: str, stats: Dict[str, int]) -> None:
+        with self._stats_lock:
+            self.write_stats.setdefault(table_name, Counter()).update(stats)
+
     def create_table(self, table_name: str, fields: dict) -> None:
         """Creates a table in the database with the specified name and fields."""
 
@@ -111,10 +760,9 @@ class DataLoader:
             columns = ", ".join([f"{col} {dtype}" for col, dtype in fields.items()])
             create_query = f"CREATE TABLE IF NOT EXISTS {table_name} ({columns});"
 
-            with self._connect() as conn:
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(create_query)
-                conn.commit()
                 print(f"Table '{table_name}' created successfully!")
         except Exception as e:
             print(
@@ -127,11 +775,10 @@ class DataLoader:
         """Drops a table from the database if it exists."""
 
         try:
-            with self._connect() as conn:
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 drop_query = f"DROP TABLE IF EXISTS {table_name}"
                 cursor.execute(drop_query)
-                conn.commit()
                 print("Table dropped successfuly!")
         except Exception as e:
             print(
@@ -140,21 +787,82 @@ class DataLoader:
             )
             raise
 
-    def query_table(self, query: str) -> pd.DataFrame:
+    def query_table(self, query: str) -> "pd.DataFrame":
+        # pandas is slow to import and only needed for ad-hoc queries
+        import pandas as pd
+
         try:
-            with self._connect() as conn:
+            with self.connection() as conn:
                 return pd.read_sql(query, conn)
         except Exception as e:
             print(
-                f"{self.__class.__name__} - {self.query_table.__name__}: an error while querying:",
+                f"{self.__class__.__name__} - {self.query_table.__name__}: an error while querying:",
                 e,
             )
             raise
 
+    def copy_query(
+        self,
+        query: str,
+        params: Optional[Dict[str, Any]],
+        file: IO,
+        buffer_size: int = Config.copy_buffer_bytes,
+    ) -> int:
+        """
+        Streams the result of query into file as CSV with a header through COPY TO STDOUT,
+        buffer_size bytes at a time, and returns the number of rows.
+        """
+        try:
+            with self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    bound_query = cur.mogrify(query, params).decode()
+                    cur.copy_expert(
+                        f"COPY ({bound_query}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                        file,
+                        size=buffer_size,
+                    )
+                    return cur.rowcount
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.copy_query.__name__}: an error occurred while copying the query result: {e}"
+            )
+            raise
+
+    def stream_query(
+        self,
+        query: str,
+        params: Optional[Dict[str, Any]],
+        chunk_rows: int,
+    ) -> Iterator[Tuple[List[Tuple[str, int]], List[Tuple[Any, ...]]]]:
+        """
+        Yields the result of query in chunks of at most chunk_rows rows, fetched from a named
+        server-side cursor, each with the (name, type oid) of its columns. The first chunk is
+        yielded even when it is empty, so that the columns of an empty result are known.
+        """
+        try:
+            with self.connection(isolated=True) as conn:
+                with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                    cur.itersize = chunk_rows
+                    cur.execute(query, params)
+                    rows = cur.fetchmany(chunk_rows)
+                    columns = [
+                        (column.name, column.type_code) for column in cur.description
+                    ]
+                    yield columns, rows
+                    while len(rows) == chunk_rows:
+                        rows = cur.fetchmany(chunk_rows)
+                        if rows:
+                            yield columns, rows
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.stream_query.__name__}: an error occurred while streaming the query result: {e}"
+            )
+            raise
+
     def upsert_campaign(self, campaign_name: str) -> int:
         """Inserts a campaign into the campaigns table or retrieves the campaign_id if it already exists."""
         try:
-            with self._connect() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -183,7 +891,7 @@ class DataLoader:
     def upsert_ad(self, ad_name: str) -> int:
         """Inserts an ad into the ads table or retrieves the ad_id if it already exists."""
         try:
-            with self._connect() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -208,3 +916,193 @@ class DataLoader:
                 f"{self.__class__.__name__} - {self.upsert_ad.__name__}: an error occurred while upserting the ad '{ad_name}': {e}"
             )
             raise
+
+    def _upsert_dimension(
+        self, table_name: str, id_column: str, name_column: str, names: Iterable[str]
+    ) -> Dict[str, int]:
+        """
+        Inserts all missing names of a dimension table and returns the ids of every given name
+        in a set-based statement. The statements are committed on their own connection, so
+        ids handed out (and cached) never belong to a transaction that may still roll back.
+        """
+
+        # sorted input keeps id assignment independent of the order records arrived in
+        names = sorted(set(names))
+        if not names:
+            return {}
+
+        query = f"""
+            WITH input AS (
+                SELECT DISTINCT name FROM unnest(%s::text[]) AS t(name)
+            ),
+            inserted AS (
+                INSERT INTO {table_name} ({name_column})
+                SELECT name FROM input ORDER BY name
+                ON CONFLICT ({name_column}) DO NOTHING
+                RETURNING {id_column}, {name_column}
+            )
+            SELECT {id_column}, {name_column} FROM inserted
+            UNION ALL
+            SELECT d.{id_column}, d.{name_column}
+            FROM {table_name} d
+            JOIN input i ON i.name = d.{name_column}
+        """
+        with telemetry.timer("db_call_seconds", call=f"upsert_{table_name}"):
+            with self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, (names,))
+                    ids = {name: _id for _id, name in cur.fetchall()}
+                    # names committed concurrently are skipped by ON CONFLICT but are not
+                    # visible to the statement's snapshot; a new statement sees them
+                    missing = [name for name in names if name not in ids]
+                    if missing:
+                        cur.execute(
+                            f"""
+                            SELECT {id_column}, {name_column} FROM {table_name}
+                            WHERE {name_column} = ANY(%s)
+                            """,
+                            (missing,),
+                        )
+                        ids.update({name: _id for _id, name in cur.fetchall()})
+                    return ids
+
+    def upsert_campaigns(self, campaign_names: Iterable[str]) -> Dict[str, int]:
+        """Bulk counterpart of upsert_campaign, returning a campaign name -> campaign_id mapping."""
+        try:
+            return self._upsert_dimension(
+                "campaigns", "campaign_id", "campaign_name", campaign_names
+            )
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.upsert_campaigns.__name__}: an error occurred while upserting campaigns: {e}"
+            )
+            raise
+
+    def upsert_ads(self, ad_names: Iterable[str]) -> Dict[str, int]:
+        """Bulk counterpart of upsert_ad, returning an ad name -> ad_id mapping."""
+        try:
+            return self._upsert_dimension("ads", "ad_id", "ad_name", ad_names)
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.upsert_ads.__name__}: an error occurred while upserting ads: {e}"
+            )
+            raise
+
+    def load_dimension(
+        self, table_name: str, id_column: str, name_column: str, limit: int
+    ) -> Dict[str, int]:
+        """Reads up to limit (most recently created) name -> id pairs of a dimension table."""
+        try:
+            with self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        SELECT {id_column}, {name_column} FROM {table_name}
+                        ORDER BY {id_column} DESC
+                        LIMIT %s
+                        """,
+                        (limit,),
+                    )
+                    return {name: _id for _id, name in cur.fetchall()}
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.load_dimension.__name__}: an error occurred while reading '{table_name}': {e}"
+            )
+            raise
+
+    def get_final_windows(self) -> List[Tuple[str, Any, Any, int]]:
+        """Returns the (lod, period_from, period_to, lifeday) extractions recorded as final."""
+        try:
+            with self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT lod, period_from, period_to, lifeday
+                        FROM etl_load_state
+                        WHERE is_final
+                        """
+                    )
+                    return cur.fetchall()
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.get_final_windows.__name__}: an error occurred while reading the load state: {e}"
+            )
+            raise
+
+    def record_load_state(self, rows: List[Tuple[str, str, str, int, bool]]) -> None:
+        """Upserts (lod, period_from, period_to, lifeday, is_final) load state rows."""
+        try:
+            with telemetry.timer(
+                "db_call_seconds", call="record_load_state"
+            ), self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO etl_load_state
+                            (lod, period_from, period_to, lifeday, is_final)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (lod, period_from, period_to, lifeday)
+                        DO UPDATE SET is_final = EXCLUDED.is_final, loaded_at = now()
+                        """,
+                        rows,
+                    )
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.record_load_state.__name__}: an error occurred while recording the load state: {e}"
+            )
+            raise
+
+    def get_window_sizes(self) -> Dict[str, int]:
+        """Returns the adaptive window size (in days) last recorded for each lod."""
+        try:
+            with self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT lod, days FROM etl_window_sizes")
+                    return dict(cur.fetchall())
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.get_window_sizes.__name__}: an error occurred while reading the window sizes: {e}"
+            )
+            raise
+
+    def record_window_sizes(self, sizes: Dict[str, int]) -> None:
+        """Upserts the adaptive window size (in days) learned for each lod."""
+        try:
+            with self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO etl_window_sizes (lod, days)
+                        VALUES (%s, %s)
+                        ON CONFLICT (lod)
+                        DO UPDATE SET days = EXCLUDED.days, updated_at = now()
+                        """,
+                        sorted(sizes.items()),
+                    )
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.record_window_sizes.__name__}: an error occurred while recording the window sizes: {e}"
+            )
+            raise
+
+    def refresh_monthly_rollup(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None
+    ) -> None:
+        """
+        Rebuilds the monthly_campaign_rollup rows of every month overlapping
+        [start_date, end_date], or of all months when neither is given.
+        """
+        try:
+            with telemetry.timer(
+                "db_call_seconds", call="refresh_monthly_rollup"
+            ), self.connection(isolated=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT refresh_monthly_campaign_rollup(%s::DATE, %s::DATE)",
+                        (start_date, end_date),
+                    )
+        except Exception as e:
+            print(
+                f"{self.__class__.__name__} - {self.refresh_monthly_rollup.__name__}: an error occurred while refreshing the monthly rollup: {e}"
+            )
+            raise
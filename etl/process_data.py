@@ -1,48 +1,243 @@
-from typing import List, Dict, Any, Tuple, Callable
+from typing import List, Dict, Any, Tuple, Callable, Optional
+import math
 from etl.load_data import DataLoader
-from collections import defaultdict
+from etl.dimension_cache import DimensionCache
+from etl.dead_letters import DeadLetter, DeadLetterStore, record_letter
+from etl.decoding import decode_facts, decode_facts_columnar
+from etl.telemetry import telemetry
+from configs.api import SchemaConfigs
+
+# additive fact columns, summed when rolling ads up into their campaign
+PERFORMANCE_BASES = ["spend", "impressions", "clicks", "registrations"]
+METRICS_BASES = ["players", "payers", "payments", "revenue"]
+
+
+def _sum(values: List[Any]) -> Any:
+    """Sums the values that are present; None when none are."""
+
+    present = [value for value in values if value is not None]
+    return sum(present) if present else None
+
+
+def _ratio(numerator: Any, denominator: Any) -> Optional[float]:
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
 
 
 class DataProcessor:
-    def __init__(self, loader: DataLoader):
+    def __init__(
+        self,
+        loader: DataLoader,
+        campaign_cache: Optional[DimensionCache] = None,
+        ad_cache: Optional[DimensionCache] = None,
+        dead_letters: Optional[DeadLetterStore] = None,
+        columnar: bool = False,
+    ):
         self.loader = loader
+        self.columnar = columnar
+        # records that fail to transform are kept here for a later replay
+        self.dead_letters = dead_letters
+        # id caches live as long as the processor, i.e. for the whole run
+        if campaign_cache is None:
+            campaign_cache = DimensionCache(loader.upsert_campaigns)
+        if ad_cache is None:
+            ad_cache = DimensionCache(loader.upsert_ads)
+        self.campaign_cache = campaign_cache
+        self.ad_cache = ad_cache
+
+    def warm_dimension_cache(self) -> None:
+        """Preloads the campaign and ad id caches from the dimension tables."""
+
+        self.campaign_cache.warm(
+            self.loader.load_dimension(
+                "campaigns",
+                "campaign_id",
+                "campaign_name",
+                limit=self.campaign_cache.max_size,
+            )
+        )
+        self.ad_cache.warm(
+            self.loader.load_dimension(
+                "ads", "ad_id", "ad_name", limit=self.ad_cache.max_size
+            )
+        )
+        print(
+            f"Warmed dimension caches: {len(self.campaign_cache)} campaigns, "
+            f"{len(self.ad_cache)} ads"
+        )
+
+    def _dead_letter(self, letters: List[DeadLetter]) -> None:
+        if letters and self.dead_letters is not None:
+            self.dead_letters.add(letters)
+            print(f"Recorded {len(letters)} failed records as dead letters")
 
     def get_campaign_ids(self, data: List[Dict[str, Any]]) -> Dict[str, int]:
         """
-        Processes a list of records to extract unique campaign names, upserts them using the
-        loader, and returns a dictionary mapping campaign names to their corresponding IDs.
+        Processes a list of records to extract unique campaign names, resolves them in bulk
+        through the id cache, and returns a dictionary mapping campaign names to their IDs.
         """
 
-        campaigns_ids = defaultdict(int)
-        campaigns = set(
-            [
-                record["campaign"]
-                for record in data
-                if "campaign" in record and record["campaign"]
-            ]
+        campaigns = {record.get("campaign") for record in data if type(record) is dict}
+        return self.campaign_cache.resolve(
+            name for name in campaigns if type(name) is str and name
         )
-        for campaign in campaigns:
-            campaigns_ids[campaign] = self.loader.upsert_campaign(campaign)
-        return campaigns_ids
 
     def get_ad_ids(self, data: List[Dict[str, Any]]) -> Dict[str, int]:
         """
-        Processes a list of records to extract unique ad names, upserts them
-        using the loader, and returns a dictionary mapping each ad to its corresponding ID.
+        Processes a list of records to extract unique ad names, resolves them in bulk
+        through the id cache, and returns a dictionary mapping each ad to its ID.
+        """
+
+        ads = {record.get("ad") for record in data if type(record) is dict}
+        return self.ad_cache.resolve(name for name in ads if type(name) is str and name)
+
+    @staticmethod
+    def derive_campaign_data(
+        performance_data: List[Tuple[Any, ...]], metrics_data: List[Tuple[Any, ...]]
+    ) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
+        """
+        Rolls the campaign-ad-level performance and metrics rows up into the rows of the
+        campaign-level tables, one per (campaign, date) and (campaign, date, lifeday).
+        Bases are summed over the campaign's ads and ctr, cr and cpc are recomputed from
+        the sums. Every lifeday response repeats the performance of its records, so each
+        ad is counted once per group; rows without an ad cannot be told apart by their
+        ad and count once per distinct performance row, and once per metrics row.
         """
 
-        ad_ids = defaultdict(int)
-        ads = set([record["ad"] for record in data if "ad" in record and record["ad"]])
-        for ad in ads:
-            ad_ids[ad] = self.loader.upsert_ad(ad)
-        return ad_ids
+        performance_columns = SchemaConfigs.column_data["fact_campaign_ad_performance"]
+        metrics_columns = SchemaConfigs.column_data["fact_campaign_ad_metrics"]
+
+        def positions(columns: List[str], names: List[str]) -> List[int]:
+            return [columns.index(name) for name in names]
+
+        campaign, ad, execution_date = positions(
+            performance_columns, ["campaign_id", "ad_id", "execution_date"]
+        )
+        performance_bases = positions(performance_columns, PERFORMANCE_BASES)
+        groups = {}
+        for row in performance_data:
+            ads = groups.setdefault((row[campaign], row[execution_date]), {})
+            ads[row[ad] if row[ad] is not None else row] = row
+        performance = []
+        for (campaign_id, day), ads in groups.items():
+            spend, impressions, clicks, registrations = [
+                _sum([row[index] for row in ads.values()])
+                for index in performance_bases
+            ]
+            performance.append(
+                (
+                    campaign_id,
+                    day,
+                    spend,
+                    impressions,
+                    clicks,
+                    registrations,
+                    _ratio(clicks, impressions),
+                    _ratio(registrations, clicks),
+                    _ratio(spend, clicks),
+                )
+            )
+
+        campaign, ad, execution_date, lifeday = positions(
+            metrics_columns, ["campaign_id", "ad_id", "execution_date", "lifeday"]
+        )
+        metrics_bases = positions(metrics_columns, METRICS_BASES)
+        groups = {}
+        for row in metrics_data:
+            ads = groups.setdefault(
+                (row[campaign], row[execution_date], row[lifeday]), {}
+            )
+            # (None, n) keys are unique per group and never clash with an ad id
+            ads[row[ad] if row[ad] is not None else (None, len(ads))] = row
+        metrics = [
+            (
+                *key,
+                *[
+                    _sum([row[index] for row in ads.values()])
+                    for index in metrics_bases
+                ],
+            )
+            for key, ads in groups.items()
+        ]
+        return performance, metrics
+
+    @staticmethod
+    def reconcile_campaign_data(
+        derived: Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]],
+        actual: Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]],
+        rel_tol: float = 1e-3,
+    ) -> List[str]:
+        """
+        Compares derived campaign-level (performance, metrics) rows with the ones served by
+        the API, matched on (campaign, date) and (campaign, date, lifeday), and returns a
+        description of every difference.
+        """
+
+        mismatches = []
+        for table, rows, other in zip(SchemaConfigs.lod_tables["c"], derived, actual):
+            columns = SchemaConfigs.column_data[table]
+            keys = [
+                index
+                for index, column in enumerate(columns)
+                if column in SchemaConfigs.upsert_keys[table]
+            ]
+            fields = [
+                (index, column)
+                for index, column in enumerate(columns)
+                if column not in SchemaConfigs.upsert_keys[table]
+            ]
+
+            def index(rows: List[Tuple[Any, ...]]) -> Dict[Tuple, Tuple[Any, ...]]:
+                return {tuple(row[i] for i in keys): row for row in rows}
+
+            derived_by_key, actual_by_key = index(rows), index(other)
+            for key in sorted(derived_by_key.keys() | actual_by_key.keys(), key=str):
+                if key not in actual_by_key or key not in derived_by_key:
+                    side = "API" if key not in actual_by_key else "ad-level data"
+                    mismatches.append(f"{key}: missing from the {side}")
+                    continue
+                for i, field in fields:
+                    expected, value = actual_by_key[key][i], derived_by_key[key][i]
+                    if expected is None or value is None:
+                        if expected != value:
+                            mismatches.append(f"{key} {field}: {value} != {expected}")
+                    elif not math.isclose(
+                        value, expected, rel_tol=rel_tol, abs_tol=1e-6
+                    ):
+                        mismatches.append(f"{key} {field}: {value} != {expected}")
+        return mismatches
+
+    def _decode(
+        self,
+        lod: str,
+        data: List[Dict[str, Any]],
+        campaign_ids: Dict[str, int],
+        ad_ids: Optional[Dict[str, int]] = None,
+    ) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
+        decode = decode_facts_columnar if self.columnar else decode_facts
+        performance_data, metrics_data, rejected = decode(
+            lod, data, campaign_ids, ad_ids
+        )
+        if rejected:
+            print(
+                f"Rejected {len(rejected)} malformed records of lod '{lod}', "
+                f"e.g. {rejected[0][1]}"
+            )
+            telemetry.inc("records_rejected_total", len(rejected), lod=lod)
+            self._dead_letter(
+                [record_letter(lod, record, str(error)) for record, error in rejected]
+            )
+        return performance_data, metrics_data
 
     def process_campaign_ad_data(
         self, data: List[Dict[str, Any]]
     ) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
         """
         Processes campaign-ad-level data to extract performance and metrics information,
-        returning two lists of tuples containing the processed data.
+        returning two lists of tuples containing the processed data. Records are validated
+        and turned into rows in one pass (see etl.decoding); one that does not match the
+        payload schema is skipped and recorded as a dead letter.
         """
 
         if not data:
@@ -50,68 +245,18 @@ class DataProcessor:
             print("No data provided for processing.")
             return [], []
 
-        campaign_ad_performance_data, campaign_ad_metrics_data = [], []
         campaign_ids = self.get_campaign_ids(data=data)
         ad_ids = self.get_ad_ids(data=data)
-
-        for record in data:
-            try:
-                # campaign and ad fields are allowed to be NULL
-                campaign_id = (
-                    campaign_ids[record["campaign"]]
-                    if record["campaign"] in campaign_ids
-                    else None
-                )
-                ad_id = ad_ids[record["ad"]] if record["ad"] in ad_ids else None
-                execution_date = record.get("date")
-
-                campaign_ad_performance_record = {
-                    "campaign_id": campaign_id,
-                    "ad_id": ad_id,
-                    "execution_date": execution_date,
-                    "spend": record.get("cost"),
-                    "impressions": record.get("impressions"),
-                    "clicks": record.get("clicks"),
-                    "registrations": record.get("registrations"),
-                    "ctr": record.get("ctr"),
-                    "cr": record.get("cr"),
-                    "cpc": record.get("cpc"),
-                }
-
-                campaign_ad_tuple = tuple(
-                    v for v in campaign_ad_performance_record.values()
-                )
-                campaign_ad_performance_data.append(campaign_ad_tuple)
-
-                # list of jsons
-                metrics = record.get("metrics", [{}])[0]
-
-                campaign_ad_metrics_record = {
-                    "campaign_id": campaign_id,
-                    "ad_id": ad_id,
-                    "execution_date": execution_date,
-                    "lifeday": metrics.get("lifeday"),
-                    "players": metrics.get("players"),
-                    "payers": metrics.get("payers"),
-                    "payments": metrics.get("payments"),
-                    "revenue": metrics.get("revenue"),
-                }
-                campaign_ad_metrics_tuple = tuple(
-                    v for v in campaign_ad_metrics_record.values()
-                )
-                campaign_ad_metrics_data.append(campaign_ad_metrics_tuple)
-            except Exception as e:
-                print(f"Error processing record: {record}. Error: {e}")
-                # TODO add the erronous records to a dead letter sink
-
-        return campaign_ad_performance_data, campaign_ad_metrics_data
+        return self._decode("a", data, campaign_ids, ad_ids)
 
     def process_campaign_data(
         self, data: List[Dict[str, Any]]
     ) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
         """
         Processes campaign-level data to extract performance and metrics information,
-        returning two lists of tuples containing the processed data.
+        returning two lists of tuples containing the processed data. Records are validated
+        and turned into rows in one pass (see etl.decoding); one that does not match the
+        payload schema is skipped and recorded as a dead letter.
         """
 
         if not data:
@@ -119,52 +264,5 @@ class DataProcessor:
             print("No data provided for processing.")
             return [], []
 
-        campaign_performance_data, campaign_performance_metrics = [], []
         campaign_ids = self.get_campaign_ids(data=data)
-
-        for record in data:
-            try:
-                # campaign and ad fields are allowed to be NULL
-                campaign_id = (
-                    campaign_ids[record["campaign"]]
-                    if record["campaign"] in campaign_ids
-                    else None
-                )
-                execution_date = record.get("date")
-
-                campaign_performance_record = {
-                    "campaign_id": campaign_id,
-                    "execution_date": execution_date,
-                    "spend": record.get("cost"),
-                    "impressions": record.get("impressions"),
-                    "clicks": record.get("clicks"),
-                    "registrations": record.get("registrations"),
-                    "ctr": record.get("ctr"),
-                    "cr": record.get("cr"),
-                    "cpc": record.get("cpc"),
-                }
-
-                campaign_tuple = tuple(v for v in campaign_performance_record.values())
-                campaign_performance_data.append(campaign_tuple)
-
-                # list of jsons
-                metrics = record.get("metrics", [{}])[0]
-
-                campaign_metrics_record = {
-                    "campaign_id": campaign_id,
-                    "execution_date": execution_date,
-                    "lifeday": metrics.get("lifeday"),
-                    "players": metrics.get("players"),
-                    "payers": metrics.get("payers"),
-                    "payments": metrics.get("payments"),
-                    "revenue": metrics.get("revenue"),
-                }
-                campaign_metrics_tuple = tuple(
-                    v for v in campaign_metrics_record.values()
-                )
-                campaign_performance_metrics.append(campaign_metrics_tuple)
-            except Exception as e:
-                print(f"Error processing record: {record}. Error: {e}")
-                # TODO add the erronous records to a dead letter sink
-
-        return campaign_performance_data, campaign_performance_metrics
+        return self._decode("c", data, campaign_ids)
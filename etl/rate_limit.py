@@ -0,0 +1,145 @@
+from typing import Optional
+import random
+import threading
+import time
+from configs.api import RateLimitConfigs as Config
+from etl.telemetry import telemetry
+
+
+class RateLimiter:
+    """
+    Token bucket pacing the requests sent to the API. Its rate adapts AIMD-style: it grows
+    by about `increase` requests/s for every second of successful requests and is cut by
+    decrease_factor when the API throttles (429) or fails (5xx), at most once per cooldown
+    so that one overload burst counts once. A Retry-After pauses every caller until it has
+    passed, plus a random jitter so that they do not all resume at the same instant.
+    """
+
+    def __init__(
+        self,
+        rate: float = Config.initial_rate,
+        min_rate: float = Config.min_rate,
+        max_rate: float = Config.max_rate,
+        burst: float = Config.burst,
+        increase: float = Config.increase,
+        decrease_factor: float = Config.decrease_factor,
+        decrease_cooldown: float = Config.decrease_cooldown_seconds,
+        jitter: float = Config.jitter_seconds,
+    ) -> None:
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.jitter = jitter
+        self.tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # no tokens accrue while paused, so callers do not burst out of a Retry-After
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent and returns the seconds it waited."""
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            telemetry.observe("rate_limit_wait_seconds", waited)
+        return waited
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Backs off after a 429 or 5xx response, pausing for retry_after seconds if given."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._last_decrease = now
+                telemetry.inc("rate_limit_decreases_total")
+                telemetry.event("rate_limit_decrease", rate=round(self.rate, 3))
+            if retry_after is not None:
+                self.tokens = 0.0
+                self._paused_until = max(
+                    self._paused_until,
+                    now + retry_after + random.uniform(0, self.jitter),
+                )
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast once the API looks down, instead of letting every remaining window
+    of the run wait through its retries. It opens after failure_threshold consecutive
+    failed attempts and then lets a single probe through every reset_seconds; the first
+    successful request closes it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = Config.breaker_failures,
+        reset_seconds: float = Config.breaker_reset_seconds,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.failure_threshold
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now."""
+
+        with self._lock:
+            if not self.is_open:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_seconds:
+                # half-open: this caller probes, the others keep failing fast
+                self._opened_at = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures == self.failure_threshold:
+                self._opened_at = time.monotonic()
+                print(
+                    f"Circuit breaker opened after {self.failures} consecutive "
+                    f"failed requests"
+                )
+                telemetry.inc("circuit_breaker_opens_total")
+                telemetry.event("circuit_breaker_open", failures=self.failures)
@@ -0,0 +1,160 @@
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
+from configs.api import SchedulerConfigs as Config
+from etl.telemetry import telemetry
+
+
+class ConcurrencyLimits:
+    """Separate bounds on how many units may use the API and Postgres at once."""
+
+    def __init__(
+        self,
+        api_concurrency: Optional[int] = None,
+        db_concurrency: Optional[int] = None,
+    ) -> None:
+        self.api_concurrency = api_concurrency or Config.api_concurrency
+        self.db_concurrency = db_concurrency or Config.db_concurrency
+        self.api = threading.BoundedSemaphore(self.api_concurrency)
+        self.db = threading.BoundedSemaphore(self.db_concurrency)
+
+
+class WindowResult(NamedTuple):
+    start_date: str
+    end_date: str
+    lod: str
+    succeeded: bool
+    elapsed: float
+    error: Optional[str] = None
+
+
+# a unit of work receives (start_date, end_date, limits)
+WindowTask = Callable[[str, str, ConcurrencyLimits], None]
+
+# (start_date, end_date, lod, task)
+Unit = Tuple[str, str, str, WindowTask]
+
+
+class WindowScheduler:
+    """
+    Runs every (window, lod) unit of a backfill on a bounded worker pool. Results are
+    returned in (window, lod) order whatever order the units finished in.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        limits: Optional[ConcurrencyLimits] = None,
+    ) -> None:
+        self.workers = workers or Config.workers
+        self.limits = limits or ConcurrencyLimits()
+
+    def _run_unit(
+        self, start_date: str, end_date: str, lod: str, task: WindowTask
+    ) -> WindowResult:
+        started = time.perf_counter()
+        try:
+            task(start_date, end_date, self.limits)
+            result = WindowResult(
+                start_date, end_date, lod, True, time.perf_counter() - started
+            )
+        except Exception as e:
+            print(f"Error processing lod '{lod}' for {start_date} - {end_date}: {e}")
+            result = WindowResult(
+                start_date, end_date, lod, False, time.perf_counter() - started, str(e)
+            )
+        telemetry.observe(
+            "unit_seconds",
+            result.elapsed,
+            lod=lod,
+            status="ok" if result.succeeded else "failed",
+        )
+        telemetry.event("unit", **result._asdict())
+        return result
+
+    def run(
+        self, windows: List[Tuple[str, str]], tasks: Dict[str, WindowTask]
+    ) -> List[WindowResult]:
+        """Runs each task of tasks (keyed by lod) for every window."""
+
+        return self.run_units(
+            (start_date, end_date, lod, task)
+            for start_date, end_date in windows
+            for lod, task in tasks.items()
+        )
+
+    def run_adaptive(
+        self,
+        windows: Dict[str, Iterator[Tuple[str, str]]],
+        tasks: Dict[str, WindowTask],
+    ) -> List[WindowResult]:
+        """
+        Runs tasks[lod] for every window of windows[lod], taking turns between the lods.
+        The window iterators are advanced only when a worker is free, so they can size
+        each window from the responses of the units that ran before it.
+        """
+
+        def units() -> Iterator[Unit]:
+            active = dict(windows)
+            while active:
+                for lod, lod_windows in list(active.items()):
+                    window = next(lod_windows, None)
+                    if window is None:
+                        del active[lod]
+                    else:
+                        yield (*window, lod, tasks[lod])
+
+        return self.run_units(units())
+
+    def run_units(
+        self,
+        units: Iterable[Unit],
+        on_result: Optional[Callable[[WindowResult], None]] = None,
+    ) -> List[WindowResult]:
+        """
+        Runs units with at most workers of them in flight, pulling the next unit only once
+        a worker is free. on_result is called with the result of each unit as soon as it
+        finishes. Results are sorted by (start_date, lod).
+        """
+
+        def run_unit(*unit) -> WindowResult:
+            result = self._run_unit(*unit)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        if self.workers == 1:
+            results = [run_unit(*unit) for unit in units]
+        else:
+            results = []
+            with ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="etl-window"
+            ) as pool:
+                pending = set()
+                units = iter(units)
+                while True:
+                    # a free slot first: pulling a unit may claim a job or size a window
+                    # from the completions so far
+                    if len(pending) >= self.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        results.extend(future.result() for future in done)
+                    unit = next(units, None)
+                    if unit is None:
+                        break
+                    pending.add(pool.submit(run_unit, *unit))
+                results.extend(future.result() for future in pending)
+        return sorted(results, key=lambda result: (result.start_date, result.lod))
+
+    @staticmethod
+    def report(results: List[WindowResult]) -> None:
+        """Prints a per-unit summary of a run."""
+
+        failed = [result for result in results if not result.succeeded]
+        print(f"Completed {len(results) - len(failed)}/{len(results)} window units")
+        for result in results:
+            status = "ok" if result.succeeded else f"FAILED: {result.error}"
+            print(
+                f"  {result.start_date} - {result.end_date} lod={result.lod} "
+                f"{result.elapsed:.1f}s {status}"
+            )
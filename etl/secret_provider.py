@@ -0,0 +1,179 @@
+from typing import Optional
+import json
+import os
+import threading
+import time
+from configs.api import SecretConfigs as Config
+
+
+class SecretProvider:
+    """Base class for sources of the API key."""
+
+    def get_api_key(self) -> str:
+        raise NotImplementedError
+
+    def invalidate(self) -> None:
+        """Drops any cached value so that the next lookup hits the source again."""
+
+
+class AWSSecretsManagerProvider(SecretProvider):
+    def __init__(
+        self,
+        secret_name: str,
+        aws_access_key_id: str,
+        aws_secret_access_key: str,
+        region_name: str,
+    ) -> None:
+        self.secret_name = secret_name
+        self.aws_access_key_id = aws_access_key_id
+        self.aws_secret_access_key = aws_secret_access_key
+        self.region_name = region_name
+
+    def get_api_key(self) -> str:
+        # boto3 is slow to import and only needed on a cache miss
+        import boto3
+
+        session = boto3.Session(
+            aws_access_key_id=self.aws_access_key_id,
+            aws_secret_access_key=self.aws_secret_access_key,
+            region_name=self.region_name,
+        )
+        client = session.client("secretsmanager")
+
+        try:
+            response = client.get_secret_value(SecretId=self.secret_name)
+            secret_string = json.loads(response["SecretString"])
+            return secret_string["x-api-key"]
+        except Exception as e:
+            print(
+                f"Failed to retrieve the API key from AWS Secrets Manager. Error: {e}"
+            )
+            raise
+
+
+class LocalSecretProvider(SecretProvider):
+    """Local stand-in that serves a fixed key, or the `x_api_key` env variable."""
+
+    def __init__(self, api_key: Optional[str] = None) -> None:
+        self.api_key = api_key
+        self.lookups = 0
+
+    def get_api_key(self) -> str:
+        self.lookups += 1
+        api_key = self.api_key or os.getenv("x_api_key")
+        if not api_key:
+            raise ValueError("No API key configured for the local secret provider.")
+        return api_key
+
+
+class CachedSecretProvider(SecretProvider):
+    """
+    Wraps another provider with an in-memory TTL cache and, optionally, an encrypted
+    on-disk cache that lets short-lived processes reuse a key fetched by an earlier one.
+    The key is only refreshed lazily, on the first lookup after it expires or after
+    invalidate() is called.
+    """
+
+    def __init__(
+        self,
+        provider: SecretProvider,
+        ttl_seconds: int = Config.ttl_seconds,
+        cache_path: Optional[str] = None,
+        encryption_key: Optional[str] = None,
+    ) -> None:
+        if cache_path and not encryption_key:
+            raise ValueError("encryption_key must be provided for the on-disk cache.")
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.cache_path = cache_path
+        self.encryption_key = encryption_key
+        self._api_key = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fernet(self):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError as e:
+            raise ImportError(
+                "The on-disk secret cache requires the 'cryptography' package."
+            ) from e
+        return Fernet(self.encryption_key.encode())
+
+    def _read_disk(self) -> Optional[str]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "rb") as f:
+                token = f.read()
+            entry = json.loads(self._fernet().decrypt(token))
+        except Exception as e:
+            # a corrupt or foreign cache file is treated as a miss
+            print(f"{self.__class__.__name__}: ignoring unreadable secret cache: {e}")
+            return None
+        if entry["expires_at"] <= time.time():
+            return None
+        self._expires_at = entry["expires_at"]
+        return entry["api_key"]
+
+    def _write_disk(self, api_key: str) -> None:
+        if not self.cache_path:
+            return
+        token = self._fernet().encrypt(
+            json.dumps({"api_key": api_key, "expires_at": self._expires_at}).encode()
+        )
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+        os.replace(tmp_path, self.cache_path)
+
+    def get_api_key(self) -> str:
+        with self._lock:
+            if self._api_key is not None and self._expires_at > time.time():
+                return self._api_key
+
+            api_key = self._read_disk()
+            if api_key is None:
+                api_key = self.provider.get_api_key()
+                self._expires_at = time.time() + self.ttl_seconds
+                self._write_disk(api_key)
+
+            self._api_key = api_key
+            return api_key
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._api_key = None
+            self._expires_at = 0.0
+            if self.cache_path and os.path.exists(self.cache_path):
+                os.remove(self.cache_path)
+        self.provider.invalidate()
+
+
+def get_env_variable(var_name: str) -> str:
+    value = os.getenv(var_name)
+    if not value:
+        raise ValueError(f"Environment variable '{var_name}' is not set or empty.")
+    return value
+
+
+def default_secret_provider() -> SecretProvider:
+    """
+    Builds the AWS Secrets Manager provider behind the TTL cache, configured from env
+    variables. A key set directly in the `x_api_key` env variable takes precedence.
+    """
+
+    if os.getenv("x_api_key"):
+        return LocalSecretProvider()
+    provider = AWSSecretsManagerProvider(
+        secret_name=get_env_variable("secret_name"),
+        aws_access_key_id=get_env_variable("aws_access_key_id"),
+        aws_secret_access_key=get_env_variable("aws_secret_access_key"),
+        region_name=get_env_variable("region_name"),
+    )
+    return CachedSecretProvider(
+        provider,
+        cache_path=os.getenv(Config.cache_path_env),
+        encryption_key=os.getenv(Config.cache_key_env),
+    )
@@ -0,0 +1,125 @@
+from typing import Any, ContextManager, Iterable, Iterator, List, Optional, Tuple
+from contextlib import nullcontext
+import queue
+import threading
+from etl.load_data import DataLoader, ReplaceScope
+from configs.api import StreamConfigs as Config
+
+
+def prefetch(
+    iterable: Iterable[Any],
+    maxsize: int = Config.queue_size,
+    slot: Optional[ContextManager] = None,
+) -> Iterator[Any]:
+    """
+    Consumes iterable on a background thread and yields its items. At most maxsize items are
+    buffered, so a slow consumer blocks the producer instead of letting memory grow. The
+    producer holds slot (e.g. an API semaphore) while it runs; its errors are re-raised here.
+    """
+
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(entry: Tuple[str, Any]) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            with slot or nullcontext():
+                for item in iterable:
+                    if not put(("item", item)):
+                        return
+            put(("done", None))
+        except BaseException as e:
+            put(("error", e))
+
+    producer = threading.Thread(target=produce, name="etl-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, item = items.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        # unblocks the producer if the consumer stops early
+        stopped.set()
+        producer.join()
+
+
+class BatchWriter:
+    """Buffers rows for one table and writes them through DataLoader in fixed-size batches."""
+
+    def __init__(
+        self,
+        loader: DataLoader,
+        table_name: str,
+        column_names: List[str],
+        write_method: str,
+        upsert_on: Optional[List[str]] = None,
+        batch_size: int = Config.batch_size,
+        detect_changes: bool = False,
+        replace_scope: Optional[ReplaceScope] = None,
+    ) -> None:
+        self.loader = loader
+        self.table_name = table_name
+        self.column_names = column_names
+        self.write_method = write_method
+        self.upsert_on = upsert_on
+        self.batch_size = batch_size
+        self.detect_changes = detect_changes
+        self.replace_scope = replace_scope
+        self.rows_written = 0
+        self._rows = []
+        self._replaced = False
+
+    def add(self, rows: List[Tuple[Any, ...]]) -> None:
+        self._rows.extend(rows)
+        while len(self._rows) >= self.batch_size:
+            batch, self._rows = (
+                self._rows[: self.batch_size],
+                self._rows[self.batch_size :],
+            )
+            self._write(batch)
+
+    def flush(self) -> None:
+        # a replace clears its scope even when there is nothing to write into it
+        if self._rows or (self.write_method == "replace" and not self._replaced):
+            batch, self._rows = self._rows, []
+            self._write(batch)
+
+    def _write(self, batch: List[Tuple[Any, ...]]) -> None:
+        write_method = self.write_method
+        if write_method == "replace":
+            # a partition swap commits on its own, so a streamed replace deletes its
+            # scope in the unit of work instead and merges every batch into it; readers
+            # see the previous rows until the unit commits, and later lifeday responses
+            # repeat the rows of earlier ones
+            if self.replace_scope is not None:
+                self.replace_scope.check(batch, self.column_names)
+            if not self._replaced:
+                self.loader.delete_scope(
+                    self.table_name, self.column_names, self.replace_scope
+                )
+                self._replaced = True
+            if not batch:
+                return
+            write_method = "copy_upsert"
+        self.loader.write_data(
+            table_name=self.table_name,
+            data_rows=batch,
+            column_names=self.column_names,
+            write_method=write_method,
+            upsert_on=self.upsert_on,
+            detect_changes=self.detect_changes,
+            replace_scope=self.replace_scope,
+        )
+        self.rows_written += len(batch)
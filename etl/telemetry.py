@@ -0,0 +1,234 @@
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+from bisect import bisect_left
+from contextlib import nullcontext
+import json
+import os
+import sys
+import threading
+import time
+from configs.api import TelemetryConfigs as Config
+
+# label set of a series, as sorted (name, value) pairs
+Labels = Tuple[Tuple[str, str], ...]
+
+_NULL_TIMER = nullcontext()
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [*labels, extra] if extra else list(labels)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _Histogram:
+    """Bucketed distribution of observed values plus their sum and count."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int) -> None:
+        # one slot per bucket and a trailing +Inf slot, not cumulative
+        self.counts = [0] * (n_buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class _Timer:
+    """Context manager observing its elapsed wall time into a histogram."""
+
+    __slots__ = ("telemetry", "name", "labels", "started")
+
+    def __init__(self, telemetry: "Telemetry", name: str, labels: Labels) -> None:
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.telemetry._observe(
+            self.name, self.labels, time.perf_counter() - self.started
+        )
+
+
+class Telemetry:
+    """
+    Process-wide registry of counters and latency histograms, with optional structured JSON
+    event logs. While disabled every call returns immediately, so instrumented code paths
+    pay no more than a method call and an attribute check.
+    """
+
+    def __init__(
+        self,
+        buckets: List[float] = Config.latency_buckets,
+        namespace: str = Config.namespace,
+    ) -> None:
+        self.enabled = False
+        self.buckets = sorted(buckets)
+        self.namespace = namespace
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._lock = threading.Lock()
+        self._log: Optional[TextIO] = None
+
+    def enable(self, log_path: Optional[str] = None) -> None:
+        """
+        Starts collecting. Events are written as JSON lines to log_path ("-" for stderr),
+        or dropped when it is not given.
+        """
+
+        if log_path == "-":
+            self._log = sys.stderr
+        elif log_path:
+            self._log = open(log_path, "a", encoding="utf-8")
+        self.enabled = True
+
+    def close(self) -> None:
+        """Stops collecting and closes the event log."""
+
+        self.enabled = False
+        if self._log is not None and self._log is not sys.stderr:
+            self._log.close()
+        self._log = None
+
+    def reset(self) -> None:
+        """Drops every counter and histogram, e.g. before the next run of the process."""
+
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Adds value to a counter."""
+
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Records one observation (in seconds) of a histogram."""
+
+        if not self.enabled:
+            return
+        self._observe(name, _labels(labels), value)
+
+    def _observe(self, name: str, labels: Labels, value: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            histogram.counts[bisect_left(self.buckets, value)] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def timer(self, name: str, **labels: Any) -> Any:
+        """Context manager timing its block into the histogram name."""
+
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, _labels(labels))
+
+    def event(self, event: str, **fields: Any) -> None:
+        """Writes one structured JSON log line."""
+
+        if not self.enabled or self._log is None:
+            return
+        line = json.dumps(
+            {"ts": round(time.time(), 6), "event": event, **fields}, default=str
+        )
+        with self._lock:
+            self._log.write(line + "\n")
+            self._log.flush()
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get((name, _labels(labels)), 0)
+
+    def histogram_sum(self, name: str, **labels: Any) -> float:
+        """Sum of the observations of every series of name that carries labels."""
+
+        wanted = set(_labels(labels))
+        with self._lock:
+            return sum(
+                histogram.sum
+                for (series, series_labels), histogram in self._histograms.items()
+                if series == name and wanted.issubset(series_labels)
+            )
+
+    def summary(self) -> Dict[str, Any]:
+        """Counters and histogram totals as a JSON-serializable dict."""
+
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        """Renders all series in the Prometheus text exposition format."""
+
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{self.namespace}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(
+                    [*map(str, self.buckets), "+Inf"], histogram.counts
+                ):
+                    cumulative += count
+                    lines.append(
+                        f"{metric}_bucket{_format_labels(labels, ('le', bound))} "
+                        f"{cumulative}"
+                    )
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(
+                    f"{metric}_count{_format_labels(labels)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Writes the Prometheus textfile atomically, so a collector such as the node
+        exporter never reads a partially written file.
+        """
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+# shared by every instrumented module of the run
+telemetry = Telemetry()
@@ -0,0 +1,100 @@
+from typing import Iterator, Optional, Tuple
+from datetime import date, timedelta
+import threading
+from configs.api import APIConfigs, WindowConfigs as Config
+from etl.telemetry import telemetry
+
+
+def window_days(period_from: str, period_to: str) -> int:
+    return (date.fromisoformat(period_to) - date.fromisoformat(period_from)).days
+
+
+def split_window(period_from: str, period_to: str) -> Tuple[str, str, str]:
+    """Returns (period_from, midpoint, period_to) of a window of at least two days."""
+
+    start = date.fromisoformat(period_from)
+    midpoint = start + timedelta(days=window_days(period_from, period_to) // 2)
+    return period_from, midpoint.isoformat(), period_to
+
+
+class WindowSizer:
+    """
+    Learns how many days an extraction window of one lod should span. Windows grow while
+    responses stay well within the latency and record targets, and are halved as soon as
+    a response exceeds them, times out or is too large to download.
+    """
+
+    def __init__(
+        self,
+        lod: str,
+        days: Optional[int] = None,
+        min_days: int = Config.min_days,
+        max_days: int = Config.max_days,
+        target_seconds: float = Config.target_seconds,
+        max_records: int = Config.max_records,
+    ) -> None:
+        self.lod = lod
+        self.min_days = min_days
+        self.max_days = max_days
+        self.target_seconds = target_seconds
+        self.max_records = max_records
+        self.days = self._clamp(days or APIConfigs.window)
+        self._lock = threading.Lock()
+
+    def _clamp(self, days: int) -> int:
+        return max(self.min_days, min(self.max_days, days))
+
+    def _resize(self, days: int, reason: str) -> None:
+        days = self._clamp(days)
+        if days != self.days:
+            telemetry.inc("window_resizes_total", lod=self.lod, reason=reason)
+            telemetry.event(
+                "window_resize",
+                lod=self.lod,
+                days=days,
+                previous=self.days,
+                reason=reason,
+            )
+            self.days = days
+
+    def observe(self, days: int, seconds: float, records: int) -> None:
+        """Adjusts the window size after a response for a window of days days."""
+
+        with self._lock:
+            if seconds > self.target_seconds:
+                self._resize(min(self.days, days // 2), "slow")
+            elif records > self.max_records:
+                self._resize(min(self.days, days // 2), "records")
+            elif (
+                days >= self.days
+                and seconds < self.target_seconds / 2
+                and records < self.max_records / 2
+            ):
+                # only windows of the current size show that a larger one is safe; the
+                # per-day cost projects how far it can grow without reaching the targets
+                limit = min(
+                    self.target_seconds * days / seconds if seconds else self.max_days,
+                    self.max_records * days / records if records else self.max_days,
+                )
+                self._resize(min(days * Config.growth_factor, int(limit)), "grow")
+
+    def shrink(self, days: int, reason: str) -> None:
+        """Halves the window size after a window of days days had to be split."""
+
+        with self._lock:
+            self._resize(min(self.days, days // 2), reason)
+
+
+def adaptive_windows(
+    start_date: str, end_date: str, sizer: WindowSizer
+) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily covers [start_date, end_date) with consecutive windows, each sized by what
+    sizer has learned from the responses of the windows before it.
+    """
+
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    while start < end:
+        stop = min(start + timedelta(days=sizer.days), end)
+        yield start.isoformat(), stop.isoformat()
+        start = stop
@@ -1,14 +1,50 @@
 import os
-from typing import List
-from datetime import timedelta
+import sys
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import date, timedelta
 import argparse
-import pandas as pd
+import random
+import time
 from dotenv import load_dotenv
 
-from etl.extract_data import Extractor
-from etl.load_data import DataLoader
+from etl.load_data import DataLoader, ReplaceScope
 from etl.process_data import DataProcessor
-from configs.api import SchemaConfigs
+from etl.scheduler import ConcurrencyLimits, WindowResult, WindowScheduler
+from etl.streaming import BatchWriter, prefetch
+from etl.landing_cache import LandingCache
+from etl.telemetry import telemetry
+from etl.windowing import WindowSizer, adaptive_windows
+from etl.export import EXPORTS, export_data
+from etl.job_queue import Job, JobQueue
+from etl.dead_letters import (
+    DeadLetter,
+    DeadLetterStore,
+    open_dead_letter_store,
+    window_letter,
+)
+from etl.incremental import (
+    final_dates,
+    first_pending_date,
+    load_state_rows,
+    loaded_lifedays,
+    observed_lifedays,
+    pending_lifedays,
+)
+from configs.api import (
+    APIConfigs,
+    SchemaConfigs,
+    DatabaseConfigs,
+    DeadLetterConfigs,
+    ExportConfigs,
+    JobConfigs,
+    StreamConfigs,
+    LandingCacheConfigs,
+    SchedulerConfigs,
+)
+
+if TYPE_CHECKING:
+    from etl.extract_data import Extractor
 
 
 def get_env_variable(var_name: str) -> str:
@@ -20,100 +56,904 @@ def get_env_variable(var_name: str) -> str:
 
 # Load environment variables
 load_dotenv()
-user = get_env_variable("user")
-password = get_env_variable("password")
-host = get_env_variable("host")
-port = get_env_variable("port")
-dbname = get_env_variable("dbname")
 
 
 def get_date_range(
-    source_date: str, window: int, shift: int = 0, freq: str = "7D"
+    source_date: str, window: int, shift: int = 0, chunk_days: int = 7
 ) -> List[str]:
-    # run in 7-day intervals to avoid performance issues
-    source_date = pd.to_datetime(source_date)
-    start_date = source_date - timedelta(days=window + shift)
-    end_date = source_date - timedelta(days=shift)
-    return list(pd.date_range(start_date, end_date, freq=freq).strftime("%Y-%m-%d"))
+    # run in fixed intervals (7 days by default) to bound the size of each window
+    end_date = date.fromisoformat(source_date) - timedelta(days=shift)
+    start_date = end_date - timedelta(days=window)
+    return [
+        (start_date + timedelta(days=offset)).isoformat()
+        for offset in range(0, window + 1, chunk_days)
+    ]
+
+
+def create_loader(max_connections: Optional[int] = None) -> DataLoader:
+    # the DB settings are read when a run needs them, so that --help and argument
+    # errors do not depend on the environment
+    return DataLoader(
+        user=get_env_variable("user"),
+        password=get_env_variable("password"),
+        host=get_env_variable("host"),
+        port=get_env_variable("port"),
+        dbname=get_env_variable("dbname"),
+        max_connections=max_connections,
+    )
+
+
+def format_window_sizes(sizers: Dict[str, WindowSizer]) -> str:
+    return ", ".join(f"{lod}={sizer.days}d" for lod, sizer in sorted(sizers.items()))
+
+
+def record_load_state(
+    loader: DataLoader,
+    lod: str,
+    start_date: str,
+    end_date: str,
+    observed: set,
+    requested: Iterable[int],
+) -> None:
+    """
+    Records which lifedays of a window were loaded, and whether they are final. requested
+    are the lifedays that were fetched, which are final even without rows once matured.
+    """
+
+    today = date.today()
+    lifedays = loaded_lifedays(observed, requested, start_date, end_date, today)
+    if lifedays:
+        loader.record_load_state(
+            load_state_rows(lod, start_date, end_date, lifedays, today)
+        )
+
+
+def fact_write_method(
+    scope: Optional[ReplaceScope], write_method: Optional[str] = None
+) -> str:
+    write_method = write_method or DatabaseConfigs.write_method
+    # a replace needs the period it overwrites, so records written on their own
+    # (e.g. replayed dead letters) are upserted instead
+    if write_method == "replace" and scope is None:
+        return "copy_upsert"
+    return write_method
 
 
 def process_and_load_campaign_ad_data(
-    start_date: str, end_date: str, loader: DataLoader
+    start_date: str,
+    end_date: str,
+    loader: DataLoader,
+    extractor: "Extractor",
+    processor: DataProcessor,
+    concurrent: bool = False,
+    limits: Optional[ConcurrencyLimits] = None,
+    lifedays: Optional[List[int]] = None,
+    derive_campaigns: bool = False,
+    write_method: Optional[str] = None,
 ) -> None:
     print(f"Processing campaign-ad data: {start_date} - {end_date}")
-    extractor = Extractor()
-    data = extractor.get_data(period_from=start_date, period_to=end_date, lod="a")
+    with limits.api if limits else nullcontext(), telemetry.timer(
+        "stage_seconds", stage="extract", lod="a"
+    ):
+        data = extractor.get_data(
+            period_from=start_date,
+            period_to=end_date,
+            lod="a",
+            concurrent=concurrent,
+            lifedays=lifedays,
+        )
 
-    processor = DataProcessor(loader=loader)
-    perf_data, metrics_data = processor.process_campaign_ad_data(data)
+    # the rows of the window (and of the lifedays requested) that a replace overwrites
+    scope = ReplaceScope(start_date, end_date, lifedays)
+    with limits.db if limits else nullcontext(), loader.unit_of_work():
+        perf_data, metrics_data = transform_data("a", data, processor)
+        write_campaign_ad_data(perf_data, metrics_data, loader, scope, write_method)
+        observed = observed_lifedays(data)
+        requested = extractor.lifedays if lifedays is None else lifedays
+        record_load_state(loader, "a", start_date, end_date, observed, requested)
+        if derive_campaigns:
+            # campaign-level facts rolled up from the same extraction
+            with telemetry.timer("stage_seconds", stage="derive", lod="c"):
+                derived = processor.derive_campaign_data(perf_data, metrics_data)
+            telemetry.inc("rows_transformed_total", sum(map(len, derived)), lod="c")
+            write_campaign_data(*derived, loader, scope, write_method)
+            record_load_state(loader, "c", start_date, end_date, observed, requested)
 
-    loader.write_data(
-        table_name="fact_campaign_ad_performance",
-        data_rows=perf_data,
-        column_names=SchemaConfigs.column_data["fact_campaign_ad_performance"],
-        write_method="upsert",
-        upsert_on=["campaign_id", "ad_id", "execution_date"],
-    )
 
-    loader.write_data(
-        table_name="fact_campaign_ad_metrics",
-        data_rows=metrics_data,
-        column_names=SchemaConfigs.column_data["fact_campaign_ad_metrics"],
-        write_method="upsert",
-        upsert_on=["campaign_id", "ad_id", "execution_date", "lifeday"],
-    )
+def transform_data(
+    lod: str, data: List[Dict[str, Any]], processor: DataProcessor
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
+    """Turns the records of lod into the rows of its performance and metrics tables."""
+
+    transform = {
+        "a": processor.process_campaign_ad_data,
+        "c": processor.process_campaign_data,
+    }[lod]
+    with telemetry.timer("stage_seconds", stage="transform", lod=lod):
+        perf_data, metrics_data = transform(data)
+    telemetry.inc("rows_transformed_total", len(perf_data) + len(metrics_data), lod=lod)
+    return perf_data, metrics_data
+
+
+def write_campaign_ad_data(
+    perf_data: List[Tuple[Any, ...]],
+    metrics_data: List[Tuple[Any, ...]],
+    loader: DataLoader,
+    scope: Optional[ReplaceScope] = None,
+    write_method: Optional[str] = None,
+) -> None:
+    with telemetry.timer("stage_seconds", stage="load", lod="a"):
+        loader.write_data(
+            table_name="fact_campaign_ad_performance",
+            data_rows=perf_data,
+            column_names=SchemaConfigs.column_data["fact_campaign_ad_performance"],
+            write_method=fact_write_method(scope, write_method),
+            detect_changes=DatabaseConfigs.detect_changes,
+            upsert_on=SchemaConfigs.upsert_keys["fact_campaign_ad_performance"],
+            replace_scope=scope,
+        )
+
+        loader.write_data(
+            table_name="fact_campaign_ad_metrics",
+            data_rows=metrics_data,
+            column_names=SchemaConfigs.column_data["fact_campaign_ad_metrics"],
+            write_method=fact_write_method(scope, write_method),
+            detect_changes=DatabaseConfigs.detect_changes,
+            upsert_on=SchemaConfigs.upsert_keys["fact_campaign_ad_metrics"],
+            replace_scope=scope,
+        )
 
 
 def process_and_load_campaign_data(
-    start_date: str, end_date: str, loader: DataLoader
+    start_date: str,
+    end_date: str,
+    loader: DataLoader,
+    extractor: "Extractor",
+    processor: DataProcessor,
+    concurrent: bool = False,
+    limits: Optional[ConcurrencyLimits] = None,
+    lifedays: Optional[List[int]] = None,
+    write_method: Optional[str] = None,
 ) -> None:
     print(f"Processing campaign data: {start_date} - {end_date}")
-    extractor = Extractor()
-    data = extractor.get_data(period_from=start_date, period_to=end_date, lod="c")
+    with limits.api if limits else nullcontext(), telemetry.timer(
+        "stage_seconds", stage="extract", lod="c"
+    ):
+        data = extractor.get_data(
+            period_from=start_date,
+            period_to=end_date,
+            lod="c",
+            concurrent=concurrent,
+            lifedays=lifedays,
+        )
 
-    processor = DataProcessor(loader=loader)
-    perf_data, metrics_data = processor.process_campaign_data(data)
+    scope = ReplaceScope(start_date, end_date, lifedays)
+    with limits.db if limits else nullcontext(), loader.unit_of_work():
+        write_campaign_data(
+            *transform_data("c", data, processor), loader, scope, write_method
+        )
+        record_load_state(
+            loader,
+            "c",
+            start_date,
+            end_date,
+            observed_lifedays(data),
+            extractor.lifedays if lifedays is None else lifedays,
+        )
 
-    loader.write_data(
-        table_name="fact_campaign_performance",
-        data_rows=perf_data,
-        column_names=SchemaConfigs.column_data["fact_campaign_performance"],
-        write_method="upsert",
-        upsert_on=["campaign_id", "execution_date"],
+
+def write_campaign_data(
+    perf_data: List[Tuple[Any, ...]],
+    metrics_data: List[Tuple[Any, ...]],
+    loader: DataLoader,
+    scope: Optional[ReplaceScope] = None,
+    write_method: Optional[str] = None,
+) -> None:
+    with telemetry.timer("stage_seconds", stage="load", lod="c"):
+        loader.write_data(
+            table_name="fact_campaign_performance",
+            data_rows=perf_data,
+            column_names=SchemaConfigs.column_data["fact_campaign_performance"],
+            write_method=fact_write_method(scope, write_method),
+            detect_changes=DatabaseConfigs.detect_changes,
+            upsert_on=SchemaConfigs.upsert_keys["fact_campaign_performance"],
+            replace_scope=scope,
+        )
+
+        loader.write_data(
+            table_name="fact_campaign_metrics",
+            data_rows=metrics_data,
+            column_names=SchemaConfigs.column_data["fact_campaign_metrics"],
+            write_method=fact_write_method(scope, write_method),
+            detect_changes=DatabaseConfigs.detect_changes,
+            upsert_on=SchemaConfigs.upsert_keys["fact_campaign_metrics"],
+            replace_scope=scope,
+        )
+
+
+def stream_and_load_data(
+    start_date: str,
+    end_date: str,
+    lod: str,
+    loader: DataLoader,
+    extractor: "Extractor",
+    processor: DataProcessor,
+    batch_size: Optional[int] = None,
+    limits: Optional[ConcurrencyLimits] = None,
+    lifedays: Optional[List[int]] = None,
+    derive_campaigns: bool = False,
+    write_method: Optional[str] = None,
+) -> None:
+    """
+    Streaming counterpart of process_and_load_*: lifeday responses are fetched on a
+    background thread while earlier ones are transformed and flushed in batches, so
+    only a bounded number of responses and batches are held in memory at once.
+    """
+
+    print(f"Streaming lod '{lod}' data: {start_date} - {end_date}")
+    tables = SchemaConfigs.lod_tables[lod]
+    if lod == "a" and derive_campaigns:
+        tables = tables + SchemaConfigs.lod_tables["c"]
+
+        def transform(response):
+            rows = processor.process_campaign_ad_data(response)
+            return (*rows, *processor.derive_campaign_data(*rows))
+
+    elif lod == "a":
+        transform = processor.process_campaign_ad_data
+    else:
+        transform = processor.process_campaign_data
+
+    writers = [
+        BatchWriter(
+            loader,
+            table_name,
+            SchemaConfigs.column_data[table_name],
+            write_method=write_method or DatabaseConfigs.write_method,
+            detect_changes=DatabaseConfigs.detect_changes,
+            upsert_on=SchemaConfigs.upsert_keys[table_name],
+            batch_size=batch_size or StreamConfigs.batch_size,
+            replace_scope=ReplaceScope(start_date, end_date, lifedays),
+        )
+        for table_name in tables
+    ]
+    responses = prefetch(
+        extractor.iter_data(
+            period_from=start_date, period_to=end_date, lod=lod, lifedays=lifedays
+        ),
+        slot=limits.api if limits else None,
     )
 
-    loader.write_data(
-        table_name="fact_campaign_metrics",
-        data_rows=metrics_data,
-        column_names=SchemaConfigs.column_data["fact_campaign_metrics"],
-        write_method="upsert",
-        upsert_on=["campaign_id", "execution_date", "lifeday"],
+    with limits.db if limits else nullcontext(), loader.unit_of_work():
+        observed = set()
+        for response in responses:
+            with telemetry.timer("stage_seconds", stage="transform", lod=lod):
+                batches = transform(response)
+            telemetry.inc("rows_transformed_total", sum(map(len, batches)), lod=lod)
+            with telemetry.timer("stage_seconds", stage="load", lod=lod):
+                for writer, rows in zip(writers, batches):
+                    writer.add(rows)
+            observed.update(observed_lifedays(response))
+        with telemetry.timer("stage_seconds", stage="load", lod=lod):
+            for writer in writers:
+                writer.flush()
+        requested = extractor.lifedays if lifedays is None else lifedays
+        record_load_state(loader, lod, start_date, end_date, observed, requested)
+        if lod == "a" and derive_campaigns:
+            record_load_state(loader, "c", start_date, end_date, observed, requested)
+
+
+def reconcile_campaign_data(
+    start_date: str, end_date: str, extractor: "Extractor", processor: DataProcessor
+) -> int:
+    """
+    Compares the campaign-level data derived from a window's ad-level data with the
+    lod="c" data served by the API and prints the differences. Returns their number.
+    """
+
+    # shares the id caches, but not the dead letters: rejected records were recorded
+    # when the window was loaded
+    checker = DataProcessor(
+        loader=processor.loader,
+        campaign_cache=processor.campaign_cache,
+        ad_cache=processor.ad_cache,
+    )
+    derived = checker.derive_campaign_data(
+        *checker.process_campaign_ad_data(
+            extractor.get_data(period_from=start_date, period_to=end_date, lod="a")
+        )
+    )
+    actual = checker.process_campaign_data(
+        extractor.get_data(period_from=start_date, period_to=end_date, lod="c")
     )
+    mismatches = checker.reconcile_campaign_data(derived, actual)
+    print(
+        f"Reconciled {start_date} - {end_date}: {len(derived[1])} derived campaign "
+        f"metrics rows, {len(mismatches)} mismatches"
+    )
+    for mismatch in mismatches[:10]:
+        print(f"  {mismatch}")
+    return len(mismatches)
+
 
+def run_marketing_etl(
+    source_date: str,
+    window: int,
+    shift: int = 0,
+    concurrent: bool = False,
+    max_concurrency: Optional[int] = None,
+    workers: Optional[int] = None,
+    api_concurrency: Optional[int] = None,
+    db_concurrency: Optional[int] = None,
+    stream: bool = False,
+    batch_size: Optional[int] = None,
+    chunk_days: Optional[int] = None,
+    columnar: bool = False,
+    cache_mode: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    full_refresh: bool = False,
+    derive_campaigns: bool = False,
+    reconcile_sample: int = 0,
+    metrics_log: Optional[str] = None,
+    metrics_textfile: Optional[str] = None,
+    dead_letter_store: str = DeadLetterConfigs.store,
+    dead_letter_path: Optional[str] = None,
+    write_method: Optional[str] = None,
+    units: Optional[Iterable[Tuple[str, str, str]]] = None,
+    on_result: Optional[Callable[[WindowResult], None]] = None,
+) -> List[WindowResult]:
+    """
+    Runs the ETL over the window of source_date, or over the given (start_date, end_date,
+    lod) units instead, e.g. the failed windows replayed from the dead letters or the jobs
+    claimed from the queue. units may be a lazy iterator, advanced only when a worker is
+    free; on_result is then called with the result of each unit as soon as it finishes.
+    """
 
-def run_marketing_etl(source_date: str, window: int, shift: int = 0) -> None:
-    loader = DataLoader(
-        user=user, password=password, host=host, port=port, dbname=dbname
+    # requests is imported by the runs that call the API, not by --help or record replays
+    from etl.extract_data import ExtractionError, Extractor
+
+    if metrics_log or metrics_textfile:
+        # the summary and textfile cover this run only, also when a worker process
+        # runs one claimed batch of jobs after the other
+        telemetry.reset()
+        telemetry.enable(log_path=metrics_log)
+    run_started = time.perf_counter()
+    limits = ConcurrencyLimits(api_concurrency, db_concurrency)
+    scheduler = WindowScheduler(workers=workers, limits=limits)
+    # every worker may hold an isolated connection (partitions, dead letters, dimension
+    # lookups), those in a DB slot also their unit-of-work one, and the main thread one
+    # more for the load state; the pool raises instead of blocking when it runs dry
+    loader = create_loader(
+        max(
+            DatabaseConfigs.max_connections,
+            scheduler.workers + limits.db_concurrency + 1,
+        )
+    )
+    dead_letters = open_dead_letter_store(dead_letter_store, loader, dead_letter_path)
+    # a single extractor per run shares the pooled HTTP session and the API key
+    # across all windows
+    cache = LandingCache(root=cache_dir) if cache_mode else None
+    extractor = Extractor(
+        max_concurrency=max_concurrency, cache=cache, cache_mode=cache_mode or "read"
+    )
+    # the processor holds the campaign/ad id caches for the whole run
+    processor = DataProcessor(
+        loader=loader, dead_letters=dead_letters, columnar=columnar
     )
-    dates = get_date_range(source_date, window, shift)
+    if units is None and cache_mode and not chunk_days:
+        # landed responses are keyed by their window, and adaptive windows move with the
+        # sizes learned in between; fixed windows let a rerun over the same dates find them
+        chunk_days = APIConfigs.window
+    if units is None and chunk_days:
+        dates = get_date_range(source_date, window, shift, chunk_days)
+        windows = [(dates[i - 1], dates[i]) for i in range(1, len(dates))]
+    elif units is None:
+        # windows are sized per lod while the run progresses
+        run_to = date.fromisoformat(source_date) - timedelta(days=shift)
+        run_from = (run_to - timedelta(days=window)).isoformat()
+        run_to = run_to.isoformat()
+    # campaign-level windows that were written, whose months need a rollup refresh
+    loaded_campaign_windows = []
 
-    for i in range(1, len(dates)):
-        start_date, end_date = dates[i - 1], dates[i]
-        print(f"Running ETL for period: {start_date} to {end_date}")
-        try:
-            process_and_load_campaign_ad_data(start_date, end_date, loader)
-            process_and_load_campaign_data(start_date, end_date, loader)
-        except Exception as e:
-            print(f"Error processing period {start_date} - {end_date}: {e}")
+    def make_task(lod: str):
+        def task(start_date, end_date, limits):
+            # in derive mode the ad-level task also writes the campaign-level facts
+            lods = ["a", "c"] if derive_campaigns and lod == "a" else [lod]
+            lifedays = None
+            if not full_refresh:
+                pending = set()
+                for written_lod in lods:
+                    pending.update(
+                        pending_lifedays(
+                            written_lod,
+                            start_date,
+                            end_date,
+                            extractor.lifedays,
+                            covered,
+                        )
+                    )
+                lifedays = [day for day in extractor.lifedays if day in pending]
+                if not lifedays:
+                    print(f"Skipping lod '{lod}' {start_date} - {end_date}: final")
+                    return
+            if not full_refresh and cache is None:
+                # the dates before the first uncovered one are final for every pending
+                # lifeday, so only the rest of the window is fetched again; landed
+                # responses are keyed by the whole window, so cached runs keep it
+                start_date = min(
+                    first_pending_date(
+                        written_lod, start_date, end_date, lifedays, covered
+                    )
+                    for written_lod in lods
+                )
+            # partitions are created up front, outside of the window's unit of work
+            for written_lod in lods:
+                loader.ensure_partitions(
+                    SchemaConfigs.lod_tables[written_lod], start_date, end_date
+                )
+            if stream:
+                stream_and_load_data(
+                    start_date,
+                    end_date,
+                    lod,
+                    loader,
+                    extractor,
+                    processor,
+                    batch_size,
+                    limits,
+                    lifedays,
+                    derive_campaigns,
+                    write_method,
+                )
+            else:
+                if lod == "a":
+                    process_and_load_campaign_ad_data(
+                        start_date,
+                        end_date,
+                        loader,
+                        extractor,
+                        processor,
+                        concurrent,
+                        limits,
+                        lifedays,
+                        derive_campaigns,
+                        write_method,
+                    )
+                else:
+                    process_and_load_campaign_data(
+                        start_date,
+                        end_date,
+                        loader,
+                        extractor,
+                        processor,
+                        concurrent,
+                        limits,
+                        lifedays,
+                        write_method=write_method,
+                    )
+            if lod == "c" or derive_campaigns:
+                loaded_campaign_windows.append((start_date, end_date))
+
+        return task
+
+    try:
+        processor.warm_dimension_cache()
+        # incremental runs only fetch the lifedays of windows that are not final yet
+        covered = {} if full_refresh else final_dates(loader.get_final_windows())
+        # the writes of each (window, lod) unit share one connection and are
+        # committed (or rolled back) together
+        tasks = {"a": make_task("a")}
+        if not derive_campaigns:
+            tasks["c"] = make_task("c")
+        if units is not None:
+            # windows that failed before may have failed on their size, so they can
+            # still be split
+            sizes = loader.get_window_sizes()
+            extractor.window_sizers = {
+                lod: WindowSizer(lod, sizes.get(lod)) for lod in ("a", "c")
+            }
+            tasks = {lod: make_task(lod) for lod in ("a", "c")}
+            print(
+                f"Running ETL for {len(units) if isinstance(units, list) else 'claimed'} "
+                f"units with {scheduler.workers} workers "
+                f"(api={limits.api_concurrency}, db={limits.db_concurrency})"
+            )
+            results = scheduler.run_units(
+                (
+                    (start_date, end_date, lod, tasks[lod])
+                    for start_date, end_date, lod in units
+                ),
+                on_result,
+            )
+        elif chunk_days:
+            print(
+                f"Running ETL for {len(windows)} windows with {scheduler.workers} "
+                f"workers (api={limits.api_concurrency}, db={limits.db_concurrency})"
+            )
+            results = scheduler.run(windows, tasks)
+        else:
+            # each lod starts from the window size learned by the previous run
+            sizes = loader.get_window_sizes()
+            sizers = {lod: WindowSizer(lod, sizes.get(lod)) for lod in tasks}
+            extractor.window_sizers = sizers
+            print(
+                f"Running ETL for {run_from} - {run_to} in adaptive windows starting "
+                f"at {format_window_sizes(sizers)} with {scheduler.workers} workers "
+                f"(api={limits.api_concurrency}, db={limits.db_concurrency})"
+            )
+            results = scheduler.run_adaptive(
+                {
+                    lod: adaptive_windows(run_from, run_to, sizer)
+                    for lod, sizer in sizers.items()
+                },
+                tasks,
+            )
+            loader.record_window_sizes(
+                {lod: sizer.days for lod, sizer in sizers.items()}
+            )
+            print(f"Learned window sizes: {format_window_sizes(sizers)}")
         print("-" * 120)
+        scheduler.report(results)
+        if dead_letters is not None:
+            record_failed_windows(dead_letters, results, derive_campaigns)
+        print(
+            f"API rate limit settled at {extractor.rate_limiter.rate:.1f} requests/s"
+            + (" (circuit breaker open)" if extractor.breaker.is_open else "")
+        )
+        if derive_campaigns and reconcile_sample:
+            # spot-checks the derived campaign facts against the campaign-level endpoint
+            windows = [(result.start_date, result.end_date) for result in results]
+            for start_date, end_date in random.sample(
+                windows, min(reconcile_sample, len(windows))
+            ):
+                try:
+                    reconcile_campaign_data(start_date, end_date, extractor, processor)
+                except ExtractionError as e:
+                    print(f"Could not reconcile {start_date} - {end_date}: {e}")
+        if loaded_campaign_windows:
+            # period_to is excluded from a window, so the last loaded day is the one before it
+            refresh_from = min(start for start, _ in loaded_campaign_windows)
+            refresh_to = max(end for _, end in loaded_campaign_windows)
+            refresh_to = (
+                date.fromisoformat(refresh_to) - timedelta(days=1)
+            ).isoformat()
+            loader.refresh_monthly_rollup(refresh_from, refresh_to)
+            print(f"Refreshed monthly rollup for {refresh_from} - {refresh_to}")
+        for table_name, stats in sorted(loader.write_stats.items()):
+            print(
+                f"{table_name}: {stats['inserted']} inserted, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged"
+            )
+        if cache is not None:
+            print(
+                f"Landing cache: {cache.hits} hits, {cache.misses} misses, "
+                f"{cache.evict()} entries evicted"
+            )
+        return results
+    finally:
+        extractor.close()
+        loader.close()
+        if telemetry.enabled:
+            export_telemetry(time.perf_counter() - run_started, metrics_textfile)
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Run campaign ETL job")
+def record_failed_windows(
+    dead_letters: DeadLetterStore, results: List[WindowResult], derive_campaigns: bool
+) -> None:
+    """
+    Records the failed units of a run as dead letters, and resolves the letters of the
+    units that succeeded, whether they were replayed or just rerun.
+    """
+
+    dead_letters.add(
+        [
+            window_letter(
+                result.lod,
+                result.start_date,
+                result.end_date,
+                result.error,
+                {"derive_campaigns": derive_campaigns and result.lod == "a"},
+            )
+            for result in results
+            if not result.succeeded
+        ]
+    )
+    pending = {letter.key for letter in dead_letters.pending("window")}
+    dead_letters.resolve(
+        key
+        for key in (
+            window_letter(result.lod, result.start_date, result.end_date, "").key
+            for result in results
+            if result.succeeded
+        )
+        if key in pending
+    )
+    pending = dead_letters.pending()
+    if pending:
+        windows = sum(letter.kind == "window" for letter in pending)
+        print(
+            f"Dead letters: {windows} windows and {len(pending) - windows} records "
+            f"pending; reprocess them with `python extract_process_load.py replay`"
+        )
+
+
+def replay_records(
+    letters: List[DeadLetter],
+    dead_letters: DeadLetterStore,
+    loader: DataLoader,
+    write_method: Optional[str] = None,
+) -> int:
+    """
+    Transforms and loads the payloads of failed record letters again, without calling the
+    API. Records that still fail stay pending with one more attempt; the others are
+    resolved. Returns the number of records replayed.
+    """
+
+    processor = DataProcessor(loader=loader, dead_letters=dead_letters)
+    writers = {"a": write_campaign_ad_data, "c": write_campaign_data}
+    replayed = []
+    for lod, write in writers.items():
+        fixed, perf_data, metrics_data = [], [], []
+        for letter in letters:
+            if letter.lod != lod:
+                continue
+            # each record is tried on its own, so that one that is rejected again (and
+            # recorded again with one more attempt) does not hold back the others
+            perf_rows, metrics_rows = transform_data(lod, [letter.payload], processor)
+            if perf_rows:
+                fixed.append(letter)
+                perf_data.extend(perf_rows)
+                metrics_data.extend(metrics_rows)
+        if not fixed:
+            continue
+        dates = sorted(letter.period_from for letter in fixed if letter.period_from)
+        if dates:
+            last = (date.fromisoformat(dates[-1]) + timedelta(days=1)).isoformat()
+            loader.ensure_partitions(SchemaConfigs.lod_tables[lod], dates[0], last)
+        with loader.unit_of_work():
+            write(perf_data, metrics_data, loader, write_method=write_method)
+        if lod == "c" and dates:
+            loader.refresh_monthly_rollup(dates[0], dates[-1])
+        dead_letters.resolve(letter.key for letter in fixed)
+        replayed.extend(fixed)
+    print(f"Replayed {len(replayed)}/{len(letters)} dead-letter records")
+    return len(replayed)
+
+
+def replay_dead_letters(
+    kind: Optional[str] = None,
+    limit: Optional[int] = None,
+    dead_letter_store: str = DeadLetterConfigs.store,
+    dead_letter_path: Optional[str] = None,
+    **options: Any,
+) -> List[WindowResult]:
+    """
+    Reprocesses only the pending dead letters: failed records are transformed and loaded
+    again from their stored payloads, failed windows are extracted and loaded again as
+    units of their own. options are passed on to run_marketing_etl.
+    """
+
+    loader = create_loader()
+    try:
+        dead_letters = open_dead_letter_store(
+            dead_letter_store, loader, dead_letter_path
+        )
+        if dead_letters is None:
+            raise ValueError("Replay needs a dead letter store")
+        letters = dead_letters.pending(kind)[:limit]
+        records = [letter for letter in letters if letter.kind == "record"]
+        windows = [letter for letter in letters if letter.kind == "window"]
+        print(f"Replaying {len(windows)} windows and {len(records)} records")
+        if records:
+            replay_records(records, dead_letters, loader, options.get("write_method"))
+    finally:
+        loader.close()
+    if not windows:
+        return []
+    return run_marketing_etl(
+        source_date=None,
+        window=0,
+        units=[
+            (letter.period_from, letter.period_to, letter.lod) for letter in windows
+        ],
+        derive_campaigns=any(
+            (letter.payload or {}).get("derive_campaigns") for letter in windows
+        ),
+        dead_letter_store=dead_letter_store,
+        dead_letter_path=dead_letter_path,
+        **options,
+    )
+
+
+def seed_jobs(
+    source_date: str,
+    window: int,
+    shift: int = 0,
+    chunk_days: Optional[int] = None,
+    derive_campaigns: bool = False,
+) -> None:
+    """
+    Queues the (lod, window) jobs of a backfill over the window of source_date in etl_jobs,
+    for `worker` processes to run. Each lod is split into windows of chunk_days, or of the
+    window size learned for it by previous runs.
+    """
+
+    end_date = (date.fromisoformat(source_date) - timedelta(days=shift)).isoformat()
+    loader = create_loader()
+    try:
+        sizes = {} if chunk_days else loader.get_window_sizes()
+        windows = {}
+        for lod in ["a"] if derive_campaigns else ["a", "c"]:
+            dates = get_date_range(
+                source_date,
+                window,
+                shift,
+                chunk_days or sizes.get(lod, JobConfigs.chunk_days),
+            )
+            # the days after the last whole chunk are a shorter job of their own
+            if dates[-1] != end_date:
+                dates.append(end_date)
+            windows[lod] = list(zip(dates, dates[1:]))
+        queue = JobQueue(loader)
+        new, requeued = queue.seed(windows, derive_campaigns)
+        counts = queue.counts()
+    finally:
+        loader.close()
+    print(
+        f"Seeded {new} jobs and requeued {requeued} failed ones; queue: "
+        + ", ".join(f"{status}={n}" for status, n in sorted(counts.items()))
+    )
+
+
+def run_worker(
+    worker_id: Optional[str] = None,
+    max_jobs: Optional[int] = None,
+    poll_seconds: float = JobConfigs.poll_seconds,
+    lease_seconds: int = JobConfigs.lease_seconds,
+    **options: Any,
+) -> Dict[str, int]:
+    """
+    Runs jobs claimed from etl_jobs until none is pending or running, or until max_jobs
+    ran. Any number of workers, on any number of hosts, can share the queue: each claims a
+    job only when one of its units is free, so the backfill is spread across them as they
+    go. A job that fails is queued again for any worker to retry, and the job of a worker
+    that died is claimed again once its lease expired, so an idle worker waits for the jobs
+    still running elsewhere before it exits. options are passed on to run_marketing_etl.
+    Returns the number of this worker's jobs that ended in each status.
+    """
+
+    # jobs are claimed by this thread, finished by each of the run's workers and their
+    # leases extended by the heartbeat thread, each on a connection of its own
+    loader = create_loader((options.get("workers") or SchedulerConfigs.workers) + 2)
+    queue = JobQueue(loader, worker_id, lease_seconds)
+    statuses = {}
+    claimed = 0
+
+    def finish(job: Job, result: WindowResult) -> None:
+        try:
+            status = queue.finish(job, result)
+        except Exception:
+            # the lease then expires and the job is retried by whichever worker claims it
+            return
+        # a job queued again is retried by whichever worker claims it next
+        status = "retried" if status == "pending" else status
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def claims(job: Job, jobs: Dict[Tuple[str, str, str], Job]):
+        nonlocal claimed
+        while job is not None:
+            jobs[(job.period_from, job.period_to, job.lod)] = job
+            claimed += 1
+            yield job.period_from, job.period_to, job.lod
+            if max_jobs is not None and claimed >= max_jobs:
+                return
+            job = queue.claim(job.derive_campaigns)
+
+    print(f"Worker {queue.worker_id} started")
+    try:
+        with queue:
+            while max_jobs is None or claimed < max_jobs:
+                ran = False
+                # the ad-level jobs of a --derive_campaigns backfill also write the
+                # campaign-level facts, so they run in a pass of their own
+                for derive_campaigns in (False, True):
+                    if max_jobs is not None and claimed >= max_jobs:
+                        break
+                    job = queue.claim(derive_campaigns)
+                    if job is None:
+                        continue
+                    ran = True
+                    jobs = {}
+                    run_marketing_etl(
+                        source_date=None,
+                        window=0,
+                        units=claims(job, jobs),
+                        on_result=lambda result, jobs=jobs: finish(
+                            jobs.pop((result.start_date, result.end_date, result.lod)),
+                            result,
+                        ),
+                        derive_campaigns=derive_campaigns,
+                        **options,
+                    )
+                if ran:
+                    continue
+                counts = queue.counts()
+                if not counts.get("pending") and not counts.get("running"):
+                    break
+                print(
+                    f"Waiting for {counts.get('running', 0)} jobs running on other "
+                    f"workers"
+                )
+                time.sleep(poll_seconds)
+            counts = queue.counts()
+    finally:
+        loader.close()
+    print(
+        f"Worker {queue.worker_id} finished: "
+        + ", ".join(f"{status}={n}" for status, n in sorted(statuses.items()))
+        + "; queue: "
+        + ", ".join(f"{status}={n}" for status, n in sorted(counts.items()))
+    )
+    return statuses
+
+
+def export_report(
+    name: str,
+    output: str,
+    fmt: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    campaigns: Optional[List[str]] = None,
+    chunk_rows: int = ExportConfigs.chunk_rows,
+) -> None:
+    loader = create_loader()
+    try:
+        rows = export_data(
+            loader, name, output, fmt, date_from, date_to, campaigns, chunk_rows
+        )
+    finally:
+        loader.close()
+    # the CSV itself may be going to stdout
+    print(f"Exported {rows} rows of {name} to {output}", file=sys.stderr)
+
+
+def export_telemetry(run_seconds: float, textfile: Optional[str] = None) -> None:
+    """Logs the run summary, including rows/s per table, and writes the Prometheus textfile."""
+
+    telemetry.observe("run_seconds", run_seconds)
+    throughput = {}
+    for table_name in [
+        table_name
+        for tables in SchemaConfigs.lod_tables.values()
+        for table_name in tables
+    ]:
+        rows = telemetry.counter("db_rows_written_total", table=table_name)
+        seconds = telemetry.histogram_sum("db_write_seconds", table=table_name)
+        if rows:
+            throughput[table_name] = {
+                "rows": rows,
+                "write_seconds": round(seconds, 6),
+                "rows_per_second": round(rows / seconds) if seconds else None,
+            }
+    telemetry.event(
+        "run_summary",
+        run_seconds=round(run_seconds, 6),
+        throughput=throughput,
+        **telemetry.summary(),
+    )
+    if textfile:
+        telemetry.write_prometheus(textfile)
+        print(f"Wrote metrics to {textfile}")
+    telemetry.close()
+
+
+def add_run_arguments(parser: argparse.ArgumentParser) -> None:
+    """Arguments selecting the date range of a run."""
+
     parser.add_argument(
         "--source_date",
         type=str,
-        default=pd.Timestamp.today().strftime("%Y-%m-%d"),
+        default=date.today().isoformat(),
         help="Reference date for ETL (default: today)",
     )
     parser.add_argument(
@@ -125,11 +965,337 @@ def main():
         default=0,
         help="Shift ETL window back by N days (default: 0)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--chunk_days",
+        type=int,
+        default=None,
+        help="Days covered by each extraction window (default: sized adaptively per "
+        "lod, starting from the sizes learned by the previous run)",
+    )
+    parser.add_argument(
+        "--full_refresh",
+        "--full-refresh",
+        action="store_true",
+        help="Refetch every window, ignoring windows already recorded as final",
+    )
+    parser.add_argument(
+        "--derive_campaigns",
+        "--derive-campaigns",
+        action="store_true",
+        help="Derive the campaign-level facts from the ad-level data instead of "
+        "requesting them from the API",
+    )
+    parser.add_argument(
+        "--reconcile_sample",
+        type=int,
+        default=0,
+        help="Windows whose derived campaign data is compared with the campaign-level "
+        "endpoint after a --derive_campaigns run (default: 0, i.e. off)",
+    )
+
+
+def add_execution_arguments(parser: argparse.ArgumentParser) -> None:
+    """Arguments controlling how units are extracted, loaded and observed."""
+
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Request all lifedays of a window in parallel (default: sequential)",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=None,
+        help="Maximum number of in-flight API requests in concurrent mode",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of (window, lod) units processed in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--api_concurrency",
+        type=int,
+        default=None,
+        help="Maximum number of units extracting from the API at once",
+    )
+    parser.add_argument(
+        "--db_concurrency",
+        type=int,
+        default=None,
+        help="Maximum number of units writing to Postgres at once",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Transform and load each API response as it arrives, in batches",
+    )
+    parser.add_argument(
+        "--write_method",
+        "--write-method",
+        choices=["copy_upsert", "upsert", "replace"],
+        default=None,
+        help="How the fact tables are written: merged with copy_upsert or upsert, or "
+        "each window's rows replaced with replace "
+        f"(default: {DatabaseConfigs.write_method})",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=None,
+        help="Rows per table flushed to Postgres in streaming mode",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Decode whole responses column-wise with pandas and NumPy",
+    )
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--from_cache",
+        "--from-cache",
+        dest="cache_mode",
+        action="store_const",
+        const="read",
+        help="Serve responses from the local landing cache, fetching only misses",
+    )
+    cache_group.add_argument(
+        "--refresh",
+        dest="cache_mode",
+        action="store_const",
+        const="refresh",
+        help="Fetch every response from the API and re-land it in the cache",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=LandingCacheConfigs.root,
+        help=f"Directory of the landing cache (default: {LandingCacheConfigs.root})",
+    )
+    parser.add_argument(
+        "--metrics_log",
+        type=str,
+        default=None,
+        help="Write structured JSON events (HTTP calls, DB writes, units, run summary) "
+        "to this file, or to stderr with '-'",
+    )
+    parser.add_argument(
+        "--metrics_textfile",
+        type=str,
+        default=None,
+        help="Write the run's counters and latency histograms to this Prometheus textfile",
+    )
+    parser.add_argument(
+        "--dead_letters",
+        "--dead-letters",
+        choices=["postgres", "sqlite", "jsonl", "off"],
+        default=DeadLetterConfigs.store,
+        help="Where failed windows and records are recorded for replay "
+        f"(default: {DeadLetterConfigs.store})",
+    )
+    parser.add_argument(
+        "--dead_letter_path",
+        type=str,
+        default=None,
+        help="File of the sqlite or jsonl dead letter store",
+    )
+
+
+def execution_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "concurrent": args.concurrent,
+        "max_concurrency": args.max_concurrency,
+        "workers": args.workers,
+        "api_concurrency": args.api_concurrency,
+        "db_concurrency": args.db_concurrency,
+        "stream": args.stream,
+        "batch_size": args.batch_size,
+        "columnar": args.columnar,
+        "cache_mode": args.cache_mode,
+        "cache_dir": args.cache_dir,
+        "metrics_log": args.metrics_log,
+        "metrics_textfile": args.metrics_textfile,
+        "dead_letter_store": args.dead_letters,
+        "dead_letter_path": args.dead_letter_path,
+        "write_method": args.write_method,
+    }
 
-    run_marketing_etl(
-        source_date=args.source_date, window=args.window, shift=args.shift
+
+def main():
+    parser = argparse.ArgumentParser(description="Run campaign ETL job")
+    add_run_arguments(parser)
+    add_execution_arguments(parser)
+    commands = parser.add_subparsers(
+        dest="command",
+        metavar="command",
+        help="Run the ETL (default), replay, export, or seed and work a job queue",
+    )
+    replay = commands.add_parser(
+        "replay",
+        help="Reprocess only the failed windows and records recorded as dead letters",
+        description="Reprocess only the failed windows and records recorded as dead "
+        "letters. Options go after the command.",
+    )
+    add_execution_arguments(replay)
+    replay.add_argument(
+        "--kind",
+        choices=["window", "record"],
+        default=None,
+        help="Replay only failed windows or only failed records (default: both)",
     )
+    replay.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Replay at most this many dead letters",
+    )
+    seed = commands.add_parser(
+        "seed",
+        help="Queue the (lod, window) jobs of a backfill for `worker` processes",
+        description="Queue the (lod, window) jobs of a backfill in etl_jobs for "
+        "`worker` processes to run. Options go after the command.",
+    )
+    add_run_arguments(seed)
+    worker = commands.add_parser(
+        "worker",
+        help="Run jobs claimed from the queue until it is drained",
+        description="Run jobs claimed from the queue until it is drained. Start any "
+        "number of workers, on any number of hosts. Options go after the command.",
+    )
+    add_execution_arguments(worker)
+    worker.add_argument(
+        "--worker_id",
+        "--worker-id",
+        type=str,
+        default=None,
+        help="Name the worker holds its leases under (default: host:pid)",
+    )
+    worker.add_argument(
+        "--max_jobs",
+        type=int,
+        default=None,
+        help="Exit after claiming this many jobs (default: run until the queue is drained)",
+    )
+    worker.add_argument(
+        "--poll_seconds",
+        type=float,
+        default=JobConfigs.poll_seconds,
+        help="Seconds an idle worker waits before looking for jobs again "
+        f"(default: {JobConfigs.poll_seconds})",
+    )
+    worker.add_argument(
+        "--lease_seconds",
+        type=int,
+        default=JobConfigs.lease_seconds,
+        help="Seconds without a heartbeat after which a claimed job is given to another "
+        f"worker (default: {JobConfigs.lease_seconds})",
+    )
+    worker.add_argument(
+        "--full_refresh",
+        "--full-refresh",
+        action="store_true",
+        help="Refetch every window, ignoring windows already recorded as final",
+    )
+    export = commands.add_parser(
+        "export",
+        help="Stream a report or the facts to a CSV or Parquet file",
+        description="Stream a report or the facts to a CSV or Parquet file, filtered "
+        "in the database. Options go after the command.",
+    )
+    export.add_argument("report", choices=sorted(EXPORTS), help="What to export")
+    export.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        required=True,
+        help="File to write, or - for CSV on stdout",
+    )
+    export.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default=None,
+        help="Output format (default: parquet for a .parquet output, csv otherwise)",
+    )
+    export.add_argument(
+        "--date_from",
+        "--date-from",
+        type=str,
+        default=None,
+        help="First date to export (YYYY-MM-DD)",
+    )
+    export.add_argument(
+        "--date_to",
+        "--date-to",
+        type=str,
+        default=None,
+        help="Date the export stops before (YYYY-MM-DD, exclusive)",
+    )
+    export.add_argument(
+        "--campaign",
+        dest="campaigns",
+        action="append",
+        default=None,
+        help="Export only this campaign (repeatable)",
+    )
+    export.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=ExportConfigs.chunk_rows,
+        help="Rows fetched and written per chunk of a Parquet export "
+        f"(default: {ExportConfigs.chunk_rows})",
+    )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_report(
+            args.report,
+            args.output,
+            args.format,
+            args.date_from,
+            args.date_to,
+            args.campaigns,
+            args.chunk_rows,
+        )
+        return
+    if args.command == "seed":
+        seed_jobs(
+            args.source_date,
+            args.window,
+            args.shift,
+            args.chunk_days,
+            args.derive_campaigns,
+        )
+        return
+    if args.command == "worker":
+        statuses = run_worker(
+            worker_id=args.worker_id,
+            max_jobs=args.max_jobs,
+            poll_seconds=args.poll_seconds,
+            lease_seconds=args.lease_seconds,
+            full_refresh=args.full_refresh,
+            **execution_options(args),
+        )
+        if statuses.get("failed"):
+            sys.exit(1)
+        return
+    if args.command == "replay":
+        results = replay_dead_letters(
+            kind=args.kind, limit=args.limit, **execution_options(args)
+        )
+    else:
+        results = run_marketing_etl(
+            source_date=args.source_date,
+            window=args.window,
+            shift=args.shift,
+            chunk_days=args.chunk_days,
+            full_refresh=args.full_refresh,
+            derive_campaigns=args.derive_campaigns,
+            reconcile_sample=args.reconcile_sample,
+            **execution_options(args),
+        )
+    if not all(result.succeeded for result in results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
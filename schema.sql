@@ -10,9 +10,32 @@ CREATE TABLE IF NOT EXISTS ads (
     ad_name TEXT NOT NULL UNIQUE
 );
 
+-- Fact tables are partitioned by month of execution_date. Monthly partitions
+-- ({table}_pYYYYMM) are created by create_monthly_partitions before data is loaded
+-- into them; the DEFAULT partition only holds rows without an execution_date.
+-- The unique keys include execution_date, so surrogate ids are no longer primary keys.
+
+-- Databases created before partitioning keep their plain fact tables under
+-- {table}_unpartitioned until their rows are moved below.
+DO $$
+DECLARE
+    fact_table TEXT;
+BEGIN
+    FOREACH fact_table IN ARRAY ARRAY[
+        'fact_campaign_performance', 'fact_campaign_ad_performance',
+        'fact_campaign_metrics', 'fact_campaign_ad_metrics'
+    ] LOOP
+        IF to_regclass(fact_table) IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(fact_table)
+        ) THEN
+            EXECUTE format('ALTER TABLE %I RENAME TO %I', fact_table, fact_table || '_unpartitioned');
+        END IF;
+    END LOOP;
+END $$;
+
 -- 3. Fact: fact_campaign_performance (campaign-level daily metrics)
 CREATE TABLE IF NOT EXISTS fact_campaign_performance(
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL NOT NULL,
     campaign_id BIGINT
         REFERENCES campaigns(campaign_id)
         ON DELETE SET NULL,
@@ -25,12 +48,14 @@ CREATE TABLE IF NOT EXISTS fact_campaign_performance(
     cr DOUBLE PRECISION,
     cpc DOUBLE PRECISION,
     processing_timestamp TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    row_hash TEXT,
     UNIQUE (campaign_id, execution_date)
-);
+) PARTITION BY RANGE (execution_date);
+CREATE TABLE IF NOT EXISTS fact_campaign_performance_default PARTITION OF fact_campaign_performance DEFAULT;
 
 -- 4. Fact: fact_campaign_ad_performance (campaign-ad-level daily metrics)
 CREATE TABLE IF NOT EXISTS fact_campaign_ad_performance (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL NOT NULL,
     campaign_id BIGINT
         REFERENCES campaigns(campaign_id)
         ON DELETE SET NULL,
@@ -46,12 +71,14 @@ CREATE TABLE IF NOT EXISTS fact_campaign_ad_performance (
     cr DOUBLE PRECISION,
     cpc DOUBLE PRECISION,
     processing_timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    row_hash TEXT,
     UNIQUE (campaign_id, ad_id, execution_date)
-);
+) PARTITION BY RANGE (execution_date);
+CREATE TABLE IF NOT EXISTS fact_campaign_ad_performance_default PARTITION OF fact_campaign_ad_performance DEFAULT;
 
 -- 5. Fact: fact_campaign_metrics (campaing-level lifeday metrics)
 CREATE TABLE IF NOT EXISTS fact_campaign_metrics(
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL NOT NULL,
     campaign_id BIGINT
         REFERENCES campaigns(campaign_id)
         ON DELETE SET NULL,
@@ -62,12 +89,14 @@ CREATE TABLE IF NOT EXISTS fact_campaign_metrics(
     payments BIGINT,
     revenue NUMERIC,
     processing_timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    row_hash TEXT,
     UNIQUE (campaign_id, execution_date, lifeday)
-);
+) PARTITION BY RANGE (execution_date);
+CREATE TABLE IF NOT EXISTS fact_campaign_metrics_default PARTITION OF fact_campaign_metrics DEFAULT;
 
 -- 6. Fact: fact_campaign_ad_metrics (campaign-ad-level lifeday metrics)
 CREATE TABLE IF NOT EXISTS fact_campaign_ad_metrics (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL NOT NULL,
     campaign_id BIGINT
         REFERENCES campaigns(campaign_id)
         ON DELETE SET NULL,
@@ -81,11 +110,182 @@ CREATE TABLE IF NOT EXISTS fact_campaign_ad_metrics (
     payments BIGINT,
     revenue NUMERIC,
     processing_timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    row_hash TEXT,
     UNIQUE (campaign_id, ad_id, execution_date, lifeday)
+) PARTITION BY RANGE (execution_date);
+CREATE TABLE IF NOT EXISTS fact_campaign_ad_metrics_default PARTITION OF fact_campaign_ad_metrics DEFAULT;
+
+-- row_hash (content hash of the value columns) for databases created before it existed
+ALTER TABLE fact_campaign_performance ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE fact_campaign_ad_performance ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE fact_campaign_metrics ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE fact_campaign_ad_metrics ADD COLUMN IF NOT EXISTS row_hash TEXT;
+
+-- Creates the missing monthly partitions of parent covering [from_date, to_date] and
+-- returns how many were created. Plain (unpartitioned) tables are left alone.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(
+    parent TEXT,
+    from_date DATE,
+    to_date DATE
+) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    month_start DATE := DATE_TRUNC('month', from_date)::DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(parent)
+    ) THEN
+        RETURN 0;
+    END IF;
+    -- serializes loaders creating partitions of the same table
+    PERFORM pg_advisory_xact_lock(hashtext(parent));
+
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := format('%s_p%s', parent, to_char(month_start, 'YYYYMM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            -- a partition cannot be created while the default partition holds rows of
+            -- its range, so those are moved out and back in around the CREATE
+            EXECUTE format(
+                'CREATE TEMP TABLE _default_rows ON COMMIT DROP AS
+                 WITH moved AS (
+                     DELETE FROM %I WHERE execution_date >= %L AND execution_date < %L
+                     RETURNING *
+                 )
+                 SELECT * FROM moved',
+                parent || '_default', month_start, month_end
+            );
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, month_start, month_end
+            );
+            EXECUTE format('INSERT INTO %I SELECT * FROM _default_rows', parent);
+            DROP TABLE _default_rows;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END $$;
+
+-- moves the rows of pre-partitioning fact tables into the partitioned ones
+DO $$
+DECLARE
+    fact_table TEXT;
+    legacy_table TEXT;
+    columns TEXT;
+    first_date DATE;
+    last_date DATE;
+BEGIN
+    FOREACH fact_table IN ARRAY ARRAY[
+        'fact_campaign_performance', 'fact_campaign_ad_performance',
+        'fact_campaign_metrics', 'fact_campaign_ad_metrics'
+    ] LOOP
+        legacy_table := fact_table || '_unpartitioned';
+        CONTINUE WHEN to_regclass(legacy_table) IS NULL;
+
+        EXECUTE format('SELECT min(execution_date), max(execution_date) FROM %I', legacy_table)
+            INTO first_date, last_date;
+        IF first_date IS NOT NULL THEN
+            PERFORM create_monthly_partitions(fact_table, first_date, last_date);
+        END IF;
+
+        SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position)
+            INTO columns
+            FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = legacy_table;
+        EXECUTE format(
+            'INSERT INTO %I (%s) SELECT %s FROM %I', fact_table, columns, columns, legacy_table
+        );
+        EXECUTE format(
+            'SELECT setval(pg_get_serial_sequence(%L, ''id''), COALESCE(max(id), 0) + 1, false) FROM %I',
+            fact_table, fact_table
+        );
+        -- also drops the views over the old table; they are recreated below
+        EXECUTE format('DROP TABLE %I CASCADE', legacy_table);
+    END LOOP;
+END $$;
+
+-- 7. ETL load state: (lod, window, lifeday) extractions whose metrics can no longer change
+CREATE TABLE IF NOT EXISTS etl_load_state (
+    lod CHAR(1) NOT NULL,
+    period_from DATE NOT NULL,
+    period_to DATE NOT NULL,
+    lifeday SMALLINT NOT NULL,
+    is_final BOOLEAN NOT NULL DEFAULT FALSE,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (lod, period_from, period_to, lifeday)
 );
 
+-- failed windows and records, kept until they are replayed (python extract_process_load.py replay)
+CREATE TABLE IF NOT EXISTS etl_dead_letters (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL CHECK (kind IN ('window', 'record')),
+    lod CHAR(1) NOT NULL,
+    period_from DATE,
+    period_to DATE,
+    payload JSONB,
+    reason TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    failed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    replayed_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS etl_dead_letters_pending_idx
+    ON etl_dead_letters (kind, lod, period_from) WHERE replayed_at IS NULL;
 
-CREATE OR REPLACE VIEW monthly_campaign_metrics AS(
+-- adaptive extraction window size last learned for each lod, the starting point of the next run
+CREATE TABLE IF NOT EXISTS etl_window_sizes (
+    lod CHAR(1) PRIMARY KEY,
+    days SMALLINT NOT NULL CHECK (days > 0),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- (lod, window) units of a distributed backfill (python extract_process_load.py seed/worker).
+-- Workers claim pending jobs, or running jobs whose lease expired, with FOR UPDATE SKIP LOCKED
+-- and extend leased_until with heartbeats while they run them.
+CREATE TABLE IF NOT EXISTS etl_jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    lod CHAR(1) NOT NULL,
+    period_from DATE NOT NULL,
+    period_to DATE NOT NULL,
+    derive_campaigns BOOLEAN NOT NULL DEFAULT FALSE,
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    leased_until TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ,
+    UNIQUE (lod, period_from, period_to)
+);
+CREATE INDEX IF NOT EXISTS etl_jobs_claimable_idx
+    ON etl_jobs (period_from, lod) WHERE status IN ('pending', 'running');
+
+
+-- 8. Indexes. Month-range scans are pruned to whole partitions; within a partition,
+-- rows are loaded roughly in execution_date order, which a BRIN index summarizes at a
+-- fraction of the size of a btree. The unique keys double as the composite
+-- (campaign_id, [ad_id,] execution_date[, lifeday]) indexes used by upserts and lookups.
+CREATE INDEX IF NOT EXISTS fact_campaign_performance_execution_date_brin
+    ON fact_campaign_performance USING BRIN (execution_date);
+CREATE INDEX IF NOT EXISTS fact_campaign_ad_performance_execution_date_brin
+    ON fact_campaign_ad_performance USING BRIN (execution_date);
+CREATE INDEX IF NOT EXISTS fact_campaign_metrics_execution_date_brin
+    ON fact_campaign_metrics USING BRIN (execution_date);
+CREATE INDEX IF NOT EXISTS fact_campaign_ad_metrics_execution_date_brin
+    ON fact_campaign_ad_metrics USING BRIN (execution_date);
+-- lifeday-filtered monthly aggregation of the campaign metrics
+CREATE INDEX IF NOT EXISTS fact_campaign_metrics_lifeday_idx
+    ON fact_campaign_metrics (lifeday, execution_date, campaign_id);
+
+
+-- Reference implementation of the monthly report, computed from the facts on every read.
+-- monthly_campaign_metrics below serves the same result from monthly_campaign_rollup.
+CREATE OR REPLACE VIEW monthly_campaign_metrics_live AS(
 WITH monthly_campaign_performance AS (
     SELECT
         campaign_id,
@@ -171,4 +371,138 @@ GROUP BY 1,2
 ) l14 ON l14.campaign_id = mcp.campaign_id AND l14.month = mcp.month
 
 ORDER BY 1,2 ASC
-);
\ No newline at end of file
+);
+
+
+-- 9. Monthly campaign rollup (one row per campaign and month), refreshed by the ETL for
+-- the months touched by each run
+CREATE TABLE IF NOT EXISTS monthly_campaign_rollup (
+    campaign_id BIGINT,
+    month DATE,
+    total_spend DOUBLE PRECISION,
+    total_impressions NUMERIC,
+    total_clicks NUMERIC,
+    total_registrations NUMERIC,
+    payers_d1 NUMERIC,
+    payers_d3 NUMERIC,
+    payers_d7 NUMERIC,
+    payers_d14 NUMERIC,
+    players_d1 NUMERIC,
+    players_d3 NUMERIC,
+    players_d7 NUMERIC,
+    players_d14 NUMERIC,
+    revenue_d1 NUMERIC,
+    revenue_d3 NUMERIC,
+    revenue_d7 NUMERIC,
+    revenue_d14 NUMERIC,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS monthly_campaign_rollup_month_idx
+    ON monthly_campaign_rollup (month, campaign_id);
+
+-- Rebuilds the rollup rows of every month overlapping [from_date, to_date]
+-- (all months when both are NULL) in one pass over each fact table.
+CREATE OR REPLACE FUNCTION refresh_monthly_campaign_rollup(
+    from_date DATE DEFAULT NULL,
+    to_date DATE DEFAULT NULL
+) RETURNS VOID LANGUAGE sql AS $$
+    -- serializes concurrent refreshes while leaving the rollup readable
+    LOCK TABLE monthly_campaign_rollup IN EXCLUSIVE MODE;
+
+    DELETE FROM monthly_campaign_rollup
+    WHERE (from_date IS NULL AND to_date IS NULL)
+       OR (month >= DATE_TRUNC('month', COALESCE(from_date, '-infinity'::DATE))::DATE
+           AND month <= DATE_TRUNC('month', COALESCE(to_date, 'infinity'::DATE))::DATE);
+
+    INSERT INTO monthly_campaign_rollup (
+        campaign_id, month, total_spend, total_impressions, total_clicks,
+        total_registrations, payers_d1, payers_d3, payers_d7, payers_d14,
+        players_d1, players_d3, players_d7, players_d14,
+        revenue_d1, revenue_d3, revenue_d7, revenue_d14
+    )
+    WITH monthly_campaign_performance AS (
+        SELECT
+            campaign_id,
+            DATE_TRUNC('month', execution_date)::DATE AS month,
+            SUM(
+                CASE
+                    WHEN spend IS NULL THEN clicks * cpc
+                    ELSE spend
+                END
+            ) AS total_spend,
+            SUM(impressions) AS total_impressions,
+            SUM(clicks) AS total_clicks,
+            SUM(registrations) AS total_registrations
+        FROM fact_campaign_performance
+        WHERE (from_date IS NULL AND to_date IS NULL)
+           OR (execution_date >= DATE_TRUNC('month', COALESCE(from_date, '-infinity'::DATE))
+               AND execution_date < DATE_TRUNC('month', COALESCE(to_date, 'infinity'::DATE))
+                                    + INTERVAL '1 month')
+        GROUP BY 1,2
+    ),
+    monthly_campaign_lifedays AS (
+        SELECT
+            campaign_id,
+            DATE_TRUNC('month', execution_date)::DATE AS month,
+            SUM(payers) FILTER (WHERE lifeday = 1) AS payers_d1,
+            SUM(payers) FILTER (WHERE lifeday = 3) AS payers_d3,
+            SUM(payers) FILTER (WHERE lifeday = 7) AS payers_d7,
+            SUM(payers) FILTER (WHERE lifeday = 14) AS payers_d14,
+            SUM(players) FILTER (WHERE lifeday = 1) AS players_d1,
+            SUM(players) FILTER (WHERE lifeday = 3) AS players_d3,
+            SUM(players) FILTER (WHERE lifeday = 7) AS players_d7,
+            SUM(players) FILTER (WHERE lifeday = 14) AS players_d14,
+            SUM(revenue) FILTER (WHERE lifeday = 1) AS revenue_d1,
+            SUM(revenue) FILTER (WHERE lifeday = 3) AS revenue_d3,
+            SUM(revenue) FILTER (WHERE lifeday = 7) AS revenue_d7,
+            SUM(revenue) FILTER (WHERE lifeday = 14) AS revenue_d14
+        FROM fact_campaign_metrics
+        WHERE (from_date IS NULL AND to_date IS NULL)
+           OR (execution_date >= DATE_TRUNC('month', COALESCE(from_date, '-infinity'::DATE))
+               AND execution_date < DATE_TRUNC('month', COALESCE(to_date, 'infinity'::DATE))
+                                    + INTERVAL '1 month')
+        GROUP BY 1,2
+    )
+    SELECT
+        mcp.campaign_id, mcp.month, mcp.total_spend, mcp.total_impressions,
+        mcp.total_clicks, mcp.total_registrations,
+        l.payers_d1, l.payers_d3, l.payers_d7, l.payers_d14,
+        l.players_d1, l.players_d3, l.players_d7, l.players_d14,
+        l.revenue_d1, l.revenue_d3, l.revenue_d7, l.revenue_d14
+    FROM monthly_campaign_performance mcp
+    LEFT JOIN monthly_campaign_lifedays l
+        ON l.campaign_id = mcp.campaign_id AND l.month = mcp.month;
+$$;
+
+-- initial fill for databases created before the rollup existed
+SELECT refresh_monthly_campaign_rollup()
+WHERE NOT EXISTS (SELECT 1 FROM monthly_campaign_rollup);
+
+
+CREATE OR REPLACE VIEW monthly_campaign_metrics AS(
+SELECT  c.campaign_name,
+        r.month,
+        ROUND(r.total_spend::numeric, 2) AS total_spend,
+        ROUND(r.total_spend::numeric/r.total_registrations::numeric,2) AS cpi,
+        ROUND(r.total_spend::numeric/r.payers_d1::bigint,2) AS cpp_d1,
+        ROUND(r.total_spend::numeric/r.payers_d3::bigint,2) AS cpp_d3,
+        ROUND(r.total_spend::numeric/r.payers_d7::bigint,2) AS cpp_d7,
+        ROUND(r.total_spend::numeric/r.payers_d14::bigint,2) AS cpp_d14,
+
+        ROUND(r.players_d1 / r.players_d1,2) AS retention_d1,
+        ROUND(r.players_d3 / r.players_d1,2) AS retention_d3,
+        ROUND(r.players_d7 / r.players_d1,2) AS retention_d7,
+        ROUND(r.players_d14 / r.players_d1,2) AS retention_d14,
+
+        ROUND(r.revenue_d1::numeric / r.total_spend::numeric,2) AS roas_d1,
+        ROUND(r.revenue_d3::numeric / r.total_spend::numeric,2) AS roas_d3,
+        ROUND(r.revenue_d7::numeric / r.total_spend::numeric,2) AS roas_d7,
+        ROUND(r.revenue_d14::numeric / r.total_spend::numeric,2) AS roas_d14
+
+FROM monthly_campaign_rollup r
+
+LEFT JOIN campaigns c ON c.campaign_id = r.campaign_id
+
+ORDER BY 1,2 ASC
+);
@@ -0,0 +1,135 @@
+import pytest
+
+from configs.api import SchemaConfigs
+from etl.decoding import (
+    KEY_COLUMNS,
+    METRICS_COLUMNS,
+    PERFORMANCE_COLUMNS,
+    DecodeError,
+    decode_facts,
+    decode_facts_columnar,
+)
+
+CAMPAIGN_IDS = {"Campaign_1": 1}
+AD_IDS = {"Ad_1": 10}
+
+
+def record(**fields):
+    return {
+        "campaign": "Campaign_1",
+        "ad": "Ad_1",
+        "date": "2024-01-01",
+        "cost": 12.5,
+        "impressions": 1000,
+        "clicks": 20,
+        "registrations": 2,
+        "ctr": 0.02,
+        "cr": 0.1,
+        "cpc": 0.625,
+        "metrics": [
+            {"lifeday": 1, "players": 3, "payers": 1, "payments": 1, "revenue": 4.0}
+        ],
+        **fields,
+    }
+
+
+def errors(payload, lod="a"):
+    _, _, rejected = decode_facts(lod, payload, CAMPAIGN_IDS, AD_IDS)
+    return [str(error) for _, error in rejected]
+
+
+def test_rows_follow_the_column_order_of_the_fact_tables():
+    for lod, (performance_table, metrics_table) in SchemaConfigs.lod_tables.items():
+        columns = SchemaConfigs.column_data
+        assert (
+            list(KEY_COLUMNS[lod] + PERFORMANCE_COLUMNS) == columns[performance_table]
+        )
+        assert list(KEY_COLUMNS[lod] + METRICS_COLUMNS) == columns[metrics_table]
+
+
+def test_decode_facts_builds_one_metrics_row_per_entry():
+    entries = [{"lifeday": 1, "players": 3}, {"lifeday": 7, "revenue": 2}]
+    performance, metrics, rejected = decode_facts(
+        "a", [record(metrics=entries)], CAMPAIGN_IDS, AD_IDS
+    )
+    assert performance == [(1, 10, "2024-01-01", 12.5, 1000, 20, 2, 0.02, 0.1, 0.625)]
+    assert metrics == [
+        (1, 10, "2024-01-01", 1, 3, None, None, None),
+        (1, 10, "2024-01-01", 7, None, None, None, 2),
+    ]
+    assert rejected == []
+
+
+def test_decode_facts_leaves_out_the_ad_of_campaign_rows():
+    performance, metrics, _ = decode_facts("c", [record()], CAMPAIGN_IDS)
+    assert performance[0][:2] == (1, "2024-01-01")
+    assert metrics == [(1, "2024-01-01", 1, 3, 1, 1, 4.0)]
+
+
+@pytest.mark.parametrize("metrics", [[], None])
+def test_records_without_metrics_entries_have_no_metrics_rows(metrics):
+    performance, rows, rejected = decode_facts(
+        "a", [record(metrics=metrics)], CAMPAIGN_IDS, AD_IDS
+    )
+    assert len(performance) == 1 and rows == [] and rejected == []
+
+
+def test_integral_floats_are_read_as_integers():
+    performance, _, _ = decode_facts("a", [record(clicks=20.0)], CAMPAIGN_IDS, AD_IDS)
+    assert performance[0][5] == 20 and type(performance[0][5]) is int
+
+
+@pytest.mark.parametrize(
+    "payload, error",
+    [
+        ([record(clicks="7")], "$[0].clicks: expected an integer, got str '7'"),
+        ([record(clicks=2.5)], "$[0].clicks: expected an integer, got float 2.5"),
+        ([record(cost=True)], "$[0].cost: expected a number, got bool True"),
+        (
+            [record(date="2024-1-1")],
+            "$[0].date: expected a YYYY-MM-DD date, got str '2024-1-1'",
+        ),
+        ([record(campaign=5)], "$[0].campaign: expected a string, got int 5"),
+        ([record(metrics={})], "$[0].metrics: expected a list, got dict {}"),
+        ([record(metrics=[7])], "$[0].metrics[0]: expected an object, got int 7"),
+        (
+            [record(metrics=[{"players": 1}])],
+            "$[0].metrics[0].lifeday: missing or null",
+        ),
+        ([record(), "x"], "$[1]: expected an object, got str 'x'"),
+    ],
+)
+def test_decode_facts_rejects_records_with_the_path_of_the_error(payload, error):
+    assert errors(payload) == [error]
+
+
+def test_decode_facts_keeps_the_valid_records_of_a_response():
+    performance, _, rejected = decode_facts(
+        "a", [record(clicks="7"), record()], CAMPAIGN_IDS, AD_IDS
+    )
+    assert len(performance) == 1
+    assert rejected[0][0]["clicks"] == "7"
+
+
+def test_decode_facts_raises_on_a_response_that_is_not_a_list():
+    with pytest.raises(DecodeError, match=r"^\$: expected a list of records"):
+        decode_facts("a", {"error": "quota"}, CAMPAIGN_IDS, AD_IDS)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        [
+            record(),
+            record(ad=None, metrics=[]),
+            record(campaign="Unknown", metrics=None),
+        ],
+        [record(clicks=20.0), record(clicks="7"), record(metrics=[{"players": 1}])],
+    ],
+)
+def test_decode_facts_columnar_matches_decode_facts(payload):
+    for lod in KEY_COLUMNS:
+        expected = decode_facts(lod, payload, CAMPAIGN_IDS, AD_IDS)
+        actual = decode_facts_columnar(lod, payload, CAMPAIGN_IDS, AD_IDS)
+        assert actual[:2] == expected[:2]
+        assert [str(e) for _, e in actual[2]] == [str(e) for _, e in expected[2]]
@@ -0,0 +1,85 @@
+from datetime import date
+
+from configs.api import APIConfigs
+from etl.incremental import (
+    final_dates,
+    first_pending_date,
+    is_final,
+    load_state_rows,
+    loaded_lifedays,
+    pending_lifedays,
+    settled_since,
+)
+
+BUFFER = APIConfigs.maturation_buffer_days
+
+
+def test_is_final_once_every_date_is_older_than_the_lifeday_and_buffer():
+    as_of = date(2024, 3, 1)
+    # 2024-02-20 + 7 + buffer days
+    last_pending = date.fromordinal(as_of.toordinal() - 7 - BUFFER).isoformat()
+    assert not is_final(last_pending, 7, as_of)
+    assert is_final("2024-02-01", 7, as_of)
+    assert not is_final("2024-02-29", 1, as_of)
+
+
+def test_final_dates_excludes_period_to():
+    covered = final_dates([("a", "2024-01-01", "2024-01-03", 1)])
+    assert covered == {("a", 1): {date(2024, 1, 1), date(2024, 1, 2)}}
+
+
+def test_pending_lifedays_checks_coverage_per_date():
+    covered = final_dates(
+        [("a", "2024-01-01", "2024-01-05", 1), ("a", "2024-01-05", "2024-01-08", 1)]
+    )
+    # boundaries that differ from the recorded windows are still covered
+    assert pending_lifedays("a", "2024-01-02", "2024-01-07", [1, 7], covered) == [7]
+    assert pending_lifedays("a", "2024-01-06", "2024-01-10", [1], covered) == [1]
+    assert pending_lifedays("c", "2024-01-02", "2024-01-07", [1], covered) == [1]
+
+
+def test_first_pending_date_skips_dates_covered_for_every_lifeday():
+    covered = final_dates(
+        [("a", "2024-01-01", "2024-01-10", 1), ("a", "2024-01-01", "2024-01-05", 7)]
+    )
+    assert first_pending_date("a", "2024-01-01", "2024-01-15", [1], covered) == (
+        "2024-01-10"
+    )
+    assert first_pending_date("a", "2024-01-01", "2024-01-15", [1, 7], covered) == (
+        "2024-01-05"
+    )
+
+
+def test_loaded_lifedays_keeps_observed_and_matured_empty_lifedays():
+    as_of = date(2024, 3, 1)
+    assert loaded_lifedays({1}, [1, 7, 30], "2024-02-01", "2024-02-08", as_of) == {
+        1,
+        7,
+    }
+    # nothing of a window ending on as_of has matured
+    assert loaded_lifedays(set(), [7], "2024-02-25", "2024-03-01", as_of) == set()
+
+
+def test_load_state_rows_split_each_lifeday_at_finality():
+    as_of = date(2024, 3, 1)
+    rows = load_state_rows("a", "2024-02-01", "2024-03-01", [1, 60], as_of)
+    cutoff = date.fromordinal(as_of.toordinal() - 1 - BUFFER - 1).isoformat()
+    assert rows == [
+        ("a", "2024-02-01", cutoff, 1, True),
+        ("a", cutoff, "2024-03-01", 1, False),
+        ("a", "2024-02-01", "2024-03-01", 60, False),
+    ]
+    assert load_state_rows("a", "2024-01-01", "2024-01-08", [1], as_of) == [
+        ("a", "2024-01-01", "2024-01-08", 1, True)
+    ]
+
+
+def test_settled_since_is_none_until_part_of_the_window_is_final():
+    as_of = date(2024, 3, 1)
+    assert settled_since("2024-02-25", "2024-03-01", 7, as_of) is None
+    # a window that matured long ago was already as final when it matured
+    assert settled_since("2024-01-01", "2024-01-08", 7, as_of) == date(
+        2024, 1, 8 + 7 + BUFFER + 1
+    )
+    # a window that is still maturing only matches a response fetched on as_of
+    assert settled_since("2024-02-01", "2024-03-01", 1, as_of) == as_of
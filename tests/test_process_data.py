@@ -0,0 +1,68 @@
+import pytest
+
+from etl.process_data import DataProcessor
+
+
+def ad_rows():
+    performance = [
+        (1, 10, "2024-01-01", 10.0, 1000, 20, 2, 0.02, 0.1, 0.5),
+        (1, 11, "2024-01-01", 30.0, 3000, 60, 6, 0.02, 0.1, 0.5),
+        # every lifeday response repeats the performance of its records
+        (1, 10, "2024-01-01", 10.0, 1000, 20, 2, 0.02, 0.1, 0.5),
+        (2, None, "2024-01-01", 5.0, 100, None, 1, None, None, None),
+        (2, None, "2024-01-01", 5.0, 100, None, 1, None, None, None),
+    ]
+    metrics = [
+        (1, 10, "2024-01-01", 1, 3, 1, 1, 4.0),
+        (1, 11, "2024-01-01", 1, 5, 2, 2, 6.0),
+        (1, 10, "2024-01-01", 7, 4, None, 1, 5.0),
+        (2, None, "2024-01-01", 1, 1, 0, 0, 0.0),
+        (2, None, "2024-01-01", 1, 2, 1, 1, 3.0),
+    ]
+    return performance, metrics
+
+
+def test_derive_campaign_data_sums_bases_and_recomputes_ratios():
+    performance, metrics = DataProcessor.derive_campaign_data(*ad_rows())
+    assert performance == [
+        (1, "2024-01-01", 40.0, 4000, 80, 8, 0.02, 0.1, 0.5),
+        (2, "2024-01-01", 5.0, 100, None, 1, None, None, None),
+    ]
+    assert metrics == [
+        (1, "2024-01-01", 1, 8, 3, 3, 10.0),
+        (1, "2024-01-01", 7, 4, None, 1, 5.0),
+        (2, "2024-01-01", 1, 3, 1, 1, 3.0),
+    ]
+
+
+def test_reconcile_campaign_data_accepts_rows_within_the_tolerance():
+    derived = DataProcessor.derive_campaign_data(*ad_rows())
+    actual = (
+        [(*row[:2], row[2] * 1.0001, *row[3:]) for row in derived[0]],
+        list(derived[1]),
+    )
+    assert DataProcessor.reconcile_campaign_data(derived, actual) == []
+
+
+def test_reconcile_campaign_data_reports_every_difference():
+    derived = DataProcessor.derive_campaign_data(*ad_rows())
+    performance, metrics = [list(rows) for rows in derived]
+    performance[0] = (1, "2024-01-01", 41.0, *performance[0][3:])
+    metrics[2] = (2, "2024-01-01", 1, 3, None, 1, 3.0)
+    del metrics[1]
+    mismatches = DataProcessor.reconcile_campaign_data(derived, (performance, metrics))
+    assert mismatches == [
+        "(1, '2024-01-01') spend: 40.0 != 41.0",
+        "(1, '2024-01-01', 7): missing from the API",
+        "(2, '2024-01-01', 1) payers: 1 != None",
+    ]
+
+
+@pytest.mark.parametrize("rel_tol, expected", [(1e-3, 1), (0.1, 0)])
+def test_reconcile_campaign_data_uses_the_relative_tolerance(rel_tol, expected):
+    derived = DataProcessor.derive_campaign_data(*ad_rows())
+    actual = ([(*derived[0][0][:2], 42.0, *derived[0][0][3:])], derived[1])
+    mismatches = DataProcessor.reconcile_campaign_data(
+        (derived[0][:1], derived[1]), actual, rel_tol=rel_tol
+    )
+    assert len(mismatches) == expected
@@ -0,0 +1,58 @@
+from etl.windowing import WindowSizer, adaptive_windows, split_window
+
+
+def sizer(days: int = 8) -> WindowSizer:
+    return WindowSizer(
+        "a", days, min_days=1, max_days=32, target_seconds=2.0, max_records=1000
+    )
+
+
+def test_adaptive_windows_cover_the_period_without_gaps():
+    windows = list(adaptive_windows("2024-01-01", "2024-01-20", sizer(8)))
+    assert windows == [
+        ("2024-01-01", "2024-01-09"),
+        ("2024-01-09", "2024-01-17"),
+        ("2024-01-17", "2024-01-20"),
+    ]
+
+
+def test_adaptive_windows_use_the_size_learned_in_between():
+    window_sizer = sizer(4)
+    windows = adaptive_windows("2024-01-01", "2024-02-01", window_sizer)
+    assert next(windows) == ("2024-01-01", "2024-01-05")
+    window_sizer.observe(4, seconds=0.1, records=10)
+    assert next(windows) == ("2024-01-05", "2024-01-13")
+
+
+def test_window_sizer_grows_within_its_targets_and_bounds():
+    window_sizer = sizer(8)
+    window_sizer.observe(8, seconds=0.1, records=10)
+    assert window_sizer.days == 16
+    window_sizer.observe(16, seconds=0.1, records=10)
+    window_sizer.observe(32, seconds=0.1, records=10)
+    assert window_sizer.days == 32
+
+
+def test_window_sizer_only_grows_on_windows_of_its_size():
+    window_sizer = sizer(8)
+    window_sizer.observe(4, seconds=0.1, records=10)
+    assert window_sizer.days == 8
+
+
+def test_window_sizer_halves_on_slow_or_large_responses():
+    window_sizer = sizer(8)
+    window_sizer.observe(8, seconds=3.0, records=10)
+    assert window_sizer.days == 4
+    window_sizer.observe(4, seconds=0.1, records=2000)
+    assert window_sizer.days == 2
+    window_sizer.shrink(2, "timeout")
+    window_sizer.shrink(1, "timeout")
+    assert window_sizer.days == 1
+
+
+def test_split_window_at_the_midpoint():
+    assert split_window("2024-01-01", "2024-01-08") == (
+        "2024-01-01",
+        "2024-01-04",
+        "2024-01-08",
+    )